@@ -2,7 +2,7 @@
 
 import sys
 import os
-import bcrypt
+import secrets
 
 # Add the project root directory to the Python path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -11,12 +11,6 @@ sys.path.append(project_root)
 from backend.app.utils.supabase_client import get_supabase_admin, hash_password
 from backend.config.settings import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
 
-# Function to hash a password
-def hash_password(password):
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
-
 def main():
     # Get the sales rep ID from the command line or use default
     if len(sys.argv) > 1:
@@ -25,8 +19,9 @@ def main():
         # Default to ID 1 if not provided
         sales_rep_id = 6
     
-    # Default password to use for the sales rep
-    password = "password123"
+    # Password from the command line, or a random one
+    # (use provision_sales_reps.py to provision many reps from a CSV file)
+    password = sys.argv[2] if len(sys.argv) > 2 else secrets.token_urlsafe(12)
     
     # Get Supabase admin client
     supabase = get_supabase_admin()
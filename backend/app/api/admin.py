@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from app.auth.dependencies import require_admin
+from app.utils import profiling
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+def _profile_file(request_id: str, suffix: str) -> str:
+    path = profiling.profile_path(request_id, suffix)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No profile for this request ID"
+        )
+    return path
+
+@router.get("/profiles", response_model=list)
+async def list_profiles():
+    """
+    List the stored request profiles, newest first
+    """
+    return profiling.list_profiles()
+
+@router.get("/profiles/{request_id}")
+async def get_profile(request_id: str):
+    """
+    Summary of a profile: wall and CPU time, peak traced memory, the top
+    functions by cumulative and own time, and the top allocation sites
+    """
+    return FileResponse(_profile_file(request_id, ".json"), media_type="application/json")
+
+@router.get("/profiles/{request_id}/download")
+async def download_profile(request_id: str):
+    """
+    Download the cProfile stats of a profile, for `python -m pstats` or snakeviz
+    """
+    return FileResponse(
+        _profile_file(request_id, ".prof"),
+        media_type="application/octet-stream",
+        filename=f"{request_id}.prof"
+    )
@@ -2,7 +2,8 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from app.models.user import UserCreate, UserLogin, UserResponse, TokenResponse
 from app.models.user import SalesRepCreate, SalesRepLogin, SalesRepResponse, SalesRepTokenResponse
 from app.utils.supabase_client import get_supabase, get_supabase_admin, hash_password, verify_password, create_sales_rep_token
-from app.auth.dependencies import get_current_user, get_current_sales_rep, get_current_user_any_auth
+from app.auth.dependencies import get_current_user, get_current_sales_rep, get_current_user_any_auth, get_sales_rep_token
+from app.auth.revocation import revocations
 
 router = APIRouter()
 
@@ -240,4 +241,41 @@ async def get_current_sales_rep_info(user: dict = Depends(get_current_sales_rep)
     """
     Get information about the currently authenticated sales rep
     """
-    return user
\ No newline at end of file
+    return user
+
+@router.post("/sales-rep/logout")
+async def logout_sales_rep(payload: dict = Depends(get_sales_rep_token)):
+    """
+    Log out a sales rep by revoking the token used for this request
+    """
+    revocations.revoke_token(payload)
+    return {"message": "Successfully logged out"}
+
+@router.post("/sales-rep/{user_auth_id}/deactivate")
+async def deactivate_sales_rep(user_auth_id: int, current_user: dict = Depends(get_current_user)):
+    """
+    Deactivate a sales rep account and revoke every token issued to it.
+    Other workers stop accepting the tokens within REVOCATION_SYNC_SECONDS.
+    """
+    supabase = get_supabase_admin()
+    
+    try:
+        update_result = supabase.table("user_auth").update({"Is active": False}).eq("id", user_auth_id).execute()
+        
+        if not update_result.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Sales rep not found"
+            )
+        
+        revocations.revoke_user(user_auth_id)
+        
+        return {"message": "Sales rep deactivated", "user_auth_id": user_auth_id}
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
@@ -1,7 +1,10 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.utils.supabase_client import get_supabase, decode_sales_rep_token
+from app.auth.revocation import revocations
+from config.settings import ADMIN_TOKEN
 from typing import Optional, Dict, Any, Union
+import secrets
 
 # HTTP Bearer token scheme for JWT authorization
 security = HTTPBearer()
@@ -52,10 +55,29 @@ async def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials]
     except Exception:
         return None
 
-async def get_current_sales_rep(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def _revoked_token_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token has been revoked",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def _sales_rep_user(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Validate a sales rep JWT token in the Authorization header and return the sales rep data.
-    This dependency can be used to protect routes that require sales rep authentication.
+    Build the sales rep user data from decoded token claims
+    """
+    return {
+        "id": int(payload["sub"]),
+        "email": payload["email"],
+        "full_name": payload.get("full_name", ""),
+        "role": payload.get("role", "sales_rep"),
+        "auth_type": "sales_rep"
+    }
+
+async def get_sales_rep_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
+    """
+    Validate a sales rep JWT token in the Authorization header and return its claims.
+    Revoked tokens are rejected with an in-memory lookup, without a database round-trip.
     """
     token = credentials.credentials
     
@@ -70,15 +92,25 @@ async def get_current_sales_rep(credentials: HTTPAuthorizationCredentials = Depe
                 detail="Invalid sales rep credentials",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        
-        # Return user data from the payload
-        return {
-            "id": int(payload["sub"]),
-            "email": payload["email"],
-            "full_name": payload.get("full_name", ""),
-            "role": payload.get("role", "sales_rep"),
-            "auth_type": "sales_rep"
-        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Invalid sales rep credentials: {str(e)}",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    if revocations.is_revoked(payload):
+        raise _revoked_token_error()
+    
+    return payload
+
+async def get_current_sales_rep(payload: Dict[str, Any] = Depends(get_sales_rep_token)):
+    """
+    Validate a sales rep JWT token in the Authorization header and return the sales rep data.
+    This dependency can be used to protect routes that require sales rep authentication.
+    """
+    try:
+        return _sales_rep_user(payload)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -96,16 +128,16 @@ async def get_current_user_any_auth(credentials: HTTPAuthorizationCredentials =
     # Try sales rep authentication first
     try:
         payload = decode_sales_rep_token(token)
-        if payload.get("auth_type") == "sales_rep":
-            return {
-                "id": int(payload["sub"]),
-                "email": payload["email"],
-                "full_name": payload.get("full_name", ""),
-                "role": payload.get("role", "sales_rep"),
-                "auth_type": "sales_rep"
-            }
     except Exception:
-        pass
+        payload = None
+    
+    if payload is not None and payload.get("auth_type") == "sales_rep":
+        if revocations.is_revoked(payload):
+            raise _revoked_token_error()
+        try:
+            return _sales_rep_user(payload)
+        except Exception:
+            pass
     
     # Fall back to Supabase authentication
     try:
@@ -130,4 +162,26 @@ async def get_current_user_any_auth(credentials: HTTPAuthorizationCredentials =
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid authentication credentials",
         headers={"WWW-Authenticate": "Bearer"},
-    )
\ No newline at end of file
+    )
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """
+    Check a bearer token against ADMIN_TOKEN; there are no admins while it is unset
+    """
+    if not ADMIN_TOKEN or not token:
+        return False
+    return secrets.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8"))
+
+async def require_admin(credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))):
+    """
+    Protect the admin routes with ADMIN_TOKEN. They answer 404 while it is unset,
+    so a deployment without admins does not expose them at all.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not credentials or not is_admin_token(credentials.credentials):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Admin token required",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
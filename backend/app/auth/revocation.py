@@ -0,0 +1,198 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from config.settings import JWT_EXPIRATION, REVOCATION_DB_PATH, REVOCATION_SYNC_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS revocations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    issued_before INTEGER,
+    expires_at INTEGER NOT NULL,
+    revoked_at REAL NOT NULL
+)
+"""
+
+
+class RevocationStore:
+    """
+    Append-only log of revocations in SQLite, shared by every worker on the
+    host. Each entry revokes one token ("token", by jti) or every token of a
+    user issued up to a point in time ("user", on deactivation). The
+    AUTOINCREMENT sequence lets processes fetch only entries they have not
+    seen yet. Entries are kept until the tokens they revoke have expired.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=10)
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(SCHEMA)
+            connection.commit()
+            self._initialized = True
+        return connection
+
+    def add(self, kind: str, subject: str, expires_at: int, issued_before: Optional[int] = None) -> int:
+        """
+        Record a revocation and return its sequence number
+        """
+        connection = self._connect()
+        try:
+            with connection:
+                cursor = connection.execute(
+                    "INSERT INTO revocations (kind, subject, issued_before, expires_at, revoked_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (kind, subject, issued_before, expires_at, time.time())
+                )
+            return cursor.lastrowid
+        finally:
+            connection.close()
+
+    def since(self, seq: int) -> list:
+        """
+        Return the unexpired entries recorded after sequence number seq
+        """
+        connection = self._connect()
+        try:
+            return connection.execute(
+                "SELECT seq, kind, subject, issued_before, expires_at FROM revocations "
+                "WHERE seq > ? AND expires_at > ? ORDER BY seq",
+                (seq, int(time.time()))
+            ).fetchall()
+        finally:
+            connection.close()
+
+    def prune(self) -> int:
+        """
+        Delete entries whose tokens have all expired
+        """
+        connection = self._connect()
+        try:
+            with connection:
+                return connection.execute(
+                    "DELETE FROM revocations WHERE expires_at <= ?", (int(time.time()),)
+                ).rowcount
+        finally:
+            connection.close()
+
+
+class RevocationList:
+    """
+    Per-process copy of the revocation store for the authentication hot path.
+    is_revoked() is at most two dict lookups, with no I/O. A
+    background thread pulls new entries every sync_interval seconds, so a
+    revocation made by any worker applies everywhere within that interval;
+    revocations made by this process apply at once.
+
+    Hash tables are used rather than a Bloom filter: revoked tokens are few
+    (logouts and deactivations within one token lifetime), and exact lookups
+    have no false positives to double-check against the store.
+    """
+
+    def __init__(self, store: RevocationStore, sync_interval: float):
+        self.store = store
+        self.sync_interval = sync_interval
+        self.tokens: Dict[str, int] = {}
+        self.users: Dict[str, int] = {}
+        self.last_seq = 0
+        self._lock = threading.RLock()
+        self._pid = None
+        self._last_prune = 0.0
+
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        """
+        Check the claims of a decoded sales rep token
+        """
+        if self._pid != os.getpid():
+            self._start()
+        jti = payload.get("jti")
+        if jti is not None and jti in self.tokens:
+            return True
+        issued_before = self.users.get(str(payload.get("sub")))
+        return issued_before is not None and payload.get("iat", 0) <= issued_before
+
+    def revoke_token(self, payload: Dict[str, Any]):
+        """
+        Revoke one token, e.g. on logout. Tokens issued before tokens carried
+        a jti are revoked together with the user's older tokens.
+        """
+        expires_at = int(payload.get("exp") or time.time() + JWT_EXPIRATION)
+        if payload.get("jti"):
+            self.store.add("token", payload["jti"], expires_at)
+            self._apply("token", payload["jti"], None, expires_at)
+        else:
+            issued_before = int(payload.get("iat", 0))
+            self.store.add("user", str(payload["sub"]), expires_at, issued_before)
+            self._apply("user", str(payload["sub"]), issued_before, expires_at)
+
+    def revoke_user(self, user_id: Any):
+        """
+        Revoke every token issued to a user so far, e.g. on deactivation
+        """
+        issued_before = int(time.time())
+        expires_at = issued_before + JWT_EXPIRATION
+        self.store.add("user", str(user_id), expires_at, issued_before)
+        self._apply("user", str(user_id), issued_before, expires_at)
+
+    def sync(self):
+        """
+        Fetch entries added since the last sync and drop expired ones
+        """
+        for seq, kind, subject, issued_before, expires_at in self.store.since(self.last_seq):
+            self._apply(kind, subject, issued_before, expires_at)
+            # Only advanced here: a local revocation may be numbered after
+            # entries from other workers that have not been fetched yet
+            self.last_seq = seq
+        now = time.time()
+        if now - self._last_prune >= 60:
+            self._last_prune = now
+            self.store.prune()
+            with self._lock:
+                # Rebuilt rather than mutated so lock-free readers never see a dict change size
+                self.tokens = {jti: expires for jti, expires in self.tokens.items() if expires > now}
+                self.users = {
+                    user: issued_before for user, issued_before in self.users.items()
+                    if issued_before + JWT_EXPIRATION > now
+                }
+
+    def _apply(self, kind: str, subject: str, issued_before: Optional[int], expires_at: int):
+        with self._lock:
+            if kind == "token":
+                self.tokens[subject] = expires_at
+            else:
+                self.users[subject] = max(self.users.get(subject, 0), issued_before)
+
+    def _start(self):
+        """
+        Load the store and start the sync thread, once per process. Runs
+        again in each worker after a fork, since threads do not survive it.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.sync()
+            thread = threading.Thread(target=self._sync_loop, name="revocation-sync", daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(self.sync_interval)
+            try:
+                self.sync()
+            except Exception:
+                logger.exception("Syncing token revocations failed")
+
+
+revocations = RevocationList(RevocationStore(REVOCATION_DB_PATH), REVOCATION_SYNC_SECONDS)
@@ -0,0 +1,327 @@
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+
+from config.settings import METRICS_DIR, METRICS_FLUSH_SECONDS
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[Tuple[str, str], ...]
+
+
+def _label_values(labels: Dict[str, object]) -> LabelValues:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: LabelValues) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        escaped = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Counter:
+    """
+    Monotonically increasing counter rendered in the Prometheus text format
+    """
+    type = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, **labels):
+        key = _label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def combine(first: float, second: float) -> float:
+        return first + second
+
+    def render(self, series: Dict[LabelValues, float]) -> List[str]:
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in series.items()]
+
+
+class Histogram:
+    """
+    Cumulative histogram rendered in the Prometheus text format
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_values(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> Dict[LabelValues, list]:
+        with self._lock:
+            return {key: [list(counts), total, count] for key, (counts, total, count) in self._series.items()}
+
+    @staticmethod
+    def combine(first: list, second: list) -> list:
+        return [[a + b for a, b in zip(first[0], second[0])], first[1] + second[1], first[2] + second[2]]
+
+    def render(self, series: Dict[LabelValues, list]) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                bucket_labels = key + (("le", str(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Collection of metrics served by the /metrics endpoint
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> dict:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def merge(self, snapshots: List[dict]) -> dict:
+        """
+        Adds up snapshots of several processes, series by series
+        """
+        merged = {}
+        for name, metric in self._metrics.items():
+            series = merged[name] = {}
+            for snapshot in snapshots:
+                for key, state in snapshot.get(name, {}).items():
+                    series[key] = metric.combine(series[key], state) if key in series else state
+        return merged
+
+    def render(self, snapshots: List[dict] = None) -> str:
+        """
+        Renders the sum of `snapshots` (this process's metrics by default)
+        """
+        merged = self.merge(snapshots) if snapshots is not None else self.snapshot()
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render(merged[metric.name]))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class SharedMetrics:
+    """
+    Sums the registry over the worker processes of one host, so a scrape of
+    any worker reports the whole server. Each process writes a snapshot of
+    its registry to <directory>/<pid>-<token>.json every flush_seconds and at
+    exit; /metrics adds up every snapshot in the directory. Snapshots of
+    exited workers are folded into archived.json (gunicorn's child_exit
+    hook), so counters do not drop when gunicorn recycles a worker. Numbers
+    of the other workers are up to flush_seconds old.
+    """
+
+    ARCHIVE = "archived.json"
+
+    def __init__(self, directory: str, flush_seconds: float):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self._pid = None
+        self._path = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts flushing this process's metrics; a no-op after the first call
+        in a process (workers fork from the master, which imported the module)
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._pid = os.getpid()
+            self._path = os.path.join(self.directory, f"{self._pid}-{uuid.uuid4().hex[:8]}.json")
+            threading.Thread(target=self._run, name="metrics-flush", daemon=True).start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def flush(self):
+        # The flush thread and /metrics both write the snapshot
+        with self._lock:
+            if self._path is not None:
+                _write_snapshot(self._path, registry.snapshot())
+
+    def render(self) -> str:
+        self.flush()
+        snapshots = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                snapshot = _read_snapshot(entry.path)
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+        return registry.render(snapshots)
+
+    def archive(self, pid: int):
+        """
+        Folds the snapshots of an exited worker into the archive; called by
+        the master only, so archive writes never race
+        """
+        archive_path = os.path.join(self.directory, self.ARCHIVE)
+        paths = [entry.path for entry in os.scandir(self.directory) if entry.name.startswith(f"{pid}-")]
+        if not paths:
+            return
+        snapshots = [_read_snapshot(path) for path in [archive_path] + paths]
+        _write_snapshot(archive_path, registry.merge([snapshot for snapshot in snapshots if snapshot is not None]))
+        for path in paths:
+            os.remove(path)
+
+    def reset(self):
+        """
+        Removes the snapshots of a previous server run
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                os.remove(entry.path)
+
+
+def _write_snapshot(path: str, snapshot: dict):
+    # Label sets become lists of [name, value] pairs in JSON
+    data = {name: [[list(map(list, key)), state] for key, state in series.items()] for name, series in snapshot.items()}
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def _read_snapshot(path: str):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        # Missing (archived meanwhile) or not written yet
+        return None
+    return {name: {tuple(map(tuple, key)): state for key, state in series} for name, series in data.items()}
+
+
+shared = SharedMetrics(METRICS_DIR, METRICS_FLUSH_SECONDS) if METRICS_DIR else None
+
+REQUEST_DURATION = registry.register(Histogram(
+    "backend_http_request_duration_seconds",
+    "HTTP request latency of the backend API"
+))
+REQUEST_ERRORS = registry.register(Counter(
+    "backend_http_errors_total",
+    "Backend API requests that failed with a 5xx status or an unhandled exception"
+))
+
+
+def _open_trace():
+    """
+    With REQUEST_TRACE_FILE set, every request is appended to it as a JSON
+    line that insightspg/load_replay.py can replay (no headers or bodies are
+    recorded). Lines are written with O_APPEND, so workers can share the file.
+    """
+    path = os.getenv("REQUEST_TRACE_FILE")
+    if not path:
+        return None
+    return os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+
+
+_trace_fd = _open_trace()
+
+
+async def metrics_middleware(request: Request, call_next):
+    """
+    Assigns a request ID and records latency and errors for every request.
+    The route template is used as label so path parameters do not explode
+    the series count.
+    """
+    if shared is not None:
+        shared.start()
+    request_id = request.headers.get("X-Request-Id") or uuid.uuid4().hex
+    request.state.request_id = request_id
+    received_at = time.time()
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        response.headers["X-Request-Id"] = request_id
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        duration = time.perf_counter() - start
+        REQUEST_DURATION.observe(
+            duration,
+            method=request.method,
+            route=path,
+            status=status_code
+        )
+        if status_code >= 500:
+            REQUEST_ERRORS.inc(method=request.method, route=path)
+        if _trace_fd is not None:
+            url_path = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+            os.write(_trace_fd, (json.dumps({
+                "ts": received_at,
+                "service": "backend",
+                "method": request.method,
+                "path": url_path,
+                "status": status_code,
+                "duration_ms": round(duration * 1000)
+            }) + "\n").encode("utf-8"))
+
+
+async def metrics_endpoint():
+    """
+    Expose the registry in the Prometheus text format, summed over all
+    workers when METRICS_DIR is set
+    """
+    body = shared.render() if shared is not None else registry.render()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
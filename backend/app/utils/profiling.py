@@ -0,0 +1,169 @@
+import contextlib
+import cProfile
+import glob
+import json
+import os
+import pstats
+import random
+import re
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+
+from app.auth.dependencies import is_admin_token
+from config.settings import PROFILE_DIR, PROFILE_KEEP, PROFILE_SAMPLE_RATE
+
+TOP_ENTRIES = 25
+
+# X-Request-Id is client supplied and becomes a file name in PROFILE_DIR;
+# anything else is replaced with "_"
+_UNSAFE_ID_CHARS = re.compile(r"[^A-Za-z0-9_-]")
+
+# cProfile allows a single active profiler per thread, and every request is
+# handled on the event loop thread: requests arriving while one is being
+# profiled are not profiled themselves
+_active = False
+
+
+def profile_id(request_id: str) -> str:
+    return _UNSAFE_ID_CHARS.sub("_", request_id)[:128]
+
+
+def _selected(request: Request) -> bool:
+    if request.headers.get("X-Profile") == "1":
+        authorization = request.headers.get("Authorization", "")
+        if authorization.startswith("Bearer ") and is_admin_token(authorization[len("Bearer "):]):
+            return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _top_functions(stats: pstats.Stats, sort_key: str) -> List[Dict]:
+    stats.sort_stats(sort_key)
+    entries = []
+    for function in stats.fcn_list[:TOP_ENTRIES]:
+        _, calls, own, cumulative, _ = stats.stats[function]
+        entries.append({
+            "function": pstats.func_std_string(function),
+            "calls": calls,
+            "own_seconds": round(own, 6),
+            "cumulative_seconds": round(cumulative, 6),
+        })
+    return entries
+
+
+def _store(profiler: cProfile.Profile, snapshot: tracemalloc.Snapshot, summary: Dict):
+    """
+    Write <id>.prof and the <id>.json summary to PROFILE_DIR, then prune
+    PROFILE_DIR to the newest PROFILE_KEEP profiles. Runs in the threadpool,
+    off the event loop.
+    """
+    stats = pstats.Stats(profiler)
+    summary["top_cumulative"] = _top_functions(stats, "cumulative")
+    summary["top_own"] = _top_functions(stats, "tottime")
+    summary["top_allocations"] = [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_bytes": stat.size,
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:TOP_ENTRIES]
+    ]
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, summary["id"])
+    profiler.dump_stats(base + ".prof")
+    # list_profiles() only looks at .json files, so writing the summary
+    # after the stats, under a temporary name, never exposes half a profile
+    with open(base + ".json.tmp", "w") as f:
+        json.dump(summary, f, indent=2)
+    os.replace(base + ".json.tmp", base + ".json")
+
+    stored = sorted(glob.glob(os.path.join(PROFILE_DIR, "*.json")), key=os.path.getmtime)
+    for path in stored[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else stored:
+        with contextlib.suppress(OSError):
+            os.remove(path)
+            os.remove(path[:-len(".json")] + ".prof")
+
+
+def list_profiles() -> List[Dict]:
+    """
+    Stored profiles, newest first, without their top-N tables
+    """
+    profiles = []
+    for path in glob.glob(os.path.join(PROFILE_DIR, "*.json")):
+        try:
+            with open(path) as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            # Pruned by another worker after the glob
+            continue
+        profiles.append({key: value for key, value in summary.items() if not key.startswith("top_")})
+    return sorted(profiles, key=lambda profile: profile["created_at"], reverse=True)
+
+
+def profile_path(request_id: str, suffix: str) -> Optional[str]:
+    """
+    Path of a stored profile file, or None if there is none for this request ID
+    """
+    if request_id != profile_id(request_id):
+        return None
+    path = os.path.join(PROFILE_DIR, request_id + suffix)
+    return path if os.path.isfile(path) else None
+
+
+async def profiling_middleware(request: Request, call_next):
+    """
+    Profile a request with cProfile and tracemalloc when an admin asks for it
+    with `X-Profile: 1`, or when it is sampled (PROFILE_SAMPLE_RATE). Requests
+    that are not profiled only pay for the header lookup and a random draw.
+
+    The profiler sees the whole event loop thread while the request runs, so
+    other requests handled concurrently show up in the profile too; profile on
+    an otherwise idle worker for a clean picture. Sync routes run in the
+    threadpool and are not seen by cProfile (all current routes are async).
+    """
+    global _active
+    if _active or not _selected(request):
+        return await call_next(request)
+
+    _active = True
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    profiler.enable()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.disable()
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+        peak = tracemalloc.get_traced_memory()[1]
+        if started_tracing:
+            tracemalloc.stop()
+        _active = False
+
+    # Set by metrics_middleware, which runs outside this one
+    request_id = getattr(request.state, "request_id", None) or request.headers.get("X-Request-Id", "")
+    summary = {
+        "id": profile_id(request_id) or f"{time.time_ns():x}",
+        "request_id": request_id,
+        "name": f"{request.method} {request.url.path}",
+        "status": response.status_code,
+        "created_at": time.time(),
+        "wall_seconds": round(wall, 6),
+        "cpu_seconds": round(cpu, 6),
+        "peak_traced_bytes": peak,
+    }
+    await run_in_threadpool(_store, profiler, snapshot, summary)
+    response.headers["X-Profile-Id"] = summary["id"]
+    return response
@@ -5,6 +5,7 @@ from fastapi import HTTPException, status
 import bcrypt
 import jwt
 import time
+import uuid
 
 def get_supabase() -> Client:
     """
@@ -47,7 +48,8 @@ def create_sales_rep_token(user_id: int, email: str, full_name: str, role: str)
         "role": role,
         "exp": int(time.time()) + JWT_EXPIRATION,
         "iat": int(time.time()),
-        "auth_type": "sales_rep"  # Identify this as a sales rep token
+        "auth_type": "sales_rep",  # Identify this as a sales rep token
+        "jti": uuid.uuid4().hex  # Lets a single token be revoked
     }
     
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
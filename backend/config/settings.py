@@ -2,6 +2,8 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 import secrets
+import tempfile
+import time
 
 # Load environment variables from .env file
 env_path = Path('.') / '.env'
@@ -33,6 +35,59 @@ ALLOWED_ORIGINS = [
 PROJECT_NAME = "supabase-auth-demo"
 
 # JWT Settings for custom authentication
-JWT_SECRET = os.getenv("JWT_SECRET", secrets.token_hex(32))
+# File holding the generated secret when JWT_SECRET is not set
+JWT_SECRET_FILE = os.getenv("JWT_SECRET_FILE", str(Path(__file__).resolve().parent.parent / ".jwt_secret"))
+
+
+def load_jwt_secret() -> str:
+    """
+    Returns the JWT signing secret: JWT_SECRET if set, otherwise the secret
+    stored in JWT_SECRET_FILE. The file is created with a random secret the
+    first time, exclusively, so every worker process (and every restart)
+    signs and verifies tokens with the same key.
+    """
+    secret = os.getenv("JWT_SECRET")
+    if secret:
+        return secret
+    path = Path(JWT_SECRET_FILE)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another worker may still be writing it
+        for _ in range(50):
+            secret = path.read_text().strip()
+            if secret:
+                return secret
+            time.sleep(0.01)
+        raise RuntimeError(f"JWT secret file {path} is empty")
+    secret = secrets.token_hex(32)
+    with os.fdopen(fd, "w") as f:
+        f.write(secret)
+    return secret
+
+
+JWT_SECRET = load_jwt_secret()
 JWT_ALGORITHM = "HS256"
-JWT_EXPIRATION = 24 * 60 * 60  # 24 hours in seconds
\ No newline at end of file
+JWT_EXPIRATION = 24 * 60 * 60  # 24 hours in seconds
+
+# Sales rep token revocation (see app/auth/revocation.py)
+REVOCATION_DB_PATH = os.getenv("REVOCATION_DB_PATH", str(Path(__file__).resolve().parent.parent / "revocations.db"))
+# How often each process pulls new revocations from the store
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "2"))
+
+# Admin endpoints (/api/admin) accept `Authorization: Bearer <ADMIN_TOKEN>`;
+# they answer 404 while it is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Opt-in request profiling (see app/utils/profiling.py): admin requests with
+# `X-Profile: 1` are always profiled, other requests with this probability
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", str(Path(tempfile.gettempdir()) / "veritas-backend-profiles"))
+# Only the newest PROFILE_KEEP profiles are kept
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+# Prometheus metrics (see app/utils/metrics.py). With METRICS_DIR set, as
+# gunicorn.conf.py does, each worker writes its metrics there every
+# METRICS_FLUSH_SECONDS and /metrics serves the sum over all workers
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
@@ -0,0 +1,57 @@
+"""
+Gunicorn settings for running the API with several worker processes:
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The app is imported once in the master before forking (preload_app), so
+settings, the JWT secret and route tables are loaded a single time and
+shared copy-on-write by the workers. Each worker runs uvicorn, which picks
+uvloop and httptools when they are installed (uvicorn[standard]).
+
+Environment overrides:
+- WEB_CONCURRENCY   number of workers (default: one per CPU core)
+- BIND              listen address (default: 0.0.0.0:5000)
+- GRACEFUL_TIMEOUT  seconds workers get to finish in-flight requests on shutdown
+- METRICS_DIR       where workers share their Prometheus metrics, so /metrics
+                    on any worker reports the sum (default: a temp directory)
+"""
+import multiprocessing
+import os
+import tempfile
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+
+# The workers are async, so one per core saturates the CPU
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+worker_class = "uvicorn.workers.UvicornWorker"
+
+preload_app = True
+
+# SIGTERM stops accepting connections and lets in-flight requests finish
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = 5
+
+# Recycle workers now and then; the jitter keeps them from restarting together
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("ACCESS_LOG") or None
+errorlog = "-"
+
+# Read by config.settings when the app is preloaded below
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"veritas-backend-metrics-{bind.rsplit(':', 1)[-1]}"))
+
+
+def on_starting(server):
+    # Counters start from zero with every server run
+    from app.utils.metrics import shared
+    if shared is not None:
+        shared.reset()
+
+
+def child_exit(server, worker):
+    # Keep the counts of recycled workers in the sum
+    from app.utils.metrics import shared
+    if shared is not None:
+        shared.archive(worker.pid)
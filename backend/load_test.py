@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Load test of GET /api/auth/me across gunicorn worker counts.
+
+For every worker count, starts `gunicorn -c gunicorn.conf.py main:app`,
+signs one sales rep token with the shared JWT secret and hammers the
+endpoint from several client processes with keep-alive connections.
+Any 401 means a worker rejected a token signed with the shared secret.
+
+    python load_test.py --workers 1,2,4 --duration 15 --clients 16
+
+Run the clients on another machine (--url) when the server host has few
+cores, otherwise the clients compete with the workers for CPU.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def client_loop(url: str, token: str, deadline: float, results):
+    """Sends requests one after another until the deadline and reports latencies."""
+    latencies = []
+    status_counts = {}
+    headers = {"Authorization": f"Bearer {token}"}
+    with httpx.Client(timeout=10) as client:
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                status_code = client.get(f"{url}/api/auth/me", headers=headers).status_code
+            except httpx.HTTPError:
+                status_code = "error"
+            latencies.append(time.perf_counter() - start)
+            status_counts[status_code] = status_counts.get(status_code, 0) + 1
+    results.put((latencies, status_counts))
+
+
+def wait_until_ready(url: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start within {timeout}s")
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(workers: int, args, token: str) -> dict:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{args.port}")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_ready(url)
+        results = multiprocessing.Queue()
+        deadline = time.time() + args.duration
+        clients = [
+            multiprocessing.Process(target=client_loop, args=(url, token, deadline, results))
+            for _ in range(args.clients)
+        ]
+        for client in clients:
+            client.start()
+        latencies, status_counts = [], {}
+        for _ in clients:
+            client_latencies, client_counts = results.get()
+            latencies.extend(client_latencies)
+            for code, count in client_counts.items():
+                status_counts[code] = status_counts.get(code, 0) + count
+        for client in clients:
+            client.join()
+    finally:
+        # SIGTERM is gunicorn's graceful shutdown
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    return {
+        "workers": workers,
+        "requests_per_second": round(status_counts.get(200, 0) / args.duration, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "non_200": {str(code): count for code, count in status_counts.items() if code != 200},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/auth/me across worker counts")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent client processes")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds per worker count")
+    parser.add_argument("--port", type=int, default=5099)
+    args = parser.parse_args()
+
+    # A generated secret shared through a fresh file, as in production without JWT_SECRET
+    os.environ.pop("JWT_SECRET", None)
+    os.environ["JWT_SECRET_FILE"] = os.path.join(tempfile.mkdtemp(prefix="veritas-load-"), "jwt_secret")
+    sys.path.insert(0, BACKEND_DIR)
+    from app.utils.supabase_client import create_sales_rep_token
+    token = create_sales_rep_token(user_id=1, email="loadtest@example.com", full_name="Load Test", role="sales_rep")
+
+    results = [run(int(count), args, token) for count in args.workers.split(",")]
+    baseline = results[0]["requests_per_second"] / results[0]["workers"]
+    for result in results:
+        ideal = baseline * result["workers"]
+        result["scaling_efficiency"] = round(result["requests_per_second"] / ideal, 2) if ideal else 0.0
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
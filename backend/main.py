@@ -1,6 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import auth
+from fastapi.responses import JSONResponse, ORJSONResponse
+from app.api import admin, auth
+from app.utils.metrics import metrics_middleware, metrics_endpoint
+from app.utils.profiling import profiling_middleware
 from config.settings import (
     API_TITLE, 
     API_DESCRIPTION, 
@@ -10,11 +13,19 @@ from config.settings import (
     DEBUG
 )
 
+try:
+    # orjson serializes responses several times faster than the stdlib json
+    import orjson  # noqa: F401
+    default_response_class = ORJSONResponse
+except ImportError:
+    default_response_class = JSONResponse
+
 app = FastAPI(
     title=API_TITLE,
     description=API_DESCRIPTION,
     version=API_VERSION,
-    debug=DEBUG
+    debug=DEBUG,
+    default_response_class=default_response_class
 )
 
 # Set up CORS middleware
@@ -26,8 +37,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in request profiling; registered first so it runs inside the metrics
+# middleware, which assigns the request ID
+app.middleware("http")(profiling_middleware)
+
+# Record request latency and error metrics
+app.middleware("http")(metrics_middleware)
+
 # Include routers
 app.include_router(auth.router, prefix=f"{API_PREFIX}/auth", tags=["Authentication"])
+app.include_router(admin.router, prefix=f"{API_PREFIX}/admin", tags=["Admin"])
 
 @app.get("/")
 async def root():
@@ -37,6 +56,10 @@ async def root():
         "version": API_VERSION
     }
 
+# Prometheus metrics endpoint
+app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+
+# Development server; use gunicorn.conf.py to run several workers
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=5000, reload=DEBUG)
\ No newline at end of file
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Provision many sales reps from a CSV file in one run.
+
+The CSV needs first_name, last_name and email columns, and may have
+phone_number and password. Reps without a password get a random one, and
+the generated credentials are written to --credentials-out.
+
+Existing user_auth and sales_reps rows are looked up with one IN query per
+chunk of emails, passwords are hashed in parallel on a process pool, and
+rows are inserted in batches. Reps that already have a user_auth row are
+skipped, so a run that failed halfway can simply be repeated. A batch that
+fails is retried row by row so every error is reported against its row.
+
+Usage:
+    python provision_sales_reps.py reps.csv --credentials-out credentials.csv
+"""
+
+import argparse
+import csv
+import os
+import secrets
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Add the project root directory to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from backend.app.utils.supabase_client import get_supabase_admin, hash_password
+
+# Emails per IN query, small enough to keep the request URL short
+LOOKUP_CHUNK_SIZE = 200
+
+
+def chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def read_reps(path: str, report: dict) -> list:
+    """
+    Read and validate the CSV rows
+    """
+    reps = []
+    seen = set()
+    with open(path, newline="") as f:
+        for line_number, row in enumerate(csv.DictReader(f), start=2):
+            email = (row.get("email") or "").strip()
+            first_name = (row.get("first_name") or "").strip()
+            last_name = (row.get("last_name") or "").strip()
+            if not email or not first_name:
+                report[f"line {line_number}"] = "error: email and first_name are required"
+                continue
+            if email in seen:
+                report[email] = f"error: duplicate email on line {line_number}"
+                continue
+            seen.add(email)
+            phone = (row.get("phone_number") or "").strip()
+            reps.append({
+                "email": email,
+                "first_name": first_name,
+                "last_name": last_name,
+                "phone_number": int(phone) if phone.isdigit() else None,
+                "password": (row.get("password") or "").strip() or None,
+            })
+    return reps
+
+
+def existing_emails(supabase, table: str, column: str, emails: list, extra_columns: str = "") -> dict:
+    """
+    Look up which emails already have a row, one IN query per chunk
+    """
+    found = {}
+    columns = column + (f", {extra_columns}" if extra_columns else "")
+    for chunk in chunks(emails, LOOKUP_CHUNK_SIZE):
+        result = supabase.table(table).select(columns).in_(column, chunk).execute()
+        for row in result.data or []:
+            found[row[column]] = row
+    return found
+
+
+def insert_batch(supabase, table: str, rows: list, keys: list, report: dict) -> list:
+    """
+    Insert rows in one request; if that fails, insert them one by one so the
+    failing rows can be reported. Returns the inserted rows, with None for
+    failures, in input order.
+    """
+    try:
+        result = supabase.table(table).insert(rows).execute()
+        if result.data and len(result.data) == len(rows):
+            return result.data
+    except Exception:
+        pass
+
+    inserted = []
+    for row, key in zip(rows, keys):
+        try:
+            result = supabase.table(table).insert(row).execute()
+            if not result.data:
+                raise RuntimeError(f"no {table} row returned")
+            inserted.append(result.data[0])
+        except Exception as e:
+            report[key] = f"error: {table} insert failed: {e}"
+            inserted.append(None)
+    return inserted
+
+
+def provision(supabase, reps: list, batch_size: int, workers: int, report: dict) -> dict:
+    """
+    Create the missing sales_reps and user_auth rows. Returns the generated
+    passwords by email.
+    """
+    emails = [rep["email"] for rep in reps]
+    with_auth = existing_emails(supabase, "user_auth", "email", emails)
+    with_rep = existing_emails(supabase, "sales_reps", "Email", emails, "sales_rep_id")
+
+    pending = []
+    for rep in reps:
+        if rep["email"] in with_auth:
+            report[rep["email"]] = "exists"
+        else:
+            pending.append(rep)
+
+    generated = {}
+    for rep in pending:
+        if rep["password"] is None:
+            rep["password"] = secrets.token_urlsafe(12)
+            generated[rep["email"]] = rep["password"]
+
+    # bcrypt is CPU-bound and deliberately slow, so hash on every core
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        hashes = list(pool.map(hash_password, [rep["password"] for rep in pending], chunksize=8))
+
+    for batch_start in range(0, len(pending), batch_size):
+        batch = pending[batch_start:batch_start + batch_size]
+        batch_hashes = hashes[batch_start:batch_start + batch_size]
+
+        # sales_reps rows left behind by an earlier, interrupted run are reused
+        new_reps = [rep for rep in batch if rep["email"] not in with_rep]
+        inserted = insert_batch(supabase, "sales_reps", [{
+            "sales_rep_first_name": rep["first_name"],
+            "sales_rep_last_name": rep["last_name"],
+            "Email": rep["email"],
+            "Phone Number": rep["phone_number"]
+        } for rep in new_reps], [rep["email"] for rep in new_reps], report)
+        for rep, row in zip(new_reps, inserted):
+            if row is not None:
+                with_rep[rep["email"]] = row
+
+        ready = [(rep, hashed) for rep, hashed in zip(batch, batch_hashes) if rep["email"] in with_rep]
+        inserted = insert_batch(supabase, "user_auth", [{
+            "email": rep["email"],
+            "Password": hashed,
+            "Full Name": f"{rep['first_name']} {rep['last_name']}".strip(),
+            "Role": "sales_rep",
+            "Is active": True
+        } for rep, hashed in ready], [rep["email"] for rep, _ in ready], report)
+        for (rep, _), row in zip(ready, inserted):
+            if row is not None:
+                report[rep["email"]] = f"created (sales_rep_id {with_rep[rep['email']]['sales_rep_id']})"
+
+        print(f"Processed {min(batch_start + batch_size, len(pending))}/{len(pending)} new reps", file=sys.stderr)
+
+    return {email: password for email, password in generated.items() if report.get(email, "").startswith("created")}
+
+
+def write_credentials(path: str, credentials: dict):
+    # Only the owner may read generated passwords
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["email", "password"])
+        for email, password in credentials.items():
+            writer.writerow([email, password])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provision sales reps from a CSV file")
+    parser.add_argument("csv_file", help="CSV with first_name, last_name, email[, phone_number, password]")
+    parser.add_argument("--batch-size", type=int, default=100, help="Rows per insert request")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes hashing passwords")
+    parser.add_argument("--credentials-out", default="credentials.csv",
+                        help="Where to write generated passwords")
+    args = parser.parse_args()
+
+    report = {}
+    reps = read_reps(args.csv_file, report)
+    if not reps:
+        print("No valid rows to provision.")
+    else:
+        credentials = provision(get_supabase_admin(), reps, args.batch_size, args.workers, report)
+        if credentials:
+            write_credentials(args.credentials_out, credentials)
+            print(f"Generated passwords for {len(credentials)} reps written to {args.credentials_out}")
+
+    print(f"\n{'Email / row':<40} Status")
+    print("=" * 80)
+    for key, outcome in report.items():
+        print(f"{key:<40} {outcome}")
+
+    errors = sum(1 for outcome in report.values() if outcome.startswith("error"))
+    print(f"\n{len(report) - errors} ok, {errors} errors")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+analysis_graph.py
+
+Declares what each analyzer's output depends on, so stored results can be
+checked for staleness without re-running anything.
+
+    transcript ──┬──────────────► call_summary   ◄── prompt:call_summary
+                 ├──────────────► buyer_intent   ◄── prompt:buyer_intent
+                 ├──────────────► custom_rag     ◄── prompt:custom_rag, benchmarks, phase_rules
+                 ├──────────────► profanity      ◄── lexicon
+                 ├──────────────► sentiment      ◄── sentiment_rules
+                 └──────────────► talk_metrics
+
+Every input node has a version string: the transcript hash, a hash of the
+benchmark_folder files, a hash of SEVERITY_LEVELS, a hash of the sentiment
+lexicon and rules, a hash of the call phase rules, or the analyzer's
+PROMPT_VERSION with its backend and model. An analyzer's fingerprint is the
+hash of the versions of its inputs; when any of them changes, only the
+analyzers downstream of it are stale.
+"""
+
+import hashlib
+import json
+import os
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# analyzer name (as used in the insights.py output) -> module and input nodes
+ANALYZERS = {
+    "call_summary": {"module": "call_summary", "inputs": ["transcript", "prompt:call_summary"]},
+    "custom_rag": {"module": "custom_rag", "inputs": ["transcript", "benchmarks", "phase_rules", "prompt:custom_rag"]},
+    "buyer_intent": {"module": "buyer_intent", "inputs": ["transcript", "prompt:buyer_intent"]},
+    "profanity": {"module": "detect_profanity", "inputs": ["transcript", "lexicon"]},
+    "sentiment": {"module": "sentiment", "inputs": ["transcript", "sentiment_rules"]},
+    "talk_metrics": {"module": None, "inputs": ["transcript"]},
+}
+
+
+def _digest(value) -> str:
+    if not isinstance(value, bytes):
+        value = json.dumps(value, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(value).hexdigest()[:16]
+
+
+def transcript_version(transcription=None, file_path: str = None) -> str:
+    """
+    The SHA-256 of the call_logs.transcription text, the same value server.js
+    stores as transcript_hash. server.js passes it to insights.py as
+    TRANSCRIPT_HASH; without it the transcript file itself is hashed.
+    """
+    if transcription is not None:
+        return hashlib.sha256(transcription.encode("utf-8")).hexdigest()
+    if os.getenv("TRANSCRIPT_HASH"):
+        return os.environ["TRANSCRIPT_HASH"]
+    with open(file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def benchmark_version(folder: str = None) -> str:
+    """Hash of the names and contents of the benchmark transcripts custom_rag.py loads."""
+    import custom_rag
+    folder = folder or os.path.join(HERE, custom_rag.BENCHMARK_FOLDER)
+    entries = []
+    if os.path.isdir(folder):
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".txt"):
+                with open(os.path.join(folder, name), "rb") as f:
+                    entries.append([name, hashlib.sha256(f.read()).hexdigest()])
+    return _digest(entries)
+
+
+def lexicon_version() -> str:
+    import detect_profanity
+    return _digest(detect_profanity.SEVERITY_LEVELS)
+
+
+def sentiment_rules_version() -> str:
+    import sentiment
+    return sentiment.rules_version()
+
+
+def phase_rules_version() -> str:
+    import call_phases
+    return call_phases.rules_version()
+
+
+def prompt_version(module_name: str) -> str:
+    import importlib
+    import llm
+    module = importlib.import_module(module_name)
+    return f"{module.PROMPT_VERSION}:{llm.endpoint_for(module_name)}"
+
+
+def input_versions(transcript_hash: str, benchmark_folder: str = None) -> dict:
+    """Current version of every input node. Only the transcript differs per call."""
+    versions = {
+        "transcript": transcript_hash,
+        "benchmarks": benchmark_version(benchmark_folder),
+        "lexicon": lexicon_version(),
+        "sentiment_rules": sentiment_rules_version(),
+        "phase_rules": phase_rules_version(),
+    }
+    for spec in ANALYZERS.values():
+        for name in spec["inputs"]:
+            if name.startswith("prompt:"):
+                versions[name] = prompt_version(name.split(":", 1)[1])
+    return versions
+
+
+def fingerprints(versions: dict, analyzers=None) -> dict:
+    """
+    Returns {"analyzers": {name: fingerprint}, "inputs": {node: version}} for
+    the given analyzers (all by default). This is what gets stored with the
+    results.
+    """
+    analyzers = list(ANALYZERS) if analyzers is None else analyzers
+    result = {"analyzers": {}, "inputs": {}}
+    for name in analyzers:
+        inputs = {node: versions[node] for node in ANALYZERS[name]["inputs"]}
+        result["analyzers"][name] = _digest(inputs)
+        result["inputs"].update(inputs)
+    return result
+
+
+def merge(stored: dict, fresh: dict) -> dict:
+    """Overlays the fingerprints of a partial re-run on the stored ones."""
+    stored = stored or {}
+    return {
+        "analyzers": {**stored.get("analyzers", {}), **fresh.get("analyzers", {})},
+        "inputs": {**stored.get("inputs", {}), **fresh.get("inputs", {})},
+    }
+
+
+def stale_analyzers(stored: dict, current: dict) -> list:
+    """Analyzers whose stored fingerprint is missing or differs from the current one."""
+    stored_analyzers = (stored or {}).get("analyzers", {})
+    return [
+        name for name, fingerprint in current["analyzers"].items()
+        if stored_analyzers.get(name) != fingerprint
+    ]
+
+
+def changed_inputs(stored: dict, current: dict) -> list:
+    """Input nodes whose version differs from the stored one (for reporting)."""
+    stored_inputs = (stored or {}).get("inputs", {})
+    return sorted(
+        node for node, version in current["inputs"].items()
+        if stored_inputs.get(node) != version
+    )
+
+
+def dependents(node: str) -> list:
+    """Analyzers downstream of an input node."""
+    return [name for name, spec in ANALYZERS.items() if node in spec["inputs"]]
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+audio_ingest.py
+
+Turns a call recording into the diarized transcript format read by insights.py
+({"transcript": [{"speaker", "text", "start", "end"}, ...]}).
+
+Pipeline:
+1. Decode  → the recording is streamed as 16 kHz mono 16-bit PCM, frame by
+             frame (ffmpeg for m4a/mp3, the wave module for .wav files), so
+             the whole file is never held in memory.
+2. Split   → an energy-based voice activity detector cuts the stream at
+             pauses, producing chunks of at most MAX_CHUNK_SECONDS.
+3. Transcribe → chunks are sent to a process pool; at most `max_in_flight`
+             chunks are pending at once, which bounds memory use.
+4. Stitch  → chunk-relative segment times are offset by the chunk start, so
+             the transcript carries real timestamps.
+
+Speech-to-text goes through a pluggable ASRBackend. "stub" is deterministic
+and needs no network (for tests); "groq" uses Groq's hosted Whisper.
+
+Usage:
+    python audio_ingest.py "../audio files/example.mp3" --backend stub --workers 4
+"""
+
+import argparse
+import array
+import hashlib
+import io
+import json
+import math
+import os
+import subprocess
+import sys
+import wave
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import telemetry
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+SAMPLE_WIDTH = 2  # 16-bit PCM
+
+# Voice activity detection settings
+SILENCE_THRESHOLD_DBFS = -40.0
+MIN_SILENCE_MS = 500
+MIN_CHUNK_SECONDS = 2.0
+MAX_CHUNK_SECONDS = 30.0
+
+
+class AudioChunk:
+    """A contiguous span of speech cut out of the recording."""
+
+    def __init__(self, index: int, start: float, pcm: bytes, sample_rate: int = SAMPLE_RATE):
+        self.index = index
+        self.start = start
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / (SAMPLE_WIDTH * self.sample_rate)
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+
+def decode_frames(file_path: str, sample_rate: int = SAMPLE_RATE, frame_ms: int = FRAME_MS):
+    """
+    Yields fixed-size frames of mono 16-bit PCM decoded from file_path.
+    WAV files that are already mono 16-bit at the target rate are read
+    directly; everything else is decoded by an ffmpeg subprocess.
+    """
+    frame_bytes = int(sample_rate * frame_ms / 1000) * SAMPLE_WIDTH
+
+    if file_path.lower().endswith(".wav"):
+        with wave.open(file_path, "rb") as wav:
+            if (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) == (1, SAMPLE_WIDTH, sample_rate):
+                while True:
+                    frame = wav.readframes(frame_bytes // SAMPLE_WIDTH)
+                    if not frame:
+                        return
+                    yield frame
+
+    process = subprocess.Popen(
+        [
+            "ffmpeg", "-nostdin", "-loglevel", "error",
+            "-i", file_path,
+            "-f", "s16le", "-acodec", "pcm_s16le",
+            "-ac", "1", "-ar", str(sample_rate),
+            "-"
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    try:
+        while True:
+            frame = process.stdout.read(frame_bytes)
+            if not frame:
+                break
+            yield frame
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read().decode("utf-8", errors="replace")
+        process.stderr.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to decode {file_path}: {stderr.strip()}")
+
+
+def frame_dbfs(frame: bytes) -> float:
+    """Returns the RMS level of a 16-bit PCM frame in dBFS."""
+    samples = array.array("h")
+    samples.frombytes(frame[:len(frame) - len(frame) % SAMPLE_WIDTH])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    if not samples:
+        return -math.inf
+    rms = math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+    return 20 * math.log10(rms / 32768) if rms > 0 else -math.inf
+
+
+def split_on_silence(
+    frames,
+    sample_rate: int = SAMPLE_RATE,
+    frame_ms: int = FRAME_MS,
+    threshold_dbfs: float = SILENCE_THRESHOLD_DBFS,
+    min_silence_ms: int = MIN_SILENCE_MS,
+    min_chunk_seconds: float = MIN_CHUNK_SECONDS,
+    max_chunk_seconds: float = MAX_CHUNK_SECONDS,
+):
+    """
+    Groups PCM frames into AudioChunks. A chunk is closed at the first pause
+    of at least min_silence_ms once it is min_chunk_seconds long, and is cut
+    unconditionally at max_chunk_seconds. Leading silence and chunks without
+    any speech are dropped.
+    """
+    silence_frames_to_cut = max(1, min_silence_ms // frame_ms)
+    min_frames = int(min_chunk_seconds * 1000 / frame_ms)
+    max_frames = int(max_chunk_seconds * 1000 / frame_ms)
+
+    index = 0
+    position = 0  # frames consumed so far
+    chunk_start = 0
+    buffer = []
+    has_speech = False
+    silent_run = 0
+
+    def flush():
+        nonlocal index, buffer, has_speech, silent_run
+        chunk = None
+        if has_speech:
+            # Trim the trailing pause, it carries no speech
+            kept = buffer[:len(buffer) - silent_run] if silent_run < len(buffer) else buffer
+            chunk = AudioChunk(index, chunk_start * frame_ms / 1000, b"".join(kept), sample_rate)
+            index += 1
+        buffer = []
+        has_speech = False
+        silent_run = 0
+        return chunk
+
+    for frame in frames:
+        is_speech = frame_dbfs(frame) > threshold_dbfs
+        position += 1
+
+        if not buffer and not is_speech:
+            # Skip silence between chunks
+            chunk_start = position
+            continue
+
+        buffer.append(frame)
+        has_speech = has_speech or is_speech
+        silent_run = 0 if is_speech else silent_run + 1
+
+        if (silent_run >= silence_frames_to_cut and len(buffer) >= min_frames) or len(buffer) >= max_frames:
+            chunk = flush()
+            chunk_start = position
+            if chunk is not None:
+                yield chunk
+
+    chunk = flush()
+    if chunk is not None:
+        yield chunk
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Wraps raw PCM in an in-memory WAV container."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class ASRBackend:
+    """
+    Interface for speech-to-text backends. transcribe() receives one chunk of
+    mono 16-bit PCM and returns segments with times relative to the chunk:
+    [{"text": str, "start": float, "end": float, "speaker": str (optional)}]
+    """
+    name = "base"
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> list:
+        raise NotImplementedError
+
+
+class StubBackend(ASRBackend):
+    """
+    Deterministic backend for tests: the same audio always yields the same
+    text, derived from a hash of the PCM data. Needs no network.
+    """
+    name = "stub"
+    WORDS = ["pricing", "demo", "integration", "timeline", "budget", "follow", "up", "team", "contract", "support"]
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> list:
+        duration = len(pcm) / (SAMPLE_WIDTH * sample_rate)
+        digest = hashlib.sha256(pcm).digest()
+        word_count = max(1, int(duration * 2))
+        words = [self.WORDS[digest[i % len(digest)] % len(self.WORDS)] for i in range(word_count)]
+        return [{"text": " ".join(words), "start": 0.0, "end": round(duration, 2)}]
+
+
+class GroqWhisperBackend(ASRBackend):
+    """Transcribes chunks with Whisper hosted on Groq."""
+    name = "groq"
+
+    def __init__(self, model: str = None):
+        import llm
+        llm.load_env()
+        import groq
+        self.client = groq.Groq(api_key=os.getenv("GROQ_API_KEY"))
+        self.model = model or os.getenv("ASR_MODEL", "whisper-large-v3")
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> list:
+        response = self.client.audio.transcriptions.create(
+            file=("chunk.wav", pcm_to_wav(pcm, sample_rate)),
+            model=self.model,
+            response_format="verbose_json"
+        )
+        segments = getattr(response, "segments", None) or []
+        if not segments:
+            duration = len(pcm) / (SAMPLE_WIDTH * sample_rate)
+            return [{"text": response.text.strip(), "start": 0.0, "end": round(duration, 2)}]
+        return [
+            {
+                "text": (segment["text"] if isinstance(segment, dict) else segment.text).strip(),
+                "start": segment["start"] if isinstance(segment, dict) else segment.start,
+                "end": segment["end"] if isinstance(segment, dict) else segment.end,
+            }
+            for segment in segments
+        ]
+
+
+BACKENDS = {
+    StubBackend.name: StubBackend,
+    GroqWhisperBackend.name: GroqWhisperBackend,
+}
+
+# Backend instance of the current worker process, created on first use
+_worker_backend = None
+
+
+def _transcribe_chunk(backend_name: str, index: int, start: float, pcm: bytes, sample_rate: int):
+    """Process pool entry point: transcribes one chunk and offsets its segment times."""
+    global _worker_backend
+    if _worker_backend is None or _worker_backend.name != backend_name:
+        _worker_backend = BACKENDS[backend_name]()
+    with telemetry.span("audio.transcribe_chunk", backend=backend_name, chunk=index) as current:
+        segments = _worker_backend.transcribe(pcm, sample_rate)
+        current.set(segments=len(segments))
+    return index, [
+        {
+            "speaker": segment.get("speaker", "Speaker 1"),
+            "text": segment["text"],
+            "start": round(start + segment["start"], 2),
+            "end": round(start + segment["end"], 2),
+        }
+        for segment in segments
+        if segment.get("text")
+    ]
+
+
+def transcribe_file(file_path: str, backend: str = "stub", workers: int = None, max_in_flight: int = None) -> dict:
+    """
+    Transcribes a recording in parallel and returns it in the
+    diarized-transcript.json format.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ASR backend '{backend}', expected one of: {', '.join(BACKENDS)}")
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    results = {}
+
+    with telemetry.span("audio.ingest", file=os.path.basename(file_path), backend=backend) as current:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            chunk_count = 0
+            for chunk in split_on_silence(decode_frames(file_path)):
+                chunk_count += 1
+                pending.add(pool.submit(_transcribe_chunk, backend, chunk.index, chunk.start, chunk.pcm, chunk.sample_rate))
+                # Backpressure: stop decoding until a worker frees a slot
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, segments = future.result()
+                        results[index] = segments
+            for future in pending:
+                index, segments = future.result()
+                results[index] = segments
+        current.set(chunks=chunk_count)
+
+    transcript = [segment for index in sorted(results) for segment in results[index]]
+    return {"transcript": transcript}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe a call recording into diarized-transcript.json format")
+    parser.add_argument("audio_file", help="Path to an audio file (m4a, mp3, wav, ...)")
+    parser.add_argument("--backend", default=os.getenv("ASR_BACKEND", "stub"), choices=sorted(BACKENDS))
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--output", default=None,
+                        help="Write the transcript here instead of stdout; *.vtc files use transcript_codec.py")
+    args = parser.parse_args()
+
+    result = transcribe_file(args.audio_file, backend=args.backend, workers=args.workers)
+    if args.output and args.output.endswith(".vtc"):
+        import transcript_codec
+        with open(args.output, "wb") as f:
+            f.write(transcript_codec.encode(result))
+        print(f"Wrote {len(result['transcript'])} segments to {args.output}", file=sys.stderr)
+    elif args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Wrote {len(result['transcript'])} segments to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
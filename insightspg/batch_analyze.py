@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+batch_analyze.py
+
+Runs the LLM analyzers over many transcript files in one process, with a
+thread per in-flight call, and writes one JSON line per transcript. With a
+backend that supports batching and LLM_BATCH_WINDOW_MS set, the concurrent
+requests are grouped into micro-batches (see llm_backends.py).
+
+Its LLM calls are scheduled as batch work (llm_governor.py), behind
+interactive and live requests and within the organization's daily budget.
+
+Usage:
+    LLM_BACKEND=stub LLM_BATCH_WINDOW_MS=20 python batch_analyze.py transcripts/*.json --workers 16
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import buyer_intent
+import call_summary
+import custom_rag
+import telemetry
+
+ANALYZERS = {
+    "call_summary": call_summary.generate_summary,
+    "buyer_intent": buyer_intent.process_intent,
+    "custom_rag": custom_rag.analyze_sales_call,
+}
+
+
+def analyze_file(path: str, analyzers: list) -> dict:
+    result = {"transcript": path}
+    for name in analyzers:
+        try:
+            result[name] = ANALYZERS[name](path)
+        except Exception as e:
+            print(f"{name} failed for {path}: {e}", file=sys.stderr)
+            result[name] = None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze many transcript files in one process")
+    parser.add_argument("transcripts", nargs="+", help="diarized-transcript.json style files")
+    parser.add_argument("--analyzers", default=",".join(ANALYZERS), help="Comma-separated analyzers to run")
+    parser.add_argument("--workers", type=int, default=8, help="Transcripts analyzed concurrently")
+    parser.add_argument("--output", default=None, help="Write JSON lines here instead of stdout")
+    parser.add_argument("--priority", default="batch", choices=["interactive", "live", "batch"],
+                        help="LLM scheduling class of the calls (see llm_governor.py)")
+    parser.add_argument("--organization", default=None, help="Organization charged for the tokens")
+    args = parser.parse_args()
+
+    os.environ["LLM_PRIORITY"] = args.priority
+    if args.organization:
+        os.environ["LLM_ORGANIZATION"] = args.organization
+
+    analyzers = [name.strip() for name in args.analyzers.split(",") if name.strip() in ANALYZERS]
+    output = open(args.output, "w") if args.output else sys.stdout
+    started = time.monotonic()
+    try:
+        with telemetry.span("batch_analyze", transcripts=len(args.transcripts), workers=args.workers):
+            with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                for result in pool.map(lambda path: analyze_file(path, analyzers), args.transcripts):
+                    output.write(json.dumps(result) + "\n")
+    finally:
+        if args.output:
+            output.close()
+    elapsed = time.monotonic() - started
+    print(f"Analyzed {len(args.transcripts)} transcripts in {elapsed:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+"""
+benchmark_library.py
+
+The benchmark library custom_rag.py compares calls against, and the
+retrieval index over it.
+
+The index represents each benchmark as hashed term counts: tokens are
+hashed into 2**18 buckets, so there is no vocabulary to fit and adding a
+benchmark never touches the others. Vectors are appended to
+benchmark_index/vectors.bin and listed in benchmark_index/manifest.json
+with the SHA-256 of their file; sync() vectorizes only files that are new
+or changed and drops removed ones. IDF weights are derived from the
+document frequencies of the stored vectors (smoothed as in sklearn's
+TfidfVectorizer), so similarities keep TF-IDF cosine semantics while only
+new documents are read and vectorized.
+
+The texts are packed into benchmark_index/corpus.bin, and a persisting sync
+writes the prepared matrix to benchmark_index/matrix.bin. Every stored
+weight depends on the IDF of the whole library, so that write recomputes
+and rewrites the full matrix, O(total nnz), even when a single benchmark
+was added. Both files are memory-mapped read-only. While the matrix matches
+the benchmark files, a process maps it without reading any vector or text,
+and text() reads only the span it is asked for. Memory per worker therefore
+stays flat as the library grows, and the pages are shared between workers.
+
+Curation promotes analyzed calls into benchmark_folder:
+- candidates are calls with a call_summary rating of at least --min-rating
+  and a Closed outcome, analyzed since the last run;
+- a candidate whose word 5-shingles overlap an active benchmark by Jaccard
+  similarity --duplicate-threshold or more is skipped;
+- curated benchmarks older than --max-age-days, and the lowest rated ones
+  beyond --max-curated, are retired to benchmark_folder/retired/.
+Hand-placed benchmarks are never promoted over or retired. Provenance and
+the watermark are kept in benchmark_folder/library.json. Any change to the
+folder changes analysis_graph's benchmarks version, so reanalyze.py re-runs
+custom_rag for calls analyzed against the old set.
+
+Usage:
+    python benchmark_library.py sync               # index new or edited benchmark files
+    python benchmark_library.py curate --dry-run   # what would be promoted and retired
+    python benchmark_library.py curate
+    python benchmark_library.py match diarized-transcript.json
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import telemetry
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_FOLDER = os.path.join(HERE, "benchmark_folder")
+DEFAULT_INDEX_DIR = os.path.join(HERE, "benchmark_index")
+RETIRED_FOLDER = "retired"
+LIBRARY_FILE = "library.json"
+
+HASH_BITS = 18
+# Same tokens as TfidfVectorizer's default token_pattern
+TOKEN = re.compile(r"(?u)\b\w\w+\b")
+# Documents scored per step of similarities()
+SCORE_BLOCK = 4096
+MATRIX_ALIGNMENT = 8
+
+MIN_RATING = 85
+MAX_CURATED = 30
+MAX_AGE_DAYS = 365
+DUPLICATE_THRESHOLD = 0.5
+# Calls analyzed while a run is in progress are picked up by the next one
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+
+def vectorize(text: str):
+    """Returns the sorted bucket ids and term counts of text, as uint32 and float32 arrays."""
+    import numpy as np
+
+    tokens = TOKEN.findall((text or "").lower())
+    buckets = np.fromiter(
+        (zlib.crc32(token.encode("utf-8")) for token in tokens), dtype=np.uint32, count=len(tokens)
+    ) & np.uint32((1 << HASH_BITS) - 1)
+    indices, counts = np.unique(buckets, return_counts=True)
+    return indices.astype(np.uint32), counts.astype(np.float32)
+
+
+def benchmark_files(folder: str) -> list:
+    """The .txt files custom_rag.py loads, sorted by name."""
+    if not os.path.isdir(folder):
+        return []
+    return sorted(name for name in os.listdir(folder) if name.endswith(".txt"))
+
+
+def _map(path: str):
+    """Read-only memory map of path, or None if it is missing or empty."""
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError:
+        return None
+
+
+class BenchmarkIndex:
+    """
+    Hashed term vectors and packed texts of the benchmark files. Build it
+    with sync(); pass persist=True to append new benchmarks to the index
+    directory (the analyzer only vectorizes stale files in memory, so
+    concurrent runs never write).
+
+    Documents are small dicts (filename, sha256, and the span of the text
+    in corpus.bin); read a transcript with text().
+    """
+
+    def __init__(self, folder: str = BENCHMARK_FOLDER, index_dir: str = DEFAULT_INDEX_DIR):
+        self.folder = folder
+        self.index_dir = index_dir
+        self.manifest_path = os.path.join(index_dir, "manifest.json")
+        self.vectors_path = os.path.join(index_dir, "vectors.bin")
+        self.corpus_path = os.path.join(index_dir, "corpus.bin")
+        self.matrix_path = os.path.join(index_dir, "matrix.bin")
+        try:
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {"documents": {}}
+        self.documents = []
+        self._maps = {}
+        self._idf = None
+
+    def _open(self, path: str):
+        # Maps stay open for the life of the index; numpy views point into them
+        if path not in self._maps:
+            self._maps[path] = _map(path)
+        return self._maps[path]
+
+    def _read_vector(self, entry: dict):
+        import numpy as np
+
+        vectors = self._open(self.vectors_path)
+        nnz = entry["nnz"]
+        if vectors is None or entry["offset"] + nnz * 8 > len(vectors):
+            raise ValueError("vector outside vectors.bin")
+        indices = np.frombuffer(vectors, dtype=np.uint32, count=nnz, offset=entry["offset"])
+        counts = np.frombuffer(vectors, dtype=np.float32, count=nnz, offset=entry["offset"] + nnz * 4)
+        return indices, counts
+
+    def _read_file(self, name: str) -> str:
+        with open(os.path.join(self.folder, name), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def text(self, document: dict, limit: int = None) -> str:
+        """
+        Returns the transcript of document, or its first limit characters.
+        Only that span of corpus.bin is read; benchmarks not yet synced with
+        persist=True are held in memory.
+        """
+        if "transcript" in document:
+            return document["transcript"][:limit]
+        corpus = self._open(self.corpus_path)
+        start = document["text_offset"]
+        # A character takes at most 4 bytes in UTF-8
+        size = document["text_bytes"] if limit is None else min(document["text_bytes"], limit * 4)
+        if corpus is None or start + size > len(corpus):
+            raise ValueError("text outside corpus.bin")
+        # A span cut inside a character only loses that character
+        return corpus[start:start + size].decode("utf-8", errors="ignore")[:limit]
+
+    def sync(self, persist: bool = False) -> dict:
+        """
+        Loads the index for the current benchmark files. Files whose size
+        and modification time match the manifest are not read; the others
+        are hashed and vectorized if they are new or changed. When the
+        stored matrix covers exactly the current files, it is mapped as is.
+        Returns the names of the added and removed documents.
+        """
+        with telemetry.span("benchmarks.sync", persist=persist) as current:
+            stored = self.manifest["documents"]
+            files = []
+            for name in benchmark_files(self.folder):
+                try:
+                    stat = os.stat(os.path.join(self.folder, name))
+                    entry = stored.get(name)
+                    if entry is not None and [entry.get("size"), entry.get("mtime_ns")] == [stat.st_size, stat.st_mtime_ns]:
+                        files.append((name, entry["sha256"], None, stat))
+                        continue
+                    transcript = self._read_file(name)
+                except Exception as e:
+                    print(f"Error loading benchmark file {name}: {str(e)}", file=sys.stderr)
+                    continue
+                files.append((name, hashlib.sha256(transcript.encode("utf-8")).hexdigest(), transcript, stat))
+            live = {name for name, _, _, _ in files}
+            removed = sorted(name for name in stored if name not in live)
+
+            if not persist and self._map_matrix(files):
+                self.documents = [
+                    {"filename": name, "sha256": digest, "text_offset": stored[name]["text_offset"],
+                     "text_bytes": stored[name]["text_bytes"]}
+                    for name, digest, _, _ in files
+                ]
+                current.set(documents=len(self.documents), added=0, removed=len(removed), mapped=True)
+                return {"added": [], "removed": removed}
+
+            documents = []
+            added = []
+            for name, digest, transcript, stat in files:
+                entry = stored.get(name)
+                vector = None
+                if entry is not None and entry["sha256"] == digest and "text_offset" in entry:
+                    try:
+                        vector = self._read_vector(entry)
+                    except ValueError:
+                        # Index rebuilt underneath us; vectorize again
+                        vector = None
+                if vector is not None:
+                    indices, counts = vector
+                    documents.append({"filename": name, "sha256": digest, "text_offset": entry["text_offset"],
+                                      "text_bytes": entry["text_bytes"], "indices": indices, "counts": counts})
+                    continue
+                if transcript is None:
+                    transcript = self._read_file(name)
+                indices, counts = vectorize(transcript)
+                added.append(name)
+                documents.append({"filename": name, "sha256": digest, "transcript": transcript,
+                                  "indices": indices, "counts": counts})
+
+            if persist:
+                os.makedirs(self.index_dir, exist_ok=True)
+                with open(self.vectors_path, "ab") as vectors, open(self.corpus_path, "ab") as corpus:
+                    for document in documents:
+                        if "transcript" not in document:
+                            continue
+                        data = document.pop("transcript").encode("utf-8")
+                        stored[document["filename"]] = {
+                            "sha256": document["sha256"],
+                            "offset": vectors.tell(),
+                            "nnz": len(document["indices"]),
+                            "text_offset": corpus.tell(),
+                            "text_bytes": len(data),
+                        }
+                        document.update(text_offset=corpus.tell(), text_bytes=len(data))
+                        vectors.write(document["indices"].tobytes())
+                        vectors.write(document["counts"].tobytes())
+                        corpus.write(data)
+                for name in removed:
+                    del stored[name]
+                for name, _, _, stat in files:
+                    stored[name].update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                # The appended files have to be mapped again
+                self._maps = {}
+
+            self.documents = documents
+            self._prepare()
+            if persist:
+                # The matrix goes first: a reader holding the old manifest
+                # sees a mismatch and falls back to the vectors
+                self._write_matrix()
+                self._save_manifest()
+            current.set(documents=len(self.documents), added=len(added), removed=len(removed), mapped=False)
+        return {"added": added, "removed": removed}
+
+    def _save_manifest(self):
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def rebuild(self):
+        """Rewrites the index with only the live benchmarks, reclaiming space left by edited or removed files."""
+        self.manifest = {"documents": {}}
+        self._maps = {}
+        for path in (self.vectors_path, self.corpus_path, self.matrix_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return self.sync(persist=True)
+
+    def _prepare(self):
+        """Computes IDF weights and the L2-normalized TF-IDF values of all documents."""
+        import numpy as np
+
+        self._idf = None
+        if not self.documents:
+            return
+        self._indices = np.concatenate([document["indices"] for document in self.documents])
+        lengths = np.array([len(document["indices"]) for document in self.documents])
+        self._starts = np.concatenate([[0], np.cumsum(lengths)]).astype(np.uint64)
+        owners = np.repeat(np.arange(len(self.documents)), lengths)
+        df = np.bincount(self._indices, minlength=1 << HASH_BITS)
+        # Smooth IDF, as TfidfVectorizer(smooth_idf=True)
+        self._idf = (np.log((1 + len(self.documents)) / (1 + df)) + 1).astype(np.float32)
+        weights = np.concatenate([document["counts"] for document in self.documents]) * self._idf[self._indices]
+        norms = np.sqrt(np.bincount(owners, weights=weights * weights, minlength=len(self.documents)))
+        self._weights = weights / np.maximum(norms, 1e-12)[owners]
+        self._known = (df > 0).astype(np.uint8)
+
+    def _write_matrix(self):
+        """
+        Writes the prepared TF-IDF matrix to matrix.bin: a JSON header naming
+        the documents, then idf, known, starts, weights and indices.
+        """
+        if self._idf is None:
+            if os.path.exists(self.matrix_path):
+                os.remove(self.matrix_path)
+            return
+        header = json.dumps({
+            "documents": [[document["filename"], document["sha256"]] for document in self.documents],
+            "nnz": len(self._indices),
+        }).encode("utf-8")
+        header += b" " * (-(len(header) + 8) % MATRIX_ALIGNMENT)
+        temp_path = self.matrix_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for array in (self._idf, self._known, self._starts, self._weights, self._indices):
+                f.write(array.tobytes())
+        os.replace(temp_path, self.matrix_path)
+
+    def _map_matrix(self, files: list) -> bool:
+        """
+        Maps matrix.bin if it was written for exactly these (name, sha256)
+        files in this order. Nothing is copied: every worker shares the pages.
+        """
+        import numpy as np
+
+        matrix = _map(self.matrix_path)
+        if matrix is None or not files:
+            return False
+        try:
+            (header_size,) = struct.unpack_from("<Q", matrix)
+            header = json.loads(matrix[8:8 + header_size])
+        except (struct.error, ValueError):
+            return False
+        stored = self.manifest["documents"]
+        if header["documents"] != [[name, digest] for name, digest, _, _ in files] or any(
+            "text_offset" not in stored.get(name, {}) for name, _, _, _ in files
+        ):
+            return False
+        offset = 8 + header_size
+        arrays = []
+        for dtype, count in ((np.float32, 1 << HASH_BITS), (np.uint8, 1 << HASH_BITS), (np.uint64, len(files) + 1),
+                             (np.float64, header["nnz"]), (np.uint32, header["nnz"])):
+            arrays.append(np.frombuffer(matrix, dtype=dtype, count=count, offset=offset))
+            offset += arrays[-1].nbytes
+        self._idf, self._known, self._starts, self._weights, self._indices = arrays
+        return True
+
+    def similarities(self, text: str):
+        """Cosine similarity of text to every benchmark, in the order of self.documents."""
+        import numpy as np
+
+        if self._idf is None:
+            return np.zeros(0)
+        indices, counts = vectorize(text)
+        # As with a fitted vectorizer, terms no benchmark contains are ignored
+        keep = self._known[indices].astype(bool)
+        indices = indices[keep]
+        weights = counts[keep] * self._idf[indices]
+        norm = np.sqrt((weights * weights).sum())
+        if not norm:
+            return np.zeros(len(self.documents))
+        query = np.zeros(1 << HASH_BITS, dtype=np.float32)
+        query[indices] = weights / norm
+        # Blocks of documents bound the temporaries, however large the library
+        scores = np.empty(len(self.documents))
+        for first in range(0, len(self.documents), SCORE_BLOCK):
+            last = min(first + SCORE_BLOCK, len(self.documents))
+            start, end = int(self._starts[first]), int(self._starts[last])
+            owners = np.repeat(np.arange(last - first), np.diff(self._starts[first:last + 1]).astype(np.int64))
+            scores[first:last] = np.bincount(
+                owners, weights=query[self._indices[start:end]] * self._weights[start:end], minlength=last - first
+            )
+        return scores
+
+    def best_match(self, text: str):
+        """Returns (document dict, similarity) of the most similar benchmark, or (None, 0.0)."""
+        similarities = self.similarities(text)
+        if not len(similarities):
+            return None, 0.0
+        best = int(similarities.argmax())
+        return self.documents[best], float(similarities[best])
+
+
+def load_library(folder: str = BENCHMARK_FOLDER) -> dict:
+    try:
+        with open(os.path.join(folder, LIBRARY_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"watermark": None, "curated": {}, "retired": {}}
+
+
+def save_library(library: dict, folder: str = BENCHMARK_FOLDER):
+    path = os.path.join(folder, LIBRARY_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(library, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def fetch_candidates(watermark, min_rating: int, page_size: int = 500) -> list:
+    """
+    Closed calls with a rating of at least min_rating analyzed after
+    watermark (an ISO timestamp, or None for all), with their transcription.
+    """
+    import db
+
+    def filters(query):
+        query = query.gte("rating", min_rating)
+        return query.gt("processed_at", watermark) if watermark else query
+
+    rated = {
+        row["call_id"]: row
+        for row in db.iter_rows(
+            "call_insights", "call_id, sales_rep_id, call_date, rating, processed_at",
+            key="call_id", batch_size=page_size, filters=filters
+        )
+    }
+    candidates = []
+    call_ids = sorted(rated)
+    supabase = db.get_supabase()
+    # One IN query per chunk keeps the request URL short
+    for start in range(0, len(call_ids), 200):
+        result = supabase.table("call_logs").select("call_id, call_outcome, transcription") \
+            .in_("call_id", call_ids[start:start + 200]).eq("call_outcome", "Closed") \
+            .not_.is_("transcription", "null").execute()
+        for row in result.data or []:
+            candidates.append(dict(rated[row["call_id"]], transcription=row["transcription"]))
+    return candidates
+
+
+def _jaccard(first, second) -> float:
+    import numpy as np
+
+    if not len(first) or not len(second):
+        return 0.0
+    shared = len(np.intersect1d(first, second, assume_unique=True))
+    return shared / (len(first) + len(second) - shared)
+
+
+def curate(folder: str = BENCHMARK_FOLDER, index_dir: str = DEFAULT_INDEX_DIR, min_rating: int = MIN_RATING,
+           max_curated: int = MAX_CURATED, max_age_days: int = MAX_AGE_DAYS,
+           duplicate_threshold: float = DUPLICATE_THRESHOLD, dry_run: bool = False) -> dict:
+    """
+    Runs one curation pass and updates the index. Returns the promoted,
+    duplicate and retired benchmarks.
+    """
+    # numpy-based shingling, only needed here
+    import near_duplicates
+
+    library = load_library(folder)
+    curated = library.setdefault("curated", {})
+    retired = library.setdefault("retired", {})
+    started = datetime.now(timezone.utc)
+    report = {"promoted": [], "duplicates": [], "retired": []}
+
+    with telemetry.span("benchmarks.curate", dry_run=dry_run) as current:
+        candidates = fetch_candidates(library.get("watermark"), min_rating)
+        current.set(candidates=len(candidates))
+
+        # Retire by age first, so stale benchmarks do not block newer near-copies
+        cutoff = (started - timedelta(days=max_age_days)).replace(tzinfo=None).isoformat()
+        stale = {name for name, entry in curated.items() if (entry.get("call_date") or entry["added_at"]) < cutoff}
+
+        active = {}
+        for name in benchmark_files(folder):
+            if name not in stale:
+                with open(os.path.join(folder, name), encoding="utf-8") as f:
+                    active[name] = near_duplicates.shingles(f.read())
+
+        known_calls = {entry["call_id"] for entry in list(curated.values()) + list(retired.values())}
+        # Best rated first, newest first among equals
+        candidates.sort(key=lambda row: (row.get("rating") or 0, str(row.get("call_date") or "")), reverse=True)
+        new_entries = {}
+        for row in candidates:
+            if row["call_id"] in known_calls or (row.get("call_date") and row["call_date"] < cutoff):
+                continue
+            call_shingles = near_duplicates.shingles(row["transcription"])
+            closest, similarity = max(
+                ((name, _jaccard(call_shingles, shingles)) for name, shingles in active.items()),
+                key=lambda item: item[1], default=(None, 0.0)
+            )
+            if similarity >= duplicate_threshold:
+                report["duplicates"].append({"call_id": row["call_id"], "of": closest, "similarity": round(similarity, 3)})
+                continue
+            name = f"call_{row['call_id']}.txt"
+            active[name] = call_shingles
+            new_entries[name] = {
+                "call_id": row["call_id"],
+                "sales_rep_id": row.get("sales_rep_id"),
+                "call_date": row.get("call_date"),
+                "rating": row.get("rating"),
+                "transcription": row["transcription"],
+            }
+
+        # Keep the best max_curated of the remaining and new curated benchmarks
+        ranked = sorted(
+            [(name, entry) for name, entry in curated.items() if name not in stale] + list(new_entries.items()),
+            key=lambda item: (item[1].get("rating") or 0, str(item[1].get("call_date") or "")),
+            reverse=True
+        )
+        keep = {name for name, _ in ranked[:max_curated]}
+        retiring = {name: "stale" for name in stale}
+        retiring.update({name: "capacity" for name in curated if name not in keep and name not in stale})
+        promoting = {name: entry for name, entry in new_entries.items() if name in keep}
+
+        report["promoted"] = [{"file": name, "call_id": entry["call_id"], "rating": entry["rating"]}
+                              for name, entry in sorted(promoting.items())]
+        report["retired"] = [{"file": name, "reason": reason} for name, reason in sorted(retiring.items())]
+        current.set(promoted=len(promoting), retired=len(retiring), duplicates=len(report["duplicates"]))
+        if dry_run:
+            return report
+
+        retired_folder = os.path.join(folder, RETIRED_FOLDER)
+        for name, reason in retiring.items():
+            os.makedirs(retired_folder, exist_ok=True)
+            if os.path.exists(os.path.join(folder, name)):
+                shutil.move(os.path.join(folder, name), os.path.join(retired_folder, name))
+            retired[name] = dict(curated.pop(name), reason=reason, retired_at=started.isoformat())
+        for name, entry in promoting.items():
+            with open(os.path.join(folder, name), "w", encoding="utf-8") as f:
+                f.write(entry.pop("transcription"))
+            curated[name] = dict(entry, added_at=started.isoformat())
+
+        library["watermark"] = (started - WATERMARK_OVERLAP).isoformat()
+        save_library(library, folder)
+        BenchmarkIndex(folder, index_dir).sync(persist=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark library curation and retrieval index")
+    parser.add_argument("--folder", default=BENCHMARK_FOLDER)
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sync_parser = subparsers.add_parser("sync", help="Index new or edited benchmark files")
+    sync_parser.add_argument("--rebuild", action="store_true", help="Rewrite the index from scratch")
+    curate_parser = subparsers.add_parser("curate", help="Promote top-rated closed calls and retire stale benchmarks")
+    curate_parser.add_argument("--min-rating", type=int, default=MIN_RATING)
+    curate_parser.add_argument("--max-curated", type=int, default=MAX_CURATED)
+    curate_parser.add_argument("--max-age-days", type=int, default=MAX_AGE_DAYS)
+    curate_parser.add_argument("--duplicate-threshold", type=float, default=DUPLICATE_THRESHOLD)
+    curate_parser.add_argument("--dry-run", action="store_true")
+    match_parser = subparsers.add_parser("match", help="Rank the benchmarks against a diarized transcript")
+    match_parser.add_argument("transcript")
+    args = parser.parse_args()
+
+    if args.command == "sync":
+        index = BenchmarkIndex(args.folder, args.index_dir)
+        result = index.rebuild() if args.rebuild else index.sync(persist=True)
+        print(json.dumps(dict(result, documents=len(index.documents)), indent=2))
+    elif args.command == "curate":
+        report = curate(
+            args.folder, args.index_dir, args.min_rating, args.max_curated,
+            args.max_age_days, args.duplicate_threshold, args.dry_run
+        )
+        print(json.dumps(report, indent=2))
+    else:
+        import transcripts
+
+        index = BenchmarkIndex(args.folder, args.index_dir)
+        index.sync()
+        text = transcripts.transcript_to_text(transcripts.load_transcript(args.transcript))
+        ranked = sorted(zip(index.documents, index.similarities(text)), key=lambda item: -item[1])
+        print(json.dumps([
+            {"benchmark": document["filename"], "similarity": round(float(score) * 100, 2)}
+            for document, score in ranked
+        ], indent=2))
+
+
+if __name__ == "__main__":
+    main()
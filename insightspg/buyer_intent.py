@@ -1,10 +1,12 @@
 import os
 import json
 import sys
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+import local_fallbacks
+import transcripts
+
+# Bump when the prompt changes; stored results with an older version are re-run by reanalyze.py
+PROMPT_VERSION = "1"
 
 # Define the intent labels
 intent_labels = [
@@ -15,55 +17,60 @@ intent_labels = [
     "Neutral"
 ]
 
+def find_intent_label(text):
+    """
+    Picks an intent label out of a plain-text answer such as "Buyer Intent: Interested".
+    Longer labels are tried first so "Highly Disinterested" is not read as "Interested".
+    """
+    lowered = text.lower()
+    for label in sorted(intent_labels, key=len, reverse=True):
+        if label.lower() in lowered:
+            return {"buyer_intent": label}
+    return {}
+
 def predict_intent_groq(conversation):
     """
-    Use the Groq client with model llama3-70b-8192 to predict buyer intent
+    Use the configured LLM backend (LLM_MODEL_BUYER_INTENT selects the model) to predict buyer intent
     from the provided conversation text.
     """
     try:
-        # Try to import groq module
-        import groq
-        # Initialize Groq client
-        client = groq.Groq(api_key=os.getenv('GROQ_API_KEY'))
-        
+        # pydantic is loaded on first use, together with the schemas
+        import structured_output
+
         # Build a prompt that instructs the model to classify buyer intent
         prompt = (
             f"Given the following conversation, classify the buyer's intent "
             f"into one of these categories: {', '.join(intent_labels)}.\n\n"
             f"Conversation:\n{conversation}\n\n"
-            f"Buyer Intent:"
+            f"Respond with a JSON object in this format:\n"
+            f"{structured_output.describe_schema(structured_output.BuyerIntentOutput)}"
         )
         
-        # Call Groq API
-        chat_completion = client.chat.completions.create(
+        # Call Groq API and validate the label against the schema
+        result = structured_output.structured_completion(
+            "buyer_intent",
+            structured_output.BuyerIntentOutput,
             messages=[
                 {
                     "role": "system",
-                    "content": "You are an expert at analyzing sales conversations and determining buyer intent."
+                    "content": "You are an expert at analyzing sales conversations and determining buyer intent. Always answer in JSON."
                 },
                 {
                     "role": "user",
                     "content": prompt
                 }
             ],
-            model="llama3-70b-8192",
+            fallback_parser=find_intent_label,
             temperature=0.0,
-            max_tokens=20,
-            stream=False
+            max_tokens=30
         )
         
-        # Extract the response
-        predicted_intent = chat_completion.choices[0].message.content.strip()
-        return predicted_intent
+        return result.get("buyer_intent", "Error determining intent: unparseable response")
     
-    except ImportError:
-        # If groq module is not available, return a fallback response
-        print("Error: groq module not installed", file=sys.stderr)
-        return "Not available - missing Groq API"
     except Exception as e:
-        # Handle any other exceptions
+        # LLM unavailable (circuit open, provider error, groq not installed)
         print(f"Error in predict_intent_groq: {str(e)}", file=sys.stderr)
-        return f"Error determining intent: {str(e)}"
+        return None
 
 def process_intent(file_path):
     """
@@ -73,23 +80,21 @@ def process_intent(file_path):
     """
     try:
         # Read the transcript file
-        with open(file_path, 'r') as f:
-            transcript = json.load(f)
+        transcript = transcripts.load_transcript(file_path)
         
         # Extract the conversation text
-        conversation = ""
-        for segment in transcript.get('segments', []):
-            speaker = segment.get('speaker', 'Unknown')
-            text = segment.get('text', '')
-            conversation += f"{speaker}: {text}\n"
+        conversation = transcripts.transcript_to_text(transcript)
         
         # Predict the buyer intent
         intent = predict_intent_groq(conversation)
+        if intent is None:
+            # Local keyword classifier, marked as degraded
+            return local_fallbacks.classify_intent(transcripts.get_segments(transcript))
         
         # Return the result as a dictionary
         return {
             "buyer_intent": intent,
-            "confidence": 0.85 if intent not in ["Not available - missing Groq API", "Error determining intent"] else 0.0
+            "confidence": 0.85 if intent in intent_labels else 0.0
         }
     
     except Exception as e:
@@ -99,9 +104,11 @@ def process_intent(file_path):
             "confidence": 0.0
         }
 
-# Path to the JSON transcript file
-transcript_file_path = "diarized-transcript.json"
+def main():
+    """Runs intent detection on the transcript file and prints the result as JSON."""
+    transcript_file_path = os.getenv('TRANSCRIPT_FILE_PATH', 'diarized-transcript.json')
+    result = process_intent(transcript_file_path)
+    print(json.dumps(result, indent=2))
 
-# Run processing and print output in JSON format
-result = process_intent(transcript_file_path)
-print(json.dumps(result, indent=2))
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+call_phases.py
+
+Local segmentation of a sales call into phases: opening, discovery, pitch,
+objection and close. custom_rag.py uses it to show each coaching section
+only the part of the call it is about, so the prompt covers a call of any
+length within a fixed budget, closing included.
+
+Every segment is scored for each phase from:
+- cue phrases, all compiled into one regex with a named group per phase,
+  so a segment is scanned once;
+- its position in the call (openings come first, closes last);
+- who speaks: questions from the rep point to discovery, long rep turns to
+  the pitch, and cues from the customer weigh more for objections.
+A Viterbi pass then picks the labels with the best total score, where
+changing phase costs SWITCH_PENALTY and returning to the opening costs
+more. Calls are therefore cut into a few contiguous spans rather than
+labeled turn by turn. An objection in the middle of the pitch still gets
+a span of its own.
+
+Usage:
+    python call_phases.py                          # spans of TRANSCRIPT_FILE_PATH
+    python call_phases.py benchmark_folder/upsell.txt
+"""
+
+import hashlib
+import json
+import math
+import re
+import sys
+
+import transcripts
+
+# Bump when the rules below change, so stored results are re-computed
+RULES_VERSION = "1"
+
+PHASES = ("opening", "discovery", "pitch", "objection", "close")
+
+CUES = {
+    "opening": [
+        r"hi", r"hello", r"hey", r"good (?:morning|afternoon|evening)", r"this is", r"my name is",
+        r"calling (?:from|about)", r"how are you", r"speaking (?:to|with)", r"thanks for (?:taking|having)",
+        r"(?:a )?(?:good|bad) time", r"reason (?:for|i'm) (?:my )?call(?:ing)?", r"quick call",
+    ],
+    "discovery": [
+        r"tell me (?:about|more)", r"how do you", r"how are you (?:currently|handling|managing)",
+        r"what (?:is|are|does) your", r"currently", r"right now", r"at the moment", r"challenges?",
+        r"pain points?", r"struggl\w*", r"process", r"how many", r"how often", r"goals?", r"priorit\w+",
+        r"biggest", r"looking for", r"walk me through",
+    ],
+    "pitch": [
+        r"we (?:offer|provide|help|specialize|built)", r"our (?:platform|solution|product|tool|software|service|team)",
+        r"features?", r"integrat\w*", r"automat\w*", r"dashboards?", r"save (?:you|your)", r"roi",
+        r"benefits?", r"designed to", r"allows? you", r"lets you", r"(?:customers|clients) (?:like|see)",
+        r"case stud(?:y|ies)", r"real[- ]time", r"insights?", r"makes? (?:it|things) (?:easy|easier|simple)",
+        r"(?:users|customers|clients) (?:typically |usually )?see", r"increase", r"helps? (?:you|your|teams?)",
+    ],
+    "objection": [
+        r"too expensive", r"expensive", r"costs?", r"pric(?:e|ing)", r"budget", r"concern(?:s|ed)?",
+        r"worried", r"not sure", r"already (?:have|use|using|work with)", r"competitors?",
+        r"not (?:a )?priority", r"not interested", r"hesitant", r"risk\w*", r"think about it",
+        r"(?:don't|do not) know if", r"not (?:the )?right time", r"other (?:tools|options|vendors|solutions)",
+        r"what about", r"security", r"tried (?:\w+ )?before",
+        r"i (?:understand|hear) (?:you|that)", r"totally (?:get|hear|understand)",
+        r"(?:valid|fair) (?:point|question|concern)",
+    ],
+    "close": [
+        r"next steps?", r"schedule", r"calendar", r"book (?:a|the)", r"set up (?:a|the)", r"follow[- ]up",
+        r"send (?:you|over|it)", r"contract", r"sign(?:ed|ing)?", r"agreement", r"(?:free )?trial",
+        r"get (?:you )?started", r"move forward", r"onboard\w*", r"invite", r"proposal",
+        r"(?:monday|tuesday|wednesday|thursday|friday|tomorrow|next week)",
+    ],
+}
+
+# Weight of one cue match
+CUE_WEIGHT = 1.0
+# Where in the call (0 = start, 1 = end) each phase is expected, how widely,
+# and how strongly: the prior is weight * exp(-((position - center) / width)^2).
+# Objections can come at any point, so they rest on their cues.
+POSITION_PRIORS = {
+    "opening": (0.0, 0.08, 1.0),
+    "discovery": (0.25, 0.2, 1.0),
+    "pitch": (0.55, 0.3, 1.0),
+    "objection": (0.6, 0.35, 0.5),
+    "close": (1.0, 0.15, 1.0),
+}
+REP_QUESTION_WEIGHT = 0.7
+LONG_TURN_WORDS = 40
+LONG_TURN_WEIGHT = 0.5
+CUSTOMER_OBJECTION_WEIGHT = 1.0
+# The rep's answer to an objection belongs to the objection
+OBJECTION_ANSWER_WEIGHT = 1.0
+SWITCH_PENALTY = 1.5
+REOPEN_PENALTY = 4.0
+
+CUE_PATTERN = re.compile(
+    "|".join(
+        rf"(?P<{phase}>\b(?:{'|'.join(cues)})\b)" for phase, cues in CUES.items()
+    ),
+    re.IGNORECASE,
+)
+
+# "Sales Rep (Sophie): text" – one line of a benchmark file
+TEXT_LINE = re.compile(r"^\s*([^:\n]{1,40}?):\s+(.*)$")
+
+
+def rules_version() -> str:
+    """Hash of the cues and weights, an input node of analysis_graph.py."""
+    rules = [RULES_VERSION, CUES, POSITION_PRIORS, CUE_WEIGHT, REP_QUESTION_WEIGHT, LONG_TURN_WORDS,
+             LONG_TURN_WEIGHT, CUSTOMER_OBJECTION_WEIGHT, OBJECTION_ANSWER_WEIGHT, SWITCH_PENALTY, REOPEN_PENALTY]
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def segments_from_text(text: str) -> list:
+    """
+    Turns a plain "speaker: text" transcript (one turn per line, as in
+    benchmark_folder and transcripts.transcript_to_text) into segments with
+    approximate 5-second timestamps.
+    """
+    segments = []
+    for line in (text or "").splitlines():
+        if not line.strip():
+            continue
+        match = TEXT_LINE.match(line)
+        speaker, turn = match.groups() if match else ("Unknown", line.strip())
+        index = len(segments)
+        segments.append({"speaker": speaker, "text": turn, "start": index * 5, "end": (index + 1) * 5})
+    return segments
+
+
+def _scores(resolved: list) -> list:
+    """Per-segment score of every phase, in PHASES order."""
+    rep = resolved[0][0]
+    first_start = resolved[0][2]
+    duration = resolved[-1][3] - first_start
+    scores = []
+    customer_objected = False
+    for index, (speaker, text, start, end) in enumerate(resolved):
+        if duration > 0:
+            position = ((start + end) / 2 - first_start) / duration
+        else:
+            position = index / max(len(resolved) - 1, 1)
+        score = {
+            phase: weight * math.exp(-((position - center) / width) ** 2)
+            for phase, (center, width, weight) in POSITION_PRIORS.items()
+        }
+        for match in CUE_PATTERN.finditer(text):
+            score[match.lastgroup] += CUE_WEIGHT
+        if speaker == rep:
+            if "?" in text:
+                score["discovery"] += REP_QUESTION_WEIGHT
+            if len(text.split()) >= LONG_TURN_WORDS:
+                score["pitch"] += LONG_TURN_WEIGHT
+            if customer_objected:
+                score["objection"] += OBJECTION_ANSWER_WEIGHT
+            customer_objected = False
+        else:
+            customer_objected = score["objection"] >= CUE_WEIGHT
+            if customer_objected:
+                score["objection"] += CUSTOMER_OBJECTION_WEIGHT
+        scores.append([score[phase] for phase in PHASES])
+    return scores
+
+
+def label(segments: list) -> list:
+    """Returns the phase of every segment."""
+    resolved = transcripts.resolve_speakers(segments)
+    if not resolved:
+        return []
+    scores = _scores(resolved)
+    opening = PHASES.index("opening")
+    best = list(scores[0])
+    back = []
+    for row in scores[1:]:
+        pointers = []
+        current = []
+        for phase, score in enumerate(row):
+            penalty = REOPEN_PENALTY if phase == opening else SWITCH_PENALTY
+            totals = [value if previous == phase else value - penalty for previous, value in enumerate(best)]
+            previous = max(range(len(PHASES)), key=totals.__getitem__)
+            pointers.append(previous)
+            current.append(totals[previous] + score)
+        back.append(pointers)
+        best = current
+    state = max(range(len(PHASES)), key=best.__getitem__)
+    states = [state]
+    for pointers in reversed(back):
+        state = pointers[state]
+        states.append(state)
+    return [PHASES[state] for state in reversed(states)]
+
+
+def spans(segments: list) -> list:
+    """
+    Contiguous runs of one phase: {"phase", "first", "last", "start", "end"}
+    with segment indices (inclusive) and times.
+    """
+    result = []
+    for index, (phase, segment) in enumerate(zip(label(segments), segments)):
+        if result and result[-1]["phase"] == phase:
+            result[-1].update(last=index, end=segment.get("end") or 0)
+        else:
+            result.append({"phase": phase, "first": index, "last": index,
+                           "start": segment.get("start") or 0, "end": segment.get("end") or 0})
+    return result
+
+
+def excerpt(segments: list, phases, max_chars: int, call_spans: list = None) -> str:
+    """
+    The turns of the given phases as "speaker: text" lines, at most
+    max_chars long. When they do not fit, every span keeps a share of the
+    budget proportional to its length, so a late span is never crowded out
+    by an early one. Returns "" if the call has none of these phases.
+    """
+    resolved = transcripts.resolve_speakers(segments)
+    call_spans = spans(segments) if call_spans is None else call_spans
+    blocks = [
+        [f"{speaker}: {text.strip()}" for speaker, text, _, _ in resolved[span["first"]:span["last"] + 1]]
+        for span in call_spans if span["phase"] in phases
+    ]
+    lengths = [sum(len(line) + 1 for line in block) for block in blocks]
+    total = sum(lengths)
+    parts = []
+    for block, length in zip(blocks, lengths):
+        budget = length if total <= max_chars else max_chars * length // total
+        kept = []
+        used = 0
+        for line in block:
+            if used + len(line) + 1 > budget:
+                if not kept:
+                    kept.append(line[:max(budget - 4, 0)] + " ...")
+                else:
+                    kept.append("...")
+                break
+            kept.append(line)
+            used += len(line) + 1
+        parts.append("\n".join(kept))
+    return "\n[...]\n".join(parts)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else transcripts.transcript_path()
+    if path.endswith(".json"):
+        segments = transcripts.get_segments(transcripts.load_transcript(path))
+    else:
+        with open(path, encoding="utf-8") as f:
+            segments = segments_from_text(f.read())
+    print(json.dumps(spans(segments), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,28 @@
 import os
 import json
 import sys
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+import local_fallbacks
+import transcripts
+
+# Bump when the prompt changes; stored summaries with an older version are re-run by reanalyze.py
+PROMPT_VERSION = "1"
 
 def generate_summary(transcript_file_path):
     """Generate a summary of the sales call transcript using Groq."""
     
-    # Read the transcript
-    with open(transcript_file_path, 'r') as file:
+    # Read the transcript. The prompt shows it as the indented JSON server.js
+    # used to hand over, also when it arrives in the binary format
+    with open(transcript_file_path, 'rb') as file:
         transcript = file.read()
+    if transcript[:4] == b"VTC1":
+        transcript = json.dumps(transcripts.load_transcript(transcript_file_path), indent=2, ensure_ascii=False)
+    else:
+        transcript = transcript.decode('utf-8')
 
     try:
-        # Try to import groq module
-        import groq
-        # Initialize Groq client
-        client = groq.Groq(api_key=os.getenv('GROQ_API_KEY'))
+        # pydantic is loaded on first use, together with the schemas
+        import structured_output
 
         # Create the prompt for Groq
         prompt = f"""Analyze this sales call transcript and provide:
@@ -29,7 +34,7 @@ def generate_summary(transcript_file_path):
 Here's the transcript:
 {transcript}
 
-Format your response in this exact JSON structure:
+Respond with a JSON object in this exact structure:
 {{
     "summary": "your summary here",
     "rating": numeric_rating,
@@ -45,80 +50,46 @@ Format your response in this exact JSON structure:
     ]
 }}"""
 
-        # Call Groq API
-        chat_completion = client.chat.completions.create(
+        # Call Groq API and validate the response against the schema
+        result = structured_output.structured_completion(
+            "call_summary",
+            structured_output.CallSummaryOutput,
             messages=[
                 {
                     "role": "system",
-                    "content": "You are an expert sales coach analyzing sales call transcripts."
+                    "content": "You are an expert sales coach analyzing sales call transcripts. Always answer in JSON."
                 },
                 {
                     "role": "user",
                     "content": prompt
                 }
             ],
-            model="llama3-70b-8192",
             temperature=0.5,
             max_tokens=1024,
-            top_p=1,
-            stream=False
+            top_p=1
         )
-
-        # Extract the response
-        response_text = chat_completion.choices[0].message.content
         
-        # Parse the JSON response
+        # Fields that could not be recovered even after repair
+        result.setdefault('summary', "Failed to parse API response")
+        result.setdefault('rating', 0)
+        result.setdefault('strengths', ["Error parsing response"])
+        result.setdefault('areas_for_improvement', ["Error parsing response"])
+        
+    except Exception as e:
+        # LLM unavailable (circuit open, provider error, groq not installed):
+        # answer from the transcript alone, marked as degraded
+        print(f"Error: {str(e)}, using local summary", file=sys.stderr)
         try:
-            result = json.loads(response_text)
-            
-            # Ensure all required fields are present
-            required_fields = ['summary', 'rating', 'strengths', 'areas_for_improvement']
-            for field in required_fields:
-                if field not in result:
-                    result[field] = [] if field in ['strengths', 'areas_for_improvement'] else ''
-                    
-            # Format strengths and areas for improvement as bullet points
-            result['strengths'] = '\n• ' + '\n• '.join(result['strengths'])
-            result['areas_for_improvement'] = '\n• ' + '\n• '.join(result['areas_for_improvement'])
-            
-            return result
-        except json.JSONDecodeError:
-            # If JSON parsing fails, try to extract the JSON part
-            start = response_text.find('{')
-            end = response_text.rfind('}') + 1
-            if start >= 0 and end > start:
-                try:
-                    result = json.loads(response_text[start:end])
-                    return result
-                except json.JSONDecodeError:
-                    pass
-            
-            # If all parsing attempts fail, return a fallback response
-            return {
-                "summary": "Failed to parse API response",
-                "rating": 0,
-                "strengths": ["Error parsing response"],
-                "areas_for_improvement": ["Error parsing response"]
-            }
+            segments = transcripts.get_segments(json.loads(transcript))
+        except ValueError:
+            segments = []
+        result = local_fallbacks.summarize(segments)
     
-    except ImportError:
-        # If groq module is not available, return a fallback response
-        print("Error: groq module not installed", file=sys.stderr)
-        return {
-            "summary": "Summary not available - Groq API module not installed",
-            "rating": 0,
-            "strengths": ["Not available - missing Groq API"],
-            "areas_for_improvement": ["Not available - missing Groq API"]
-        }
-    except Exception as e:
-        # Handle any other exceptions
-        print(f"Error: {str(e)}", file=sys.stderr)
-        return {
-            "summary": f"Error generating summary: {str(e)}",
-            "rating": 0,
-            "strengths": ["Error occurred"],
-            "areas_for_improvement": ["Error occurred"]
-        }
+    # Format strengths and areas for improvement as bullet points
+    result['strengths'] = '\n• ' + '\n• '.join(result['strengths'])
+    result['areas_for_improvement'] = '\n• ' + '\n• '.join(result['areas_for_improvement'])
+    
+    return result
 
 def main():
     """Main function to run the summary generation."""
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+circuit_breaker.py
+
+Circuit breaker for LLM endpoints, shared by every analyzer process.
+
+Each endpoint (provider and model) keeps a sliding window of its recent
+calls. The circuit opens when, over at least `min_calls` calls, the failure
+rate or the share of slow calls crosses its threshold. While open, calls are
+rejected at once with CircuitOpenError, so analyzers can fall back to local
+results instead of waiting for timeouts. After `open_seconds` a single caller
+is let through as a half-open probe: success closes the circuit, failure
+opens it again.
+
+insights.py runs as a new process per request, so the state lives in a small
+JSON file per endpoint (LLM_CIRCUIT_DIR, the temp directory by default),
+updated under an exclusive file lock.
+
+Thresholds come from LLM_BREAKER_* environment variables, and can be set per
+endpoint with LLM_BREAKER_OVERRIDES, e.g.
+    LLM_BREAKER_OVERRIDES='{"groq:llama3-70b-8192": {"slow_seconds": 8}}'
+"""
+
+import contextlib
+import json
+import os
+import re
+import tempfile
+import time
+
+import telemetry
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+DEFAULTS = {
+    "failure_rate": 0.5,      # open when at least half of the windowed calls failed
+    "slow_seconds": 15.0,     # a call slower than this counts as slow
+    "slow_rate": 0.5,         # open when at least half of the windowed calls were slow
+    "window": 20,             # calls kept in the sliding window
+    "min_calls": 5,           # calls needed before the rates are trusted
+    "open_seconds": 30.0,     # time before a half-open probe is allowed
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit is open."""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(f"Circuit for {endpoint} is open, retry in {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+def state_path(kind: str, endpoint: str, directory: str = None) -> str:
+    """Per-endpoint state file in LLM_CIRCUIT_DIR (the temp directory by default)."""
+    directory = directory or os.getenv("LLM_CIRCUIT_DIR") or tempfile.gettempdir()
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", endpoint)
+    return os.path.join(directory, f"veritas-llm-{kind}-{safe_name}.json")
+
+
+@contextlib.contextmanager
+def locked_json(path: str):
+    """
+    Yields the JSON object stored at path for read-modify-write under an
+    exclusive lock; changes are written back on exit. Also used for the
+    latency history in hedging.py.
+    """
+    with open(path, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            try:
+                state = json.loads(f.read() or "{}")
+            except ValueError:
+                state = {}
+            before = json.dumps(state, sort_keys=True)
+            yield state
+            if json.dumps(state, sort_keys=True) != before:
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def settings_for(endpoint: str) -> dict:
+    settings = {
+        name: type(default)(os.getenv(f"LLM_BREAKER_{name.upper()}", default))
+        for name, default in DEFAULTS.items()
+    }
+    try:
+        overrides = json.loads(os.getenv("LLM_BREAKER_OVERRIDES") or "{}")
+    except ValueError:
+        overrides = {}
+    settings.update({name: type(DEFAULTS[name])(value) for name, value in overrides.get(endpoint, {}).items() if name in DEFAULTS})
+    return settings
+
+
+class CircuitBreaker:
+    def __init__(self, endpoint: str, state_dir: str = None, **settings):
+        self.endpoint = endpoint
+        self.settings = {**settings_for(endpoint), **settings}
+        self.path = state_path("circuit", endpoint, state_dir)
+
+    @contextlib.contextmanager
+    def _locked_state(self):
+        with locked_json(self.path) as state:
+            state.setdefault("state", CLOSED)
+            state.setdefault("calls", [])
+            yield state
+
+    def _transition(self, state: dict, new_state: str, now: float):
+        if state["state"] == new_state:
+            return
+        state["state"] = new_state
+        telemetry.increment("insights_llm_circuit_transitions_total", endpoint=self.endpoint, to=new_state)
+        telemetry.gauge("insights_llm_circuit_state", STATE_VALUES[new_state], endpoint=self.endpoint)
+        if new_state == OPEN:
+            state["opened_at"] = now
+            state.pop("probe_started", None)
+        elif new_state == HALF_OPEN:
+            state["probe_started"] = now
+        else:
+            state["calls"] = []
+            state.pop("opened_at", None)
+            state.pop("probe_started", None)
+
+    def state(self) -> str:
+        with self._locked_state() as state:
+            return state["state"]
+
+    def retry_after(self) -> float:
+        with self._locked_state() as state:
+            if state["state"] == CLOSED:
+                return 0.0
+            since = state.get("probe_started") or state.get("opened_at") or 0
+            return max(0.0, since + self.settings["open_seconds"] - time.time())
+
+    def allow(self) -> bool:
+        """
+        Returns True if a call may go ahead. In the open state the first caller
+        after open_seconds becomes the half-open probe; a probe that never
+        reports back is replaced after another open_seconds.
+        """
+        now = time.time()
+        with self._locked_state() as state:
+            if state["state"] == CLOSED:
+                return True
+            if state["state"] == OPEN and now - state.get("opened_at", 0) >= self.settings["open_seconds"]:
+                self._transition(state, HALF_OPEN, now)
+                return True
+            if state["state"] == HALF_OPEN and now - state.get("probe_started", 0) >= self.settings["open_seconds"]:
+                state["probe_started"] = now
+                return True
+            return False
+
+    def record(self, success: bool, seconds: float):
+        """Records the outcome and duration of a call that allow() let through."""
+        now = time.time()
+        slow = seconds >= self.settings["slow_seconds"]
+        with self._locked_state() as state:
+            if state["state"] == HALF_OPEN:
+                self._transition(state, CLOSED if success and not slow else OPEN, now)
+                return
+            if state["state"] == OPEN:
+                return
+            calls = (state["calls"] + [[round(now, 3), bool(success), slow]])[-self.settings["window"]:]
+            state["calls"] = calls
+            if len(calls) < self.settings["min_calls"]:
+                return
+            failure_rate = sum(1 for _, ok, _ in calls if not ok) / len(calls)
+            slow_rate = sum(1 for _, _, was_slow in calls if was_slow) / len(calls)
+            if failure_rate >= self.settings["failure_rate"] or slow_rate >= self.settings["slow_rate"]:
+                self._transition(state, OPEN, now)
+
+
+_breakers = {}
+
+
+def for_endpoint(endpoint: str) -> CircuitBreaker:
+    """Returns the breaker of an endpoint, created on first use."""
+    if endpoint not in _breakers:
+        _breakers[endpoint] = CircuitBreaker(endpoint)
+    return _breakers[endpoint]
@@ -2,72 +2,68 @@ import os
 import json
 import re
 import sys
-from dotenv import load_dotenv
-try:
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.metrics.pairwise import cosine_similarity
-    sklearn_available = True
-except ImportError:
-    sklearn_available = False
-    print("Warning: sklearn not available, using fallback analysis", file=sys.stderr)
-
-# Load environment variables
-load_dotenv()
+
+import benchmark_library
+import call_phases
+import local_fallbacks
+import transcripts
+
+# Bump when the prompt changes; stored results with an older version are re-run by reanalyze.py
+PROMPT_VERSION = "2"
+BENCHMARK_FOLDER = "benchmark_folder"
+
+COACHING_SECTIONS = ["Conversational Balance", "Objection Handling", "Pitch Optimization", "Call-to-Action Execution"]
+# The matched benchmark is split into phases; only this much of it is read from the corpus
+BENCHMARK_MAX_CHARS = 20000
+
+# Phases (see call_phases.py) each section is judged on; Conversational
+# Balance gets talk metrics instead of text
+SECTION_PHASES = {
+    "Objection Handling": ("objection",),
+    "Pitch Optimization": ("discovery", "pitch"),
+    "Call-to-Action Execution": ("close",),
+}
+# Characters of each section's excerpt from the current and the benchmark call
+CALL_EXCERPT_CHARS = 900
+BENCHMARK_EXCERPT_CHARS = 400
 
 class SalesCallAnalyzer:
     def __init__(self, benchmark_folder):
-        if not sklearn_available:
-            self.vectorizer = None
-            self.benchmark_calls = []
-            print("Warning: sklearn not available, analysis will be limited", file=sys.stderr)
-            return
-            
-        self.vectorizer = TfidfVectorizer()
+        self.index = None
         self.benchmark_calls = []
         self.load_benchmarks(benchmark_folder)
 
     def load_benchmarks(self, folder_path):
-        """Load and store benchmark transcripts"""
-        if not sklearn_available:
-            return
-            
+        """Load the benchmark index; transcripts stay in the mapped corpus until a match is read"""
         if not os.path.exists(folder_path):
             print(f"Warning: Benchmark folder {folder_path} does not exist", file=sys.stderr)
             return
-            
-        for file in os.listdir(folder_path):
-            if file.endswith('.txt'):
-                try:
-                    with open(os.path.join(folder_path, file), 'r') as f:
-                        self.benchmark_calls.append({
-                            'transcript': f.read(),
-                            'filename': file
-                        })
-                except Exception as e:
-                    print(f"Error loading benchmark file {file}: {str(e)}", file=sys.stderr)
-                    
-        # Create embeddings for all benchmark transcripts if we have any
-        if self.benchmark_calls:
-            transcripts = [call['transcript'] for call in self.benchmark_calls]
-            self.benchmark_embeddings = self.vectorizer.fit_transform(transcripts)
-        else:
+
+        try:
+            # Files added since the last `benchmark_library.py sync` are vectorized in memory
+            self.index = benchmark_library.BenchmarkIndex(folder_path)
+            self.index.sync()
+        except ImportError:
+            self.index = None
+            print("Warning: numpy not available, analysis will be limited", file=sys.stderr)
+            return
+
+        self.benchmark_calls = self.index.documents
+        if not self.benchmark_calls:
             print("Warning: No benchmark transcripts found", file=sys.stderr)
 
     def convert_json_to_text(self, json_transcript):
         """Convert JSON transcript to plain text format"""
         conversation = ""
         try:
-            for segment in json_transcript.get('segments', []):
-                speaker = segment.get('speaker', 'Unknown')
-                text = segment.get('text', '')
-                conversation += f"{speaker}: {text}\n"
+            conversation = transcripts.transcript_to_text(json_transcript)
         except Exception as e:
             print(f"Error converting JSON to text: {str(e)}", file=sys.stderr)
         return conversation
 
     def find_best_matching_benchmark(self, current_transcript_text):
         """Find the most similar benchmark transcript"""
-        if not sklearn_available or not self.benchmark_calls:
+        if self.index is None or not self.benchmark_calls:
             return {
                 'benchmark_transcript': "No benchmark available",
                 'benchmark_name': "No benchmark available",
@@ -75,13 +71,10 @@ class SalesCallAnalyzer:
             }
             
         try:
-            current_embedding = self.vectorizer.transform([current_transcript_text])
-            similarities = cosine_similarity(current_embedding, self.benchmark_embeddings)[0]
-            best_match_idx = similarities.argmax()
-            best_match_score = similarities[best_match_idx]
+            best_match, best_match_score = self.index.best_match(current_transcript_text)
             return {
-                'benchmark_transcript': self.benchmark_calls[best_match_idx]['transcript'],
-                'benchmark_name': self.benchmark_calls[best_match_idx]['filename'],
+                'benchmark_transcript': self.index.text(best_match, BENCHMARK_MAX_CHARS),
+                'benchmark_name': best_match['filename'],
                 'similarity_score': round(best_match_score * 100, 2)
             }
         except Exception as e:
@@ -92,128 +85,135 @@ class SalesCallAnalyzer:
                 'similarity_score': 0
             }
 
-    def analyze_with_groq(self, current_transcript_text, benchmark_match):
-        """Use Groq to analyze differences and suggest improvements"""
+    def describe_call(self, segments, call_spans):
+        """Talk metrics and phase layout of a call, for Conversational Balance"""
+        metrics = transcripts.talk_metrics(segments)
+        layout = ", ".join(
+            f"{span['phase']} (turns {span['first'] + 1}-{span['last'] + 1})" for span in call_spans
+        )
+        return (
+            f"the rep spoke {round(metrics['rep_talk_ratio'] * 100)}% of the words over "
+            f"{metrics['turn_count']} turns, asked {metrics['rep_questions']} questions, "
+            f"longest monologue {metrics['longest_monologue_seconds']:.0f}s; phases: {layout or 'none'}"
+        )
+
+    def phase_sections(self, segments, benchmark_segments):
+        """
+        The prompt text of each coaching section: only the phases of both
+        calls that the section is about, within a fixed budget per call
+        """
+        call_spans = call_phases.spans(segments)
+        benchmark_spans = call_phases.spans(benchmark_segments)
+        sections = {
+            "Conversational Balance": (
+                f"Current call: {self.describe_call(segments, call_spans)}\n"
+                f"Benchmark call: {self.describe_call(benchmark_segments, benchmark_spans)}"
+            )
+        }
+        for section, phases in SECTION_PHASES.items():
+            missing = f"(no {' or '.join(phases)} phase detected)"
+            current = call_phases.excerpt(segments, phases, CALL_EXCERPT_CHARS, call_spans)
+            benchmark = call_phases.excerpt(benchmark_segments, phases, BENCHMARK_EXCERPT_CHARS, benchmark_spans)
+            sections[section] = (
+                f"CURRENT CALL ({', '.join(phases)}):\n{current or missing}\n"
+                f"BENCHMARK CALL ({', '.join(phases)}):\n{benchmark or missing}"
+            )
+        return sections
+
+    def analyze_with_groq(self, current_transcript_text, benchmark_match, segments=None):
+        """
+        Use Groq to analyze differences and suggest improvements.
+        Returns a dict of the feedback sections that could be recovered from the response.
+        """
         try:
-            # Try to import groq module
-            import groq
-            # Initialize Groq client
-            client = groq.Groq(api_key=os.getenv('GROQ_API_KEY'))
-            
+            # pydantic is loaded on first use, together with the schemas
+            import structured_output
+
+            if not segments:
+                segments = call_phases.segments_from_text(current_transcript_text)
+            benchmark_segments = (
+                call_phases.segments_from_text(benchmark_match['benchmark_transcript'])
+                if benchmark_match['similarity_score'] else []
+            )
+            sections = self.phase_sections(segments, benchmark_segments)
+
             # Create the prompt for analysis
             prompt = f"""
-            You are an expert sales coach analyzing sales call transcripts. Compare the current sales call with a benchmark high-performing call and provide specific, actionable feedback.
-            
-            CURRENT CALL TRANSCRIPT:
-            {current_transcript_text[:2000]}  # Limit length to avoid token limits
-            
-            BENCHMARK CALL (Similarity Score: {benchmark_match['similarity_score']}%):
-            {benchmark_match['benchmark_transcript'][:2000]}  # Limit length to avoid token limits
-            
-            Analyze the differences between these calls and provide feedback in these specific areas:
+            You are an expert sales coach analyzing sales call transcripts. Compare the current sales call with a benchmark high-performing call (similarity score: {benchmark_match['similarity_score']}%) and provide specific, actionable feedback.
+            Each area below shows only the phases of both calls that it is about.
             
             1. Conversational Balance: Analyze the balance of speaking time between the sales rep and prospect. Is the rep talking too much or too little?
+            {sections['Conversational Balance']}
             
             2. Objection Handling: How well does the rep address customer concerns or objections? What could be improved?
+            {sections['Objection Handling']}
             
             3. Pitch Optimization: Evaluate how well the rep presents the product/service and its value proposition.
+            {sections['Pitch Optimization']}
             
             4. Call-to-Action Execution: Assess how effectively the rep guides the prospect toward the next steps or a decision.
+            {sections['Call-to-Action Execution']}
             
-            Format your response with these exact section headers, followed by 2-3 sentences of specific feedback for each.
+            Respond with a JSON object that has these exact keys, each holding 2-3 sentences of specific feedback:
+            {structured_output.describe_schema(structured_output.CoachingOutput)}
             """
             
-            # Call Groq API
-            chat_completion = client.chat.completions.create(
+            # Call Groq API and validate the response against the schema
+            return structured_output.structured_completion(
+                "custom_rag",
+                structured_output.CoachingOutput,
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are an expert sales coach analyzing sales call transcripts."
+                        "content": "You are an expert sales coach analyzing sales call transcripts. Always answer in JSON."
                     },
                     {
                         "role": "user",
                         "content": prompt
                     }
                 ],
-                model="llama3-70b-8192",
+                fallback_parser=self.extract_sections,
                 temperature=0.5,
-                max_tokens=1024,
-                stream=False
+                max_tokens=1024
             )
             
-            # Extract the response
-            analysis_text = chat_completion.choices[0].message.content
-            return analysis_text
-            
-        except ImportError:
-            # If groq module is not available, return a fallback response
-            print("Error: groq module not installed", file=sys.stderr)
-            return """
-            Conversational Balance: Not available - Groq API module missing
-            
-            Objection Handling: Not available - Groq API module missing
-            
-            Pitch Optimization: Not available - Groq API module missing
-            
-            Call-to-Action Execution: Not available - Groq API module missing
-            """
         except Exception as e:
-            # Handle any other exceptions
+            # LLM unavailable (circuit open, provider error, groq not installed)
             print(f"Error in analyze_with_groq: {str(e)}", file=sys.stderr)
-            return f"""
-            Conversational Balance: Error in analysis: {str(e)}
-            
-            Objection Handling: Error in analysis: {str(e)}
-            
-            Pitch Optimization: Error in analysis: {str(e)}
-            
-            Call-to-Action Execution: Error in analysis: {str(e)}
-            """
+            return None
 
-    def analyze_transcript(self, current_transcript_text, benchmark_match):
+    def analyze_transcript(self, current_transcript_text, benchmark_match, segments=None):
         """Analyze the transcript and provide feedback"""
-        analysis = {
-            "Conversational Balance": "",
-            "Objection Handling": "",
-            "Pitch Optimization": "",
-            "Call-to-Action Execution": "",
-        }
-
-        # Generate the analysis using the template
-        analysis_text = self.analyze_with_groq(current_transcript_text, benchmark_match)
-        analysis_sections = self.parse_analysis_sections(analysis_text)
-
-        analysis["Conversational Balance"] = analysis_sections.get("Conversational Balance", "No data")
-        analysis["Objection Handling"] = analysis_sections.get("Objection Handling", "No data")
-        analysis["Pitch Optimization"] = analysis_sections.get("Pitch Optimization", "No data")
-        analysis["Call-to-Action Execution"] = analysis_sections.get("Call-to-Action Execution", "No data")
+        analysis_sections = self.analyze_with_groq(current_transcript_text, benchmark_match, segments)
+        if analysis_sections is None:
+            # Local talk-metrics feedback, marked as degraded
+            return local_fallbacks.coaching(segments or [], COACHING_SECTIONS)
 
-        return analysis
+        # Sections that could not be recovered even after repair
+        return {section: analysis_sections.get(section, "No data") for section in COACHING_SECTIONS}
 
-    def parse_analysis_sections(self, text):
+    def extract_sections(self, text):
         """
-        Parses the analysis text into sections using a regex pattern.
-        Returns a dictionary with the keys:
-        - "Conversational Balance"
-        - "Objection Handling"
-        - "Pitch Optimization"
-        - "Call-to-Action Execution"
-        If a section is missing, it falls back to "No data".
+        Extracts the feedback sections from a free-text (markdown) response.
+        Recognizes headers written as **Header**, ## Header, 1. Header: or Header:,
+        and returns only the sections that were found.
         """
-        text = text.strip()
-        pattern = r"\*\*(Conversational Balance|Objection Handling|Pitch Optimization|Call-to-Action Execution)\*\*\s*(.*?)(?=\n\*\*|$)"
-        matches = re.findall(pattern, text, re.DOTALL)
-        sections = {k.strip(): v.strip() for k, v in matches}
-
-        # Ensure all sections exist
-        required_sections = ["Conversational Balance", "Objection Handling", "Pitch Optimization", "Call-to-Action Execution"]
-        for section in required_sections:
-            if section not in sections:
-                sections[section] = "No data"
-
+        header_pattern = (
+            r"^[ \t]*(?:#{1,6}[ \t]*)?(?:\*\*)?(?:\d+\.[ \t]*)?(?:\*\*)?"
+            r"(Conversational Balance|Objection Handling|Pitch Optimization|Call-to-Action Execution)"
+            r"[ \t]*(?:\*\*)?[ \t]*:?[ \t]*(?:\*\*)?"
+        )
+        canonical = {section.lower(): section for section in COACHING_SECTIONS}
+        matches = list(re.finditer(header_pattern, text, re.MULTILINE | re.IGNORECASE))
+        sections = {}
+        for index, match in enumerate(matches):
+            end = matches[index + 1].start() if index + 1 < len(matches) else len(text)
+            body = text[match.end():end].strip()
+            if body:
+                sections[canonical[match.group(1).lower()]] = body
         return sections
 
-def analyze_sales_call(json_file_path, benchmark_folder="benchmark_folder"):
+def analyze_sales_call(json_file_path, benchmark_folder=BENCHMARK_FOLDER):
     """Main function to analyze a sales call and return individual feedback sections."""
     analyzer = SalesCallAnalyzer(benchmark_folder)
 
@@ -227,18 +227,17 @@ def analyze_sales_call(json_file_path, benchmark_folder="benchmark_folder"):
             "Call-to-Action Execution": "No data",
         }
 
-    with open(json_file_path, 'r') as f:
-        transcript_data = json.load(f)
+    transcript_data = transcripts.load_transcript(json_file_path)
 
     transcript_text = analyzer.convert_json_to_text(transcript_data)
     benchmark_match = analyzer.find_best_matching_benchmark(transcript_text)
-    analysis = analyzer.analyze_transcript(transcript_text, benchmark_match)
+    analysis = analyzer.analyze_transcript(transcript_text, benchmark_match, transcripts.get_segments(transcript_data))
 
     return analysis
 
 def main():
     """Main function to run the analysis and output results"""
-    json_file_path = "diarized-transcript.json"
+    json_file_path = os.getenv('TRANSCRIPT_FILE_PATH', 'diarized-transcript.json')
     results = analyze_sales_call(json_file_path)
     
     # Format output for insights.py
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+db.py
+
+Supabase access for the Python side of the insights service. The client is
+created from SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY (falling back to
+SUPABASE_ANON_KEY), the same variables start_insightspg.sh exports for
+server.js.
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import llm
+
+_client = None
+
+# Calls are re-read from this long before a change watermark, because
+# transactions may commit out of stamp order
+CHANGE_OVERLAP = timedelta(seconds=60)
+
+# Watermark of a completed first pass over a table without stamped rows
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def get_supabase():
+    """
+    Returns a shared Supabase client, created on first use.
+    Raises ImportError if the supabase package is not installed.
+    """
+    global _client
+    if _client is None:
+        llm.load_env()
+        from supabase import create_client
+        key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+        _client = create_client(os.getenv("SUPABASE_URL"), key)
+    return _client
+
+
+def iter_rows(table: str, columns: str = "*", key: str = "id", batch_size: int = 500, start_after=None, filters=None):
+    """
+    Yields every row of `table` using keyset pagination on `key`
+    (WHERE key > last seen ORDER BY key LIMIT batch_size), so memory use does
+    not grow with the table. `filters` is an optional function applied to
+    each query builder, e.g. lambda query: query.not_.is_("transcription", "null").
+    """
+    supabase = get_supabase()
+    last_key = start_after
+    while True:
+        query = supabase.table(table).select(columns).order(key).limit(batch_size)
+        if last_key is not None:
+            query = query.gt(key, last_key)
+        if filters is not None:
+            query = filters(query)
+        rows = query.execute().data or []
+        for row in rows:
+            yield row
+        if len(rows) < batch_size:
+            return
+        last_key = rows[-1][key]
+
+
+def parse_timestamp(value, tz=None):
+    """
+    Parses a timestamp as PostgREST returns it; datetimes (from asyncpg) and
+    None are passed through. A value without an offset is given `tz`, or
+    stays naive when tz is None, as for timestamp without time zone columns.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        # fromisoformat() before Python 3.11 accepts neither "Z" nor fractions other than 3 or 6 digits
+        value = value.replace("Z", "+00:00").replace(" ", "T", 1)
+        main, _, rest = value.partition(".")
+        if rest:
+            digits = len(rest) - len(rest.lstrip("0123456789"))
+            value = f"{main}.{rest[:digits][:6].ljust(6, '0')}{rest[digits:]}"
+        value = datetime.fromisoformat(value)
+    return value.replace(tzinfo=tz) if value.tzinfo is None and tz is not None else value
+
+
+class ChangedCalls:
+    """
+    Incremental reads of the call_logs rows whose transcription changed, on
+    the transcription_updated_at stamps of migrations/004_transcription_events.sql.
+
+    Iterating yields the rows changed since `watermark` (every row with a
+    transcription when it is None), paged by call_id. Rows are re-read from
+    CHANGE_OVERLAP before the watermark stamp; the calls seen in that window
+    are kept with their stamp, so a re-read row is skipped unless it changed
+    again. After a complete pass, `watermark` is the value to store for the
+    next one. It only advances at the end of a pass, since call_id order is
+    not stamp order.
+    """
+
+    def __init__(self, columns: str, watermark: dict = None, batch_size: int = 500):
+        self.columns = columns
+        self.batch_size = batch_size
+        # Watermarks of the call_id era (plain integers) start over with a full pass
+        self.previous = watermark if isinstance(watermark, dict) else None
+        self.watermark = self.previous
+
+    def __iter__(self):
+        columns = f"{self.columns}, transcription_updated_at"
+        if self.previous is None:
+            since, seen = None, {}
+        else:
+            since = parse_timestamp(self.previous["stamp"], timezone.utc) - CHANGE_OVERLAP
+            seen = {call_id: parse_timestamp(stamp, timezone.utc) for call_id, stamp in self.previous.get("seen", {}).items()}
+
+        def filters(query):
+            query = query.not_.is_("transcription", "null")
+            return query.gte("transcription_updated_at", since.isoformat()) if since is not None else query
+
+        latest = parse_timestamp(self.previous["stamp"], timezone.utc) if self.previous else EPOCH
+        for row in iter_rows("call_logs", columns, key="call_id", batch_size=self.batch_size, filters=filters):
+            stamp = row.pop("transcription_updated_at")
+            if stamp is None:
+                # Written before migration 004; only a full pass reads it
+                yield row
+                continue
+            stamp = parse_timestamp(stamp, timezone.utc)
+            latest = max(latest, stamp)
+            call_id = str(row["call_id"])
+            if seen.get(call_id) == stamp:
+                continue
+            seen[call_id] = stamp
+            yield row
+
+        horizon = latest - CHANGE_OVERLAP
+        self.watermark = {
+            "stamp": latest.isoformat(),
+            "seen": {call_id: stamp.isoformat() for call_id, stamp in sorted(seen.items()) if stamp >= horizon},
+        }
@@ -13,8 +13,11 @@ Severity Levels:
 """
 
 import json
+import os
 import re
 
+import transcripts
+
 # Custom severity levels for different types of words
 SEVERITY_LEVELS = {
     'mild': ["damn", "hell", "crap", "stupid", "dumb", "idiot", "piss", "suck"],
@@ -24,10 +27,9 @@ SEVERITY_LEVELS = {
 
 def load_transcript(file_path: str) -> dict:
     """
-    Loads the JSON file containing the diarized transcript.
+    Loads the file containing the diarized transcript (JSON or transcript_codec.py).
     """
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return transcripts.load_transcript(file_path)
 
 def detect_profanity(text: str) -> (str, list):
     """
@@ -77,13 +79,14 @@ def analyze_transcript(transcript_data: dict) -> dict:
 
     return {
         "severity level": overall_severity,
+        "severity_counts": severity_counts,
         "flagged_transcript": flagged_transcript,
         "detected_profanities": list(set(detected_profanities))  # Unique words only
     }
 
 def main():
     """Runs the profanity detection pipeline and prints JSON output."""
-    json_file_path = "diarized-transcript.json"
+    json_file_path = os.getenv('TRANSCRIPT_FILE_PATH', 'diarized-transcript.json')
 
     # Load transcript
     transcript_data = load_transcript(json_file_path)
@@ -93,7 +96,8 @@ def main():
 
     # Build the JSON output in the desired format
     output = {
-        "severity level": results["severity level"]
+        "severity level": results["severity level"],
+        "severity_counts": results["severity_counts"]
     }
     if results["detected_profanities"]:
         output["report"] = "Profanity detected."
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+export_analytics.py
+
+Exports calls with their typed insights (call_logs joined with
+call_insights), sales_data and sales_reps to Parquet or Arrow IPC files for
+analysis outside the app (DuckDB, pandas, Polars, Spark, ...).
+
+Rows are read with keyset pagination (db.iter_rows) and written in
+fixed-size record batches with a typed schema, so memory use does not grow
+with the table. Each run appends part files under <output>/<table>/ and
+records watermarks in <output>/export_state.json:
+
+- calls are exported incrementally by call_id (new calls) or, with
+  --since processed_at, by analysis time, which also picks up calls that
+  were re-analyzed; a call then appears in several parts, and the row with
+  the latest processed_at is current;
+- sales_data is exported incrementally by sale_id;
+- sales_reps is small and rewritten as one file on every run.
+
+Usage:
+    python export_analytics.py --output analytics
+    python export_analytics.py --output analytics --since processed_at --format arrow
+    duckdb -c "SELECT buyer_intent, avg(rating) FROM 'analytics/calls/*.parquet' GROUP BY 1"
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import db
+import telemetry
+
+CALL_LOG_COLUMNS = [
+    ("call_id", "int32"),
+    ("sales_rep_id", "int32"),
+    ("customer_id", "int32"),
+    ("call_date", "timestamp"),
+    ("duration_minutes", "int32"),
+    ("call_outcome", "string"),
+    ("processed_at", "timestamptz"),
+]
+
+# Columns of migrations/001 and 003, without the ones call_logs has
+CALL_INSIGHT_COLUMNS = [
+    ("summary", "string"),
+    ("rating", "int16"),
+    ("strengths", "list<string>"),
+    ("areas_for_improvement", "list<string>"),
+    ("buyer_intent", "string"),
+    ("buyer_intent_probability", "float32"),
+    ("profanity_severity", "string"),
+    ("profanity_mild_count", "int32"),
+    ("profanity_moderate_count", "int32"),
+    ("profanity_severe_count", "int32"),
+    ("detected_profanities", "list<string>"),
+    ("conversational_balance", "string"),
+    ("objection_handling", "string"),
+    ("pitch_optimization", "string"),
+    ("call_to_action", "string"),
+    ("rep_talk_ratio", "float32"),
+    ("customer_talk_ratio", "float32"),
+    ("rep_words", "int32"),
+    ("customer_words", "int32"),
+    ("turn_count", "int32"),
+    ("rep_questions", "int32"),
+    ("longest_monologue_seconds", "float32"),
+    ("sentiment_label", "string"),
+    ("sentiment_score", "float32"),
+    ("customer_sentiment_score", "float32"),
+    ("sentiment_trend", "string"),
+    ("final_minute_sentiment", "float32"),
+    ("transcript_hash", "string"),
+]
+
+SALES_DATA_COLUMNS = [
+    ("sale_id", "int32"),
+    ("sales_rep_id", "int32"),
+    ("sale_date", "date"),
+    ("sale_amount", "decimal"),
+    ("product_id", "int32"),
+    ("product_name", "string"),
+    ("quantity_sold", "int32"),
+    ("payment_method", "string"),
+    ("customer_id", "int32"),
+]
+
+SALES_REP_COLUMNS = [
+    ("sales_rep_id", "int32"),
+    ("sales_rep_first_name", "string"),
+    ("sales_rep_last_name", "string"),
+    ("Email", "string"),
+    ("Phone Number", "int64"),
+]
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# Overlap for the processed_at watermark, against clock skew between this host and the database
+PROCESSED_AT_OVERLAP = timedelta(minutes=5)
+
+
+def _require_pyarrow():
+    """
+    pyarrow is only needed by this tool, so it is imported here.
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("export_analytics.py needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+CONVERTERS = {
+    "timestamp": db.parse_timestamp,
+    "timestamptz": lambda value: db.parse_timestamp(value).astimezone(timezone.utc) if value else None,
+    "date": lambda value: date.fromisoformat(value[:10]) if value else None,
+    "decimal": lambda value: Decimal(str(value)).quantize(Decimal("0.01")) if value is not None else None,
+    "float32": lambda value: float(value) if value is not None else None,
+    "list<string>": lambda value: [str(item) for item in value] if isinstance(value, list) else None,
+}
+
+
+def arrow_schema(columns: list):
+    pa = _require_pyarrow()
+    types = {
+        "int16": pa.int16(),
+        "int32": pa.int32(),
+        "int64": pa.int64(),
+        "float32": pa.float32(),
+        "string": pa.string(),
+        "timestamp": pa.timestamp("us"),
+        "timestamptz": pa.timestamp("us", tz="UTC"),
+        "date": pa.date32(),
+        "decimal": pa.decimal128(12, 2),
+        "list<string>": pa.list_(pa.string()),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def record_batch(rows: list, columns: list, schema):
+    """Builds one typed record batch, column by column."""
+    pa = _require_pyarrow()
+    arrays = []
+    for (name, kind), field in zip(columns, schema):
+        convert = CONVERTERS.get(kind)
+        values = [row.get(name) for row in rows]
+        if convert is not None:
+            values = [convert(value) for value in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class PartWriter:
+    """
+    Streams record batches into one part file. The file is written under a
+    temporary name and renamed on close, so readers never see a partial part.
+    """
+
+    def __init__(self, path: str, schema, file_format: str):
+        pa = _require_pyarrow()
+        self.path = path
+        self.temp_path = path + ".tmp"
+        self.rows = 0
+        if file_format == "parquet":
+            self.writer = pa.parquet.ParquetWriter(self.temp_path, schema, compression="zstd")
+        else:
+            self.writer = pa.ipc.new_file(self.temp_path, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+
+    def write(self, batch):
+        if batch.num_rows:
+            self.writer.write_batch(batch)
+            self.rows += batch.num_rows
+
+    def abort(self):
+        self.writer.close()
+        os.remove(self.temp_path)
+
+    def close(self) -> int:
+        self.writer.close()
+        if self.rows:
+            os.replace(self.temp_path, self.path)
+        else:
+            os.remove(self.temp_path)
+        return self.rows
+
+
+def export_rows(rows, columns: list, path: str, file_format: str, batch_size: int, on_row=None) -> int:
+    """
+    Writes an iterable of row dicts to one part file in batches of
+    batch_size rows. Returns the number of rows written.
+    """
+    schema = arrow_schema(columns)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    writer = PartWriter(path, schema, file_format)
+    pending = []
+    try:
+        for row in rows:
+            pending.append(row)
+            if on_row is not None:
+                on_row(row)
+            if len(pending) >= batch_size:
+                writer.write(record_batch(pending, columns, schema))
+                pending = []
+        if pending:
+            writer.write(record_batch(pending, columns, schema))
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close()
+
+
+def _flatten_call(row: dict) -> dict:
+    """Moves the embedded call_insights columns up into the call row."""
+    insights = row.pop("call_insights", None)
+    if isinstance(insights, list):
+        insights = insights[0] if insights else None
+    row.update(insights or {})
+    return row
+
+
+def iter_calls(since: str, state: dict, page_size: int):
+    columns = ", ".join(name for name, _ in CALL_LOG_COLUMNS)
+    insight_columns = ", ".join(name for name, _ in CALL_INSIGHT_COLUMNS)
+    select = f"{columns}, call_insights({insight_columns})"
+    if since == "processed_at":
+        watermark = state.get("processed_at")
+        filters = (lambda query: query.gt("processed_at", watermark)) if watermark else \
+            (lambda query: query.not_.is_("processed_at", "null"))
+        rows = db.iter_rows("call_logs", select, key="call_id", batch_size=page_size, filters=filters)
+    else:
+        rows = db.iter_rows("call_logs", select, key="call_id", batch_size=page_size, start_after=state.get("call_id"))
+    for row in rows:
+        yield _flatten_call(row)
+
+
+def part_path(output: str, table: str, run_id: str, file_format: str) -> str:
+    return os.path.join(output, table, f"part-{run_id}{FORMATS[file_format]}")
+
+
+def load_state(output: str) -> dict:
+    try:
+        with open(os.path.join(output, "export_state.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(output: str, state: dict):
+    path = os.path.join(output, "export_state.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def reset(output: str, tables: list):
+    """Deletes the part files and watermarks of tables, for a full re-export."""
+    state = load_state(output)
+    for table in tables:
+        state.pop(table, None)
+        directory = os.path.join(output, table)
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.startswith("part-"):
+                    os.remove(os.path.join(directory, name))
+    if os.path.isdir(output):
+        save_state(output, state)
+
+
+def export(output: str, tables: list, since: str, file_format: str, batch_size: int, page_size: int) -> dict:
+    """
+    Runs one incremental export. Watermarks are saved after each table's
+    part file is complete, so an interrupted run is simply repeated.
+    Returns the number of rows written per table.
+    """
+    os.makedirs(output, exist_ok=True)
+    state = load_state(output)
+    started = datetime.now(timezone.utc)
+    run_id = started.strftime("%Y%m%dT%H%M%S%f")
+    written = {}
+
+    if "calls" in tables:
+        calls_state = state.setdefault("calls", {})
+        last_call = {}
+        with telemetry.span("export.calls", since=since):
+            written["calls"] = export_rows(
+                iter_calls(since, calls_state, page_size),
+                CALL_LOG_COLUMNS + CALL_INSIGHT_COLUMNS,
+                part_path(output, "calls", run_id, file_format),
+                file_format, batch_size,
+                on_row=lambda row: last_call.update(call_id=row["call_id"])
+            )
+        if since == "processed_at":
+            # Calls analyzed while the export ran may have been paged past;
+            # starting the next run a bit before this one re-exports them
+            calls_state["processed_at"] = (started - PROCESSED_AT_OVERLAP).isoformat()
+        elif last_call:
+            calls_state["call_id"] = last_call["call_id"]
+        save_state(output, state)
+
+    if "sales_data" in tables:
+        sales_state = state.setdefault("sales_data", {})
+        last_sale = {}
+        columns = ", ".join(name for name, _ in SALES_DATA_COLUMNS)
+        with telemetry.span("export.sales_data"):
+            written["sales_data"] = export_rows(
+                db.iter_rows("sales_data", columns, key="sale_id", batch_size=page_size,
+                             start_after=sales_state.get("sale_id")),
+                SALES_DATA_COLUMNS,
+                part_path(output, "sales_data", run_id, file_format),
+                file_format, batch_size,
+                on_row=lambda row: last_sale.update(sale_id=row["sale_id"])
+            )
+        if last_sale:
+            sales_state["sale_id"] = last_sale["sale_id"]
+        save_state(output, state)
+
+    if "sales_reps" in tables:
+        columns = ", ".join(f'"{name}"' if " " in name else name for name, _ in SALES_REP_COLUMNS)
+        with telemetry.span("export.sales_reps"):
+            written["sales_reps"] = export_rows(
+                db.iter_rows("sales_reps", columns, key="sales_rep_id", batch_size=page_size),
+                SALES_REP_COLUMNS,
+                os.path.join(output, "sales_reps", "sales_reps" + FORMATS[file_format]),
+                file_format, batch_size
+            )
+
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export calls, insights and sales data to Parquet/Arrow files")
+    parser.add_argument("--output", default="analytics", help="Output directory")
+    parser.add_argument("--tables", default="calls,sales_data,sales_reps")
+    parser.add_argument("--since", choices=["call_id", "processed_at"], default="call_id",
+                        help="Watermark for incremental call exports")
+    parser.add_argument("--format", dest="file_format", choices=list(FORMATS), default="parquet")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Rows per record batch / row group")
+    parser.add_argument("--page-size", type=int, default=1000, help="Rows per Supabase request")
+    parser.add_argument("--full", action="store_true", help="Ignore saved watermarks and export everything")
+    args = parser.parse_args()
+
+    _require_pyarrow()
+    tables = [name.strip() for name in args.tables.split(",") if name.strip()]
+    if args.full:
+        reset(args.output, tables)
+    written = export(args.output, tables, args.since, args.file_format, args.batch_size, args.page_size)
+    for table, rows in written.items():
+        print(f"{table}: {rows} rows", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
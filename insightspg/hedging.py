@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+hedging.py
+
+Hedged LLM requests (opt-in with LLM_HEDGE=1).
+
+A request that has not completed after the LLM_HEDGE_PERCENTILE percentile
+of recently observed latencies is sent a second time on a fresh client. The
+first response wins and the other request is cancelled by closing its
+client. At most LLM_HEDGE_BUDGET of the recent requests may be hedged, which
+caps the extra load at roughly that fraction.
+
+The latency history is kept per endpoint in a state file next to the circuit
+breaker state, so the percentile reflects every insights.py process and not
+only the current one.
+
+Metrics: insights_llm_hedge_requests_total, insights_llm_hedges_total and
+insights_llm_hedge_wins_total (hedge rate = hedges / requests, win rate =
+wins / hedges), plus the insights_llm_hedge_delay_seconds gauge.
+"""
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import telemetry
+from circuit_breaker import locked_json, state_path
+
+DEFAULTS = {
+    "percentile": 95.0,    # hedge once a request is slower than this share of recent ones
+    "budget": 0.1,         # at most this fraction of recent requests is hedged
+    "history": 200,        # latencies (and hedge decisions) remembered per endpoint
+    "min_samples": 20,     # no hedging until this many latencies were observed
+    "min_delay": 0.1,      # never hedge sooner than this, in seconds
+}
+
+
+def enabled() -> bool:
+    return os.getenv("LLM_HEDGE", "0").lower() in ("1", "true", "yes")
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def _close(client):
+    close = getattr(client, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception:
+            pass
+
+
+class HedgePolicy:
+    def __init__(self, endpoint: str, state_dir: str = None, **settings):
+        self.endpoint = endpoint
+        self.settings = {
+            name: type(default)(os.getenv(f"LLM_HEDGE_{name.upper()}", default))
+            for name, default in DEFAULTS.items()
+        }
+        self.settings.update(settings)
+        self.path = state_path("latency", endpoint, state_dir)
+
+    def delay(self):
+        """Seconds to wait before hedging, or None while there is too little history."""
+        with locked_json(self.path) as state:
+            latencies = state.get("latencies", [])
+        if len(latencies) < self.settings["min_samples"]:
+            return None
+        return max(self.settings["min_delay"], percentile(latencies, self.settings["percentile"]))
+
+    def _decide(self, hedge: bool) -> bool:
+        """Records whether the current request is hedged; a hedge over budget is refused."""
+        with locked_json(self.path) as state:
+            decisions = state.get("hedged", [])
+            if hedge and (sum(decisions) + 1) / (len(decisions) + 1) > self.settings["budget"]:
+                hedge = False
+                telemetry.increment("insights_llm_hedge_budget_exhausted_total", endpoint=self.endpoint)
+            state["hedged"] = (decisions + [int(hedge)])[-self.settings["history"]:]
+        return hedge
+
+    def record(self, seconds: float):
+        with locked_json(self.path) as state:
+            state["latencies"] = (state.get("latencies", []) + [round(seconds, 4)])[-self.settings["history"]:]
+
+    def call(self, send, new_client, analyzer: str, span=None):
+        """
+        Runs send(client) on a new client, and once more on a second client if
+        the first has not answered within delay(). Returns the first successful
+        result; raises the first error if every request failed.
+        """
+        telemetry.increment("insights_llm_hedge_requests_total", analyzer=analyzer)
+        pool = ThreadPoolExecutor(max_workers=2)
+
+        def timed(client, role):
+            started = time.monotonic()
+            result = send(client)
+            return role, result, time.monotonic() - started
+
+        primary_client = new_client()
+        clients = {pool.submit(timed, primary_client, "primary"): primary_client}
+        try:
+            delay = self.delay()
+            if delay is not None:
+                telemetry.gauge("insights_llm_hedge_delay_seconds", delay, endpoint=self.endpoint)
+                done, _ = wait(clients, timeout=delay)
+                if self._decide(hedge=not done):
+                    hedge_client = new_client()
+                    clients[pool.submit(timed, hedge_client, "hedge")] = hedge_client
+                    telemetry.increment("insights_llm_hedges_total", analyzer=analyzer)
+                    if span is not None:
+                        span.set(hedged=True)
+
+            errors = []
+            pending = set(clients)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        role, result, seconds = future.result()
+                    except Exception as e:
+                        errors.append(e)
+                        continue
+                    self.record(seconds)
+                    if role == "hedge":
+                        telemetry.increment("insights_llm_hedge_wins_total", analyzer=analyzer)
+                        if span is not None:
+                            span.set(hedge_won=True)
+                    # Cancel the loser: closing its client aborts the request
+                    for other in pending:
+                        other.cancel()
+                        _close(clients[other])
+                    return result
+            raise errors[0]
+        finally:
+            pool.shutdown(wait=False)
+
+
+_policies = {}
+
+
+def for_endpoint(endpoint: str) -> HedgePolicy:
+    """Returns the hedge policy of an endpoint, created on first use."""
+    if endpoint not in _policies:
+        _policies[endpoint] = HedgePolicy(endpoint)
+    return _policies[endpoint]
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+import_budget.py
+
+Guards the import cost of the insights modules. Each module is imported in a
+fresh interpreter under `python -X importtime`; the check fails if the
+cumulative import time exceeds the budget or if a heavy dependency (sklearn,
+groq, ...) gets pulled in at import time instead of on first use.
+
+Usage:
+    python import_budget.py                  # default budget of 150 ms per module
+    python import_budget.py --budget-ms 80   # tighter budget
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+MODULES = [
+    "insights",
+    "call_summary",
+    "custom_rag",
+    "buyer_intent",
+    "detect_profanity",
+    "sentiment",
+    "call_phases",
+    "llm",
+    "llm_governor",
+    "transcript_codec",
+    "telemetry",
+    "profiling",
+]
+
+# Packages that must only be imported on first use
+HEAVY_PACKAGES = ["sklearn", "scipy", "numpy", "groq", "httpx", "pydantic", "dotenv"]
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure(module_name: str):
+    """
+    Imports module_name in a fresh interpreter.
+    Returns (cumulative microseconds, set of imported top-level packages).
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=current_dir,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module_name} failed:\n{completed.stderr}")
+
+    cumulative_us = 0
+    imported = set()
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        imported.add(name.split(".")[0])
+        if name == module_name:
+            cumulative_us = int(match.group(2))
+    return cumulative_us, imported
+
+
+def check(budget_ms: float) -> list:
+    """Returns a list of budget violations, empty if every module is within budget."""
+    violations = []
+    for module_name in MODULES:
+        cumulative_us, imported = measure(module_name)
+        heavy = sorted(package for package in HEAVY_PACKAGES if package in imported)
+        print(f"{module_name:<20} {cumulative_us / 1000:8.1f} ms  eager: {', '.join(heavy) or '-'}")
+        if cumulative_us / 1000 > budget_ms:
+            violations.append(f"{module_name} took {cumulative_us / 1000:.1f} ms (budget {budget_ms} ms)")
+        if heavy:
+            violations.append(f"{module_name} imports {', '.join(heavy)} at import time")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import-time budget of the insights modules")
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="Cumulative import budget per module")
+    args = parser.parse_args()
+
+    violations = check(args.budget_ms)
+    if violations:
+        print("\nImport budget exceeded:", file=sys.stderr)
+        for violation in violations:
+            print(f"  - {violation}", file=sys.stderr)
+        sys.exit(1)
+    print("\nAll modules within import budget.")
+
+
+if __name__ == "__main__":
+    main()
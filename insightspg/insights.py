@@ -6,6 +6,17 @@ import json
 import sys
 import os
 
+import analysis_graph
+import local_fallbacks
+import profiling
+import sentiment
+import telemetry
+import transcripts
+
+# Modules that raised during this run; their results get no fingerprint so
+# reanalyze.py picks them up again
+failed_modules = set()
+
 def run_script(module_name):
     """
     Executes a Python module as if it were run as a standalone script.
@@ -24,6 +35,8 @@ def run_script(module_name):
             return output_buffer.getvalue().strip()
         except Exception as e:
             print(f"Error running {module_name}: {e}", file=sys.stderr)
+            telemetry.increment("insights_analyzer_errors_total", analyzer=module_name)
+            failed_modules.add(module_name)
             return "{}"
 
 def parse_json_output(output):
@@ -79,39 +92,69 @@ def get_profanity_check():
     result = parse_json_output(output)
     return json.dumps(result)
 
+def selected_analyzers():
+    """
+    Analyzers to run: all of them, or the comma-separated names in
+    INSIGHTS_ANALYZERS (set by reanalyze.py to re-run only stale ones).
+    """
+    requested = [name.strip() for name in os.getenv('INSIGHTS_ANALYZERS', '').split(',') if name.strip()]
+    unknown = [name for name in requested if name not in analysis_graph.ANALYZERS]
+    if unknown:
+        print(f"Ignoring unknown analyzers: {', '.join(unknown)}", file=sys.stderr)
+    return [name for name in analysis_graph.ANALYZERS if name in requested] or list(analysis_graph.ANALYZERS)
+
 def get_analysis():
     """Returns combined analysis results as JSON."""
-    # Get the transcript from the diarized-transcript.json file
-    transcript_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'diarized-transcript.json')
+    # Get the transcript from TRANSCRIPT_FILE_PATH, or the diarized-transcript.json file
+    transcript_path = os.getenv('TRANSCRIPT_FILE_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'diarized-transcript.json')
     transcript = {}
-    if os.path.exists(transcript_path):
-        try:
-            with open(transcript_path, 'r') as f:
-                transcript = json.load(f)
-        except Exception as e:
-            print(f"Error loading transcript: {e}", file=sys.stderr)
+    with telemetry.span("transcript.load"):
+        if os.path.exists(transcript_path):
+            try:
+                transcript = transcripts.load_transcript(transcript_path)
+            except Exception as e:
+                print(f"Error loading transcript: {e}", file=sys.stderr)
+    
+    runners = {
+        "call_summary": get_call_summary,
+        "custom_rag": get_custom_rag_analysis,
+        "buyer_intent": get_buyer_intent,
+        "profanity": get_profanity_check,
+        "talk_metrics": lambda: transcripts.talk_metrics(transcripts.get_segments(transcript)),
+        "sentiment": lambda: sentiment.analyze(transcripts.get_segments(transcript)),
+    }
+    selected = selected_analyzers()
     
     # Get analysis results from each module
-    call_summary = get_call_summary()
-    custom_rag = get_custom_rag_analysis()
-    buyer_intent = get_buyer_intent()
-    profanity = get_profanity_check()
+    analysis = {}
+    for name in selected:
+        with telemetry.span("analyzer", analyzer=name):
+            analysis[name] = runners[name]()
+    # The transcript itself is not echoed back: the caller already has it,
+    # and on long calls it was most of the output
+    # Analyzers that answered locally because the LLM was unavailable
+    analysis["degraded"] = sorted(local_fallbacks.DEGRADED)
     
-    # Combine results
-    analysis = {
-        "call_summary": call_summary,
-        "custom_rag": custom_rag,
-        "buyer_intent": buyer_intent,
-        "profanity": profanity,
-        "transcript": transcript
-    }
+    # Record what the results were computed from, see analysis_graph.py
+    try:
+        versions = analysis_graph.input_versions(analysis_graph.transcript_version(file_path=transcript_path))
+        # Failed and degraded results get no fingerprint, which leaves them
+        # stale for reanalyze.py to enrich later
+        succeeded = [
+            name for name in selected
+            if analysis_graph.ANALYZERS[name]["module"] not in failed_modules and name not in local_fallbacks.DEGRADED
+        ]
+        analysis["fingerprints"] = analysis_graph.fingerprints(versions, succeeded)
+    except Exception as e:
+        print(f"Error computing analyzer fingerprints: {e}", file=sys.stderr)
     
     return analysis
 
 def main():
     """Main function to print the analysis as JSON."""
-    analysis = get_analysis()
-    print(json.dumps(analysis, indent=2))
+    with telemetry.span("insights.get_analysis"), profiling.maybe_profile("insights.get_analysis"):
+        analysis = get_analysis()
+    print(json.dumps(analysis, separators=(",", ":")))
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+insights_store.py
+
+Repository for the typed call_insights table (see migrations/001_call_insights.sql).
+
+call_logs.insights stores the formatted blob built by server.js, with the
+analyzer outputs nested as JSON strings inside raw_insights. row_from_call()
+flattens one such blob into a call_insights row; InsightsRepository writes
+rows in batches and serves indexed reads and aggregates.
+
+Usage:
+    python insights_store.py backfill            # one-time migration of existing blobs
+    python insights_store.py ratings --from 2024-01-01
+"""
+
+import argparse
+import json
+import sys
+
+import db
+import sentiment
+import telemetry
+import transcripts
+
+TABLE = "call_insights"
+INTENT_LABELS = ["Highly Interested", "Interested", "Disinterested", "Highly Disinterested", "Neutral"]
+SEVERITIES = ["clean", "mild", "moderate", "severe"]
+
+
+def _parse_json(value, default=None):
+    """Parses value if it is a JSON string, returns it unchanged if already decoded."""
+    if isinstance(value, (dict, list)):
+        return value
+    if not value:
+        return default
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _unwrap(value, key):
+    """Unwraps the {"<key>": {"output": "<json>"}} envelope the analyzer scripts print."""
+    value = _parse_json(value, {}) or {}
+    if isinstance(value.get(key), dict) and "output" in value[key]:
+        return _parse_json(value[key]["output"], {}) or {}
+    return value
+
+
+def _as_list(value):
+    """Accepts a list or the "\\n• a\\n• b" bullet string produced by call_summary.py."""
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    if isinstance(value, str):
+        return [item.strip() for item in value.split("•") if item.strip()]
+    return []
+
+
+def _severity(value) -> str:
+    """Maps "Severe ❌" / "Mild ⚠️" / ... to the severity key."""
+    word = (value or "clean").split()[0].lower() if (value or "").strip() else "clean"
+    return word if word in SEVERITIES else "clean"
+
+
+def row_from_call(call: dict) -> dict:
+    """
+    Builds a call_insights row from a call_logs row with call_id,
+    sales_rep_id, call_date, transcription, insights and processed_at.
+    """
+    insights = _parse_json(call.get("insights"), {}) or {}
+    raw = insights.get("raw_insights") or {}
+
+    summary = _parse_json(raw.get("call_summary"), {}) or {}
+    intent = _parse_json(raw.get("buyer_intent"), {}) or {}
+    profanity = _unwrap(raw.get("profanity"), "profanity_check")
+    coaching = _unwrap(raw.get("custom_rag"), "custom_rag")
+
+    buyer_intent = intent.get("buyer_intent") or insights.get("buyer_intent")
+    if buyer_intent not in INTENT_LABELS:
+        buyer_intent = None
+    rating = summary.get("rating", insights.get("rating"))
+    try:
+        rating = max(0, min(100, int(rating))) if rating is not None else None
+    except (TypeError, ValueError):
+        rating = None
+    severity_counts = profanity.get("severity_counts") or {}
+
+    metrics = insights.get("talk_metrics") or raw.get("talk_metrics")
+    mood = insights.get("sentiment") or raw.get("sentiment")
+    if not metrics or not mood:
+        segments = transcripts.get_segments(raw.get("transcript") or {})
+        if not segments and call.get("transcription"):
+            segments = transcripts.segments_from_transcription(call["transcription"])
+        metrics = metrics or transcripts.talk_metrics(segments)
+        mood = mood or sentiment.analyze(segments)
+
+    return {
+        "call_id": call["call_id"],
+        "sales_rep_id": call.get("sales_rep_id"),
+        "call_date": call.get("call_date"),
+        "summary": summary.get("summary") or insights.get("summary"),
+        "rating": rating,
+        "strengths": _as_list(summary.get("strengths", insights.get("strengths"))),
+        "areas_for_improvement": _as_list(summary.get("areas_for_improvement", insights.get("areas_for_improvement"))),
+        "buyer_intent": buyer_intent,
+        "buyer_intent_probability": intent.get("confidence", insights.get("buyer_intent_confidence")),
+        "profanity_severity": _severity(profanity.get("severity level") or insights.get("profanity_level")),
+        "profanity_mild_count": severity_counts.get("mild", 0),
+        "profanity_moderate_count": severity_counts.get("moderate", 0),
+        "profanity_severe_count": severity_counts.get("severe", 0),
+        "detected_profanities": profanity.get("detected_profanities") or [],
+        "conversational_balance": coaching.get("Conversational Balance") or insights.get("conversational_balance"),
+        "objection_handling": coaching.get("Objection Handling") or insights.get("objection_handling"),
+        "pitch_optimization": coaching.get("Pitch Optimization") or insights.get("pitch_optimization"),
+        "call_to_action": coaching.get("Call-to-Action Execution") or insights.get("call_to_action"),
+        "rep_talk_ratio": metrics.get("rep_talk_ratio"),
+        "customer_talk_ratio": metrics.get("customer_talk_ratio"),
+        "rep_words": metrics.get("rep_words"),
+        "customer_words": metrics.get("customer_words"),
+        "turn_count": metrics.get("turn_count"),
+        "rep_questions": metrics.get("rep_questions"),
+        "longest_monologue_seconds": metrics.get("longest_monologue_seconds"),
+        "sentiment_label": mood.get("label"),
+        "sentiment_score": mood.get("score"),
+        "customer_sentiment_score": mood.get("customer_score"),
+        "sentiment_trend": mood.get("trend"),
+        "final_minute_sentiment": mood.get("final_minute_score"),
+        "transcript_hash": insights.get("transcript_hash"),
+        "fingerprints": insights.get("fingerprints") or raw.get("fingerprints"),
+        "processed_at": call.get("processed_at"),
+    }
+
+
+class InsightsRepository:
+    """Reads and writes the call_insights table."""
+
+    def __init__(self, client=None):
+        self.client = client or db.get_supabase()
+
+    def upsert_many(self, rows: list, batch_size: int = 500) -> int:
+        """Upserts rows on call_id in batches. Returns the number of rows written."""
+        written = 0
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            with telemetry.span("insights_store.upsert", rows=len(batch)):
+                self.client.table(TABLE).upsert(batch, on_conflict="call_id").execute()
+            written += len(batch)
+        return written
+
+    def get(self, call_id: int):
+        result = self.client.table(TABLE).select("*").eq("call_id", call_id).limit(1).execute()
+        return result.data[0] if result.data else None
+
+    def for_sales_rep(self, sales_rep_id: int, date_from=None, date_to=None, limit: int = 100) -> list:
+        """Latest insights of one rep; served by call_insights_rep_date_idx."""
+        query = self.client.table(TABLE).select("*").eq("sales_rep_id", sales_rep_id)
+        if date_from:
+            query = query.gte("call_date", date_from)
+        if date_to:
+            query = query.lt("call_date", date_to)
+        return query.order("call_date", desc=True).limit(limit).execute().data or []
+
+    def with_profanity(self, severity: str = "severe", date_from=None, limit: int = 100) -> list:
+        query = self.client.table(TABLE).select("call_id, sales_rep_id, call_date, profanity_severity, detected_profanities")
+        query = query.eq("profanity_severity", severity)
+        if date_from:
+            query = query.gte("call_date", date_from)
+        return query.order("call_date", desc=True).limit(limit).execute().data or []
+
+    def rating_by_rep(self, date_from=None, date_to=None) -> list:
+        return self.client.rpc("insights_rating_by_rep", {"date_from": date_from, "date_to": date_to}).execute().data or []
+
+    def intent_distribution(self, date_from=None, date_to=None) -> list:
+        return self.client.rpc("insights_intent_distribution", {"date_from": date_from, "date_to": date_to}).execute().data or []
+
+    def profanity_counts(self, date_from=None, date_to=None) -> list:
+        return self.client.rpc("insights_profanity_counts", {"date_from": date_from, "date_to": date_to}).execute().data or []
+
+
+def backfill(repository: InsightsRepository, batch_size: int = 500) -> int:
+    """
+    Flattens every existing call_logs.insights blob into call_insights.
+    Safe to re-run: rows are upserted on call_id.
+    """
+    rows = []
+    written = 0
+    for call in db.iter_rows(
+        "call_logs",
+        "call_id, sales_rep_id, call_date, transcription, insights, processed_at",
+        key="call_id",
+        batch_size=batch_size,
+        filters=lambda query: query.not_.is_("insights", "null")
+    ):
+        try:
+            rows.append(row_from_call(call))
+        except Exception as e:
+            print(f"Skipping call {call.get('call_id')}: {e}", file=sys.stderr)
+        if len(rows) >= batch_size:
+            written += repository.upsert_many(rows, batch_size)
+            rows = []
+    if rows:
+        written += repository.upsert_many(rows, batch_size)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Typed call insights store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subparsers.add_parser("backfill", help="Migrate call_logs.insights blobs into call_insights")
+    backfill_parser.add_argument("--batch-size", type=int, default=500)
+    for name in ("ratings", "intents", "profanity"):
+        report_parser = subparsers.add_parser(name)
+        report_parser.add_argument("--from", dest="date_from", default=None)
+        report_parser.add_argument("--to", dest="date_to", default=None)
+    args = parser.parse_args()
+
+    repository = InsightsRepository()
+    if args.command == "backfill":
+        count = backfill(repository, args.batch_size)
+        print(f"Backfilled {count} calls into {TABLE}", file=sys.stderr)
+        return
+    report = {
+        "ratings": repository.rating_by_rep,
+        "intents": repository.intent_distribution,
+        "profanity": repository.profanity_counts,
+    }[args.command]
+    print(json.dumps(report(args.date_from, args.date_to), indent=2))
+
+
+if __name__ == "__main__":
+    main()
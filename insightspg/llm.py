@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+llm.py
+
+Shared entry point for every chat completion made by the analyzers. The
+backend (Groq, an OpenAI-compatible server or a local stub) and the model of
+each analyzer are configured in llm_backends.py.
+
+Each attempt is traced as an `llm.request` span carrying the analyzer name,
+backend, model, attempt number and token usage. Retries are handled here
+rather than inside the SDK so that every retry is visible in the trace and
+counted in `insights_llm_retries_total`.
+
+Calls go through a per-model circuit breaker (circuit_breaker.py). While a
+circuit is open, chat_completion raises CircuitOpenError immediately and the
+analyzers use their local fallbacks (local_fallbacks.py). With LLM_HEDGE=1,
+slow requests are hedged (hedging.py).
+
+Every attempt is admitted by llm_governor.py first: it waits for a slot by
+priority class and organization, and raises BudgetExceededError once the
+organization's daily token budget is used up, which the analyzers handle
+like an open circuit.
+"""
+
+import os
+import time
+
+import circuit_breaker
+import hedging
+import llm_backends
+import llm_governor
+import telemetry
+from circuit_breaker import CircuitOpenError
+from llm_governor import BudgetExceededError, QueueTimeoutError
+
+_env_loaded = False
+
+
+def load_env():
+    """
+    Loads the .env file on first use instead of at import time, so importing
+    an analyzer never touches the filesystem or the process environment.
+    """
+    global _env_loaded
+    if _env_loaded:
+        return
+    _env_loaded = True
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
+
+def max_retries() -> int:
+    return int(os.getenv("LLM_MAX_RETRIES") or os.getenv("GROQ_MAX_RETRIES") or "2")
+
+
+def endpoint_for(analyzer: str) -> str:
+    """Circuit breaker and hedging key of an analyzer: "<backend>:<model>"."""
+    backend = llm_backends.get_backend()
+    return f"{backend.name}:{llm_backends.model_for(analyzer, backend)}"
+
+
+def chat_completion(analyzer: str, messages: list, model: str = None, usage: dict = None, **params) -> str:
+    """
+    Sends a chat completion request and returns the message content.
+    `analyzer` labels the spans and metrics produced for this request and
+    picks the model unless one is given (see llm_backends.model_for).
+    If `usage` is given, it is filled with the prompt/completion token counts.
+    """
+    backend = llm_backends.get_backend()
+    model = model or llm_backends.model_for(analyzer, backend)
+    breaker = circuit_breaker.for_endpoint(f"{backend.name}:{model}")
+    batcher = llm_backends.get_batcher(backend)
+    retries = max_retries()
+    client = None
+    attempt = 0
+
+    def send(client):
+        return backend.send(client, messages, model, params)
+
+    while True:
+        # Admission may wait in the queue or fail on the budget, so it comes
+        # before the breaker: a half-open probe is only let through once the
+        # call is about to be sent, and always reports its outcome
+        ticket = llm_governor.get_governor().admit(analyzer, messages, params)
+        if not breaker.allow():
+            ticket.release(success=False)
+            telemetry.increment("insights_llm_circuit_rejections_total", analyzer=analyzer, endpoint=breaker.endpoint)
+            raise CircuitOpenError(breaker.endpoint, breaker.retry_after())
+        started = time.monotonic()
+        try:
+            with telemetry.span("llm.request", analyzer=analyzer, backend=backend.name, model=model, attempt=attempt) as current:
+                if batcher is not None:
+                    import concurrent.futures
+                    try:
+                        completion = batcher.submit(messages, model, params).result(
+                            timeout=batcher.window + llm_backends.request_timeout()
+                        )
+                    except concurrent.futures.TimeoutError:
+                        # Before Python 3.11 this is not the built-in TimeoutError,
+                        # an OSError that is_retryable() counts as a timeout
+                        raise TimeoutError(f"LLM batch did not complete within {llm_backends.request_timeout()}s")
+                elif hedging.enabled():
+                    policy = hedging.for_endpoint(breaker.endpoint)
+                    completion = policy.call(send, backend.new_client, analyzer, span=current)
+                else:
+                    client = client or backend.new_client()
+                    completion = send(client)
+                if completion.prompt_tokens is not None:
+                    tokens = {
+                        "prompt_tokens": completion.prompt_tokens,
+                        "completion_tokens": completion.completion_tokens or 0
+                    }
+                    current.set(**tokens)
+                    if usage is not None:
+                        usage.update(tokens)
+                    telemetry.increment("insights_llm_tokens_total", tokens["prompt_tokens"], analyzer=analyzer, kind="prompt")
+                    telemetry.increment("insights_llm_tokens_total", tokens["completion_tokens"], analyzer=analyzer, kind="completion")
+                    ticket.record(tokens["prompt_tokens"] + tokens["completion_tokens"])
+            breaker.record(True, time.monotonic() - started)
+            ticket.release()
+            return completion.content
+        except Exception as e:
+            ticket.release(success=False)
+            telemetry.increment("insights_llm_errors_total", analyzer=analyzer, error=type(e).__name__)
+            retryable = backend.is_retryable(e)
+            # Only provider-side failures count against the circuit; a
+            # rejected request means the endpoint is up
+            breaker.record(not retryable, time.monotonic() - started)
+            if attempt >= retries or not retryable:
+                raise
+            telemetry.increment("insights_llm_retries_total", analyzer=analyzer)
+            time.sleep(min(0.5 * 2 ** attempt, 8.0))
+            attempt += 1
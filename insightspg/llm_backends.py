@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+llm_backends.py
+
+Chat completion backends, selected with LLM_BACKEND:
+
+- groq    → Groq's hosted models through the groq SDK (default)
+- openai  → any OpenAI-compatible HTTP server (vLLM, llama.cpp, Ollama,
+            mock_llm_server.py, ...) at LLM_BASE_URL, using only the stdlib
+- stub    → deterministic canned replies, no network (offline runs and tests)
+
+Models are chosen per analyzer: LLM_MODEL_<ANALYZER> (e.g.
+LLM_MODEL_BUYER_INTENT=llama3-8b-8192), then LLM_MODEL, then the backend's
+default model.
+
+Backends that can answer several requests in one round trip set
+supports_batching; MicroBatcher groups requests arriving within
+LLM_BATCH_WINDOW_MS into such batches.
+"""
+
+import json
+import os
+import threading
+
+import telemetry
+
+# Status codes worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class Completion:
+    """A backend-independent chat completion result."""
+
+    def __init__(self, content: str, prompt_tokens: int = None, completion_tokens: int = None):
+        self.content = content
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+class BackendHTTPError(Exception):
+    """Non-2xx response from an HTTP backend."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+
+
+class LLMBackend:
+    """
+    Interface for chat completion backends. new_client() returns an object
+    holding one connection; closing it (if it has close()) cancels a request
+    in flight, which hedging relies on.
+    """
+    name = "base"
+    default_model = None
+    supports_batching = False
+
+    def new_client(self):
+        return None
+
+    def send(self, client, messages: list, model: str, params: dict) -> Completion:
+        raise NotImplementedError
+
+    def send_batch(self, requests: list) -> list:
+        """requests are (messages, model, params) tuples; returns Completions or exceptions."""
+        raise NotImplementedError
+
+    def is_retryable(self, error: Exception) -> bool:
+        """Returns True for connection failures, timeouts, 408/409/429 and 5xx responses."""
+        import http.client
+        if isinstance(error, (OSError, http.client.HTTPException)):
+            return True
+        status_code = getattr(error, "status_code", None)
+        if status_code is None:
+            return False
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+
+
+def request_timeout() -> float:
+    """Per-request timeout in seconds, so a hanging provider cannot stall an analysis."""
+    return float(os.getenv("LLM_TIMEOUT_SECONDS") or os.getenv("GROQ_TIMEOUT_SECONDS") or "20")
+
+
+class GroqBackend(LLMBackend):
+    name = "groq"
+    default_model = "llama3-70b-8192"
+
+    def new_client(self):
+        """
+        Creates a Groq client with SDK-level retries disabled.
+        groq is imported here, on first use, because importing it is slow.
+        Raises ImportError if the groq module is not installed.
+        """
+        import llm
+        llm.load_env()
+        import groq
+        return groq.Groq(api_key=os.getenv('GROQ_API_KEY'), max_retries=0, timeout=request_timeout())
+
+    def send(self, client, messages, model, params):
+        response = client.chat.completions.create(messages=messages, model=model, stream=False, **params)
+        usage = getattr(response, "usage", None)
+        return Completion(
+            response.choices[0].message.content,
+            usage.prompt_tokens if usage is not None else None,
+            usage.completion_tokens if usage is not None else None
+        )
+
+    def is_retryable(self, error):
+        """Returns True for connection failures, timeouts, 408/409/429 and 5xx responses."""
+        import groq
+        if isinstance(error, (groq.APIConnectionError, groq.APITimeoutError)):
+            return True
+        return super().is_retryable(error)
+
+
+class HTTPClient:
+    """One keep-alive connection to an OpenAI-compatible server."""
+
+    def __init__(self, base_url: str, api_key: str = None, timeout: float = None):
+        # http.client pulls in the email package, so it is imported on first use
+        import http.client
+        import urllib.parse
+        parsed = urllib.parse.urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        self.connection = connection_class(parsed.netloc, timeout=timeout)
+        self.prefix = parsed.path.rstrip("/")
+        self.headers = {"Content-Type": "application/json"}
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+
+    def post(self, path: str, body: dict) -> dict:
+        self.connection.request("POST", self.prefix + path, body=json.dumps(body), headers=self.headers)
+        response = self.connection.getresponse()
+        payload = response.read()
+        if response.status >= 300:
+            raise BackendHTTPError(response.status, payload[:200].decode("utf-8", errors="replace"))
+        return json.loads(payload)
+
+    def close(self):
+        self.connection.close()
+
+
+def _completion_from_json(body: dict) -> Completion:
+    usage = body.get("usage") or {}
+    return Completion(
+        body["choices"][0]["message"]["content"],
+        usage.get("prompt_tokens"),
+        usage.get("completion_tokens")
+    )
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    Any server implementing POST {LLM_BASE_URL}/chat/completions. If the
+    server also accepts {"requests": [...]} at LLM_BATCH_PATH (as
+    mock_llm_server.py does at /chat/completions/batch), requests are
+    micro-batched.
+    """
+    name = "openai"
+
+    def __init__(self):
+        self.base_url = os.getenv("LLM_BASE_URL", "http://127.0.0.1:8090/v1")
+        self.api_key = os.getenv("LLM_API_KEY")
+        self.default_model = os.getenv("LLM_MODEL", "default")
+        self.batch_path = os.getenv("LLM_BATCH_PATH")
+        self.supports_batching = bool(self.batch_path)
+
+    def new_client(self):
+        return HTTPClient(self.base_url, self.api_key, request_timeout())
+
+    def send(self, client, messages, model, params):
+        return _completion_from_json(client.post("/chat/completions", {"model": model, "messages": messages, **params}))
+
+    def send_batch(self, requests):
+        client = self.new_client()
+        try:
+            body = client.post(self.batch_path, {
+                "requests": [{"model": model, "messages": messages, **params} for messages, model, params in requests]
+            })
+        finally:
+            client.close()
+        results = []
+        for item in body["responses"]:
+            if "error" in item:
+                results.append(BackendHTTPError(item.get("status", 500), item["error"].get("message", "")))
+            else:
+                results.append(_completion_from_json(item))
+        return results
+
+
+class StubBackend(LLMBackend):
+    """Deterministic canned replies (see mock_llm_server.py) with no network."""
+    name = "stub"
+    default_model = "stub"
+    supports_batching = True
+
+    def send(self, client, messages, model, params):
+        import mock_llm_server
+        content = json.dumps(mock_llm_server.pick_reply(messages))
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in messages)
+        return Completion(content, prompt_tokens, len(content.split()))
+
+    def send_batch(self, requests):
+        return [self.send(None, messages, model, params) for messages, model, params in requests]
+
+
+BACKENDS = {
+    GroqBackend.name: GroqBackend,
+    OpenAICompatibleBackend.name: OpenAICompatibleBackend,
+    StubBackend.name: StubBackend,
+}
+
+_backend = None
+
+
+def get_backend() -> LLMBackend:
+    """Returns the backend named by LLM_BACKEND, created on first use."""
+    global _backend
+    import llm
+    llm.load_env()
+    name = os.getenv("LLM_BACKEND", "groq")
+    if _backend is None or _backend.name != name:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown LLM backend '{name}', expected one of: {', '.join(BACKENDS)}")
+        _backend = BACKENDS[name]()
+    return _backend
+
+
+def model_for(analyzer: str, backend: LLMBackend = None) -> str:
+    """
+    Model for an analyzer label such as "buyer_intent" or "buyer_intent.repair":
+    LLM_MODEL_BUYER_INTENT, then LLM_MODEL, then the backend default.
+    """
+    backend = backend or get_backend()
+    base = analyzer.split(".", 1)[0].upper()
+    return os.getenv(f"LLM_MODEL_{base}") or os.getenv("LLM_MODEL") or backend.default_model
+
+
+class MicroBatcher:
+    """
+    Collects requests for up to window_ms (or until max_size are waiting) and
+    sends them to the backend as one batch. submit() returns a Future.
+    """
+
+    def __init__(self, backend: LLMBackend, window_ms: float, max_size: int = 16):
+        self.backend = backend
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.pending = []
+        self.timer = None
+
+    def submit(self, messages: list, model: str, params: dict):
+        from concurrent.futures import Future
+        future = Future()
+        with self.lock:
+            self.pending.append((future, (messages, model, params)))
+            if len(self.pending) >= self.max_size:
+                batch = self._take()
+            else:
+                batch = None
+                if self.timer is None:
+                    self.timer = threading.Timer(self.window, self._flush)
+                    self.timer.daemon = True
+                    self.timer.start()
+        if batch:
+            self._dispatch(batch)
+        return future
+
+    def _take(self) -> list:
+        batch, self.pending = self.pending, []
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        return batch
+
+    def _flush(self):
+        with self.lock:
+            batch = self._take()
+        if batch:
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: list):
+        telemetry.increment("insights_llm_batches_total", backend=self.backend.name)
+        telemetry.increment("insights_llm_batched_requests_total", len(batch), backend=self.backend.name)
+        try:
+            with telemetry.span("llm.batch", backend=self.backend.name, size=len(batch)):
+                results = self.backend.send_batch([request for _, request in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        if len(results) != len(batch):
+            # The responses cannot be matched to the requests; fail them all
+            # rather than leave a caller waiting on a future nobody resolves
+            error = ValueError(f"Batch of {len(batch)} requests returned {len(results)} responses")
+            results = [error] * len(batch)
+        for (future, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(backend: LLMBackend):
+    """
+    Returns the micro-batcher of a backend, or None when batching is off
+    (LLM_BATCH_WINDOW_MS unset or 0) or the backend cannot batch.
+    """
+    window_ms = float(os.getenv("LLM_BATCH_WINDOW_MS", "0"))
+    if window_ms <= 0 or not backend.supports_batching:
+        return None
+    with _batchers_lock:
+        if backend.name not in _batchers:
+            _batchers[backend.name] = MicroBatcher(backend, window_ms, int(os.getenv("LLM_BATCH_MAX_SIZE", "16")))
+        return _batchers[backend.name]
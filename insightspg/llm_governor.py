@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+llm_governor.py
+
+Admission control and scheduling for every LLM call, shared by all
+analyzer processes on the host (insights.py runs, batch_analyze.py,
+reanalyze.py runs through the server).
+
+Each call has a priority class, interactive > live > batch, and an
+organization. server.js sets them for insights.py with LLM_PRIORITY and
+LLM_ORGANIZATION (the organization of the call's customer). Clients can ask
+for a lower class with the X-LLM-Priority header, which reanalyze.py does.
+
+Budgets: every organization has a daily token budget
+(LLM_GOVERNOR_DAILY_TOKENS, 0 = unlimited), and all organizations together
+may have one too (LLM_GOVERNOR_TOTAL_DAILY_TOKENS). Batch work is deferred
+once an organization has used batch_budget_share of its budget, so the
+rest is kept for users. Calls in other classes are rejected only at the
+full budget. Deferred and rejected calls raise BudgetExceededError, and
+the analyzers fall back to their local results, marked degraded. These
+are picked up by reanalyze.py the next day. A call's tokens are reserved
+from an estimate at admission and corrected to the reported usage
+afterwards, so concurrent calls cannot overshoot a budget.
+
+Scheduling: with LLM_GOVERNOR_MAX_CONCURRENCY set, at most that many calls
+are in flight, and the others wait in a queue:
+- a higher class always goes first;
+- within a class, organizations share the slots by weighted fair queuing;
+  each call gets a virtual finish time of its organization's previous
+  finish (or the current virtual time) plus its estimated tokens divided
+  by the organization's weight;
+- batch calls never hold more than batch_max_share of the slots, so a
+  backfill leaves room for interactive requests.
+A call that waits longer than its class timeout raises QueueTimeoutError.
+
+State is a SQLite database (LLM_GOVERNOR_DB, in the temp directory by
+default) in WAL mode, changed in short IMMEDIATE transactions.
+
+Settings come from LLM_GOVERNOR_* environment variables. Organizations
+can be given their own budget and weight with LLM_GOVERNOR_ORGS, e.g.
+    LLM_GOVERNOR_ORGS='{"6f1c...": {"daily_tokens": 2000000, "weight": 3}}'
+
+Metrics (reported through telemetry.py):
+- insights_llm_admissions_total{priority, outcome}  admitted, deferred, rejected or timeout
+- insights_llm_queue_wait_seconds_total{priority}   time spent waiting for a slot
+- insights_llm_queue_depth{priority}                calls waiting, at the last admission
+- insights_llm_inflight{priority}                   calls holding a slot
+- insights_llm_budget_used_ratio{organization}      share of today's budget used
+
+Usage:
+    python llm_governor.py status
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import telemetry
+
+PRIORITIES = ("interactive", "live", "batch")
+DEFAULT_ORGANIZATION = "default"
+
+DEFAULTS = {
+    "max_concurrency": 0,           # calls in flight across processes, 0 = unlimited
+    "batch_max_share": 0.5,         # share of the slots batch calls may hold
+    "daily_tokens": 0,              # per organization and UTC day, 0 = unlimited
+    "total_daily_tokens": 0,        # all organizations together, 0 = unlimited
+    "batch_budget_share": 0.8,      # batch calls are deferred past this share of a budget
+    "interactive_timeout": 10.0,    # seconds a call may wait for a slot
+    "live_timeout": 30.0,
+    "batch_timeout": 900.0,
+    "poll_seconds": 0.02,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    day TEXT NOT NULL,
+    organization TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    tokens INTEGER NOT NULL DEFAULT 0,
+    requests INTEGER NOT NULL DEFAULT 0,
+    refused INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, organization, priority)
+);
+CREATE TABLE IF NOT EXISTS queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    organization TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    finish REAL NOT NULL,
+    pid INTEGER NOT NULL,
+    enqueued_at REAL NOT NULL,
+    started_at REAL
+);
+CREATE TABLE IF NOT EXISTS clock (
+    organization TEXT PRIMARY KEY,
+    finish REAL NOT NULL
+);
+"""
+
+
+class BudgetExceededError(Exception):
+    """Raised instead of making a call that would exceed a daily token budget."""
+
+    def __init__(self, organization: str, priority: str, deferred: bool, retry_after: float):
+        action = "deferred" if deferred else "rejected"
+        super().__init__(f"LLM call {action}: daily token budget of {organization} used up for {priority} calls")
+        self.organization = organization
+        self.priority = priority
+        self.deferred = deferred
+        self.retry_after = retry_after
+
+
+class QueueTimeoutError(Exception):
+    """Raised when a call waited longer than its class timeout for a slot."""
+
+    def __init__(self, priority: str, waited: float):
+        super().__init__(f"No LLM slot for {priority} call after {waited:.1f}s")
+        self.priority = priority
+        self.waited = waited
+
+
+def settings() -> dict:
+    return {
+        name: type(default)(os.getenv(f"LLM_GOVERNOR_{name.upper()}", default))
+        for name, default in DEFAULTS.items()
+    }
+
+
+def organization_settings(organization: str) -> dict:
+    try:
+        overrides = json.loads(os.getenv("LLM_GOVERNOR_ORGS") or "{}")
+    except ValueError:
+        overrides = {}
+    return overrides.get(organization, {})
+
+
+def current_priority() -> str:
+    priority = (os.getenv("LLM_PRIORITY") or "interactive").lower()
+    return priority if priority in PRIORITIES else "interactive"
+
+
+def current_organization() -> str:
+    return os.getenv("LLM_ORGANIZATION") or DEFAULT_ORGANIZATION
+
+
+def database_path() -> str:
+    return os.getenv("LLM_GOVERNOR_DB") or os.path.join(tempfile.gettempdir(), "veritas-llm-governor.db")
+
+
+def estimate_tokens(messages: list, params: dict) -> int:
+    """About 4 characters per prompt token, plus the completion limit."""
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in messages)
+    return prompt_chars // 4 + int(params.get("max_tokens") or 1024)
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _seconds_to_midnight() -> float:
+    now = datetime.now(timezone.utc)
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    return (midnight - now).total_seconds()
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+_initialized = set()
+
+
+@contextlib.contextmanager
+def _transaction(path: str):
+    """A write transaction, taken up front so concurrent schedulers serialize."""
+    import sqlite3
+
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    try:
+        if path not in _initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            _initialized.add(path)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+    finally:
+        connection.close()
+
+
+class Ticket:
+    """An admitted call. record() the reported tokens, then release() the slot."""
+
+    def __init__(self, governor, organization: str, priority: str, estimate: int, queue_id: int = None):
+        self.governor = governor
+        self.organization = organization
+        self.priority = priority
+        self.estimate = estimate
+        self.queue_id = queue_id
+        self.day = _today()
+        self.charged = estimate
+        self.released = False
+
+    def record(self, tokens: int):
+        """Replaces the reserved estimate with the tokens the call used."""
+        self.governor._adjust(self, tokens - self.charged)
+        self.charged = tokens
+
+    def release(self, success: bool = True):
+        """Frees the slot. A call that failed gives its reservation back."""
+        if self.released:
+            return
+        self.released = True
+        self.governor._release(self, refund=0 if success else self.charged)
+
+
+class Governor:
+    def __init__(self, path: str = None, **overrides):
+        self.path = path or database_path()
+        self.settings = {**settings(), **overrides}
+
+    def _budgets(self, organization: str) -> tuple:
+        org = organization_settings(organization)
+        return int(org.get("daily_tokens", self.settings["daily_tokens"])), int(self.settings["total_daily_tokens"])
+
+    def _weight(self, organization: str) -> float:
+        return max(float(organization_settings(organization).get("weight", 1.0)), 1e-6)
+
+    def _batch_slots(self) -> int:
+        return max(1, int(self.settings["max_concurrency"] * self.settings["batch_max_share"]))
+
+    def _charge(self, connection, organization: str, priority: str, estimate: int):
+        """Checks the budgets and reserves estimate tokens; raises BudgetExceededError."""
+        day = _today()
+        org_budget, total_budget = self._budgets(organization)
+        share = self.settings["batch_budget_share"] if priority == "batch" else 1.0
+        org_used = connection.execute(
+            "SELECT COALESCE(SUM(tokens), 0) FROM usage WHERE day = ? AND organization = ?", (day, organization)
+        ).fetchone()[0]
+        total_used = connection.execute(
+            "SELECT COALESCE(SUM(tokens), 0) FROM usage WHERE day = ?", (day,)
+        ).fetchone()[0] if total_budget else 0
+        if org_budget:
+            telemetry.gauge("insights_llm_budget_used_ratio", round(org_used / org_budget, 4), organization=organization)
+        over = (org_budget and org_used + estimate > org_budget * share) or \
+               (total_budget and total_used + estimate > total_budget * share)
+        connection.execute(
+            "INSERT INTO usage (day, organization, priority, tokens, requests, refused) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (day, organization, priority) DO UPDATE SET tokens = tokens + excluded.tokens, "
+            "requests = requests + excluded.requests, refused = refused + excluded.refused",
+            (day, organization, priority, 0 if over else estimate, 0 if over else 1, 1 if over else 0)
+        )
+        return not over
+
+    def _try_start(self, connection, queue_id: int) -> bool:
+        """Starts the queued call if it is the first waiting call a free slot can take."""
+        rows = connection.execute("SELECT id, priority, finish, pid, started_at FROM queue").fetchall()
+        dead = [row[0] for row in rows if not _alive(row[3])]
+        if dead:
+            connection.executemany("DELETE FROM queue WHERE id = ?", [(row_id,) for row_id in dead])
+            rows = [row for row in rows if row[0] not in dead]
+        running = [row for row in rows if row[4] is not None]
+        batch = PRIORITIES.index("batch")
+        batch_running = sum(1 for row in running if row[1] == batch)
+        waiting = sorted((row for row in rows if row[4] is None), key=lambda row: (row[1], row[2], row[0]))
+        for depth_priority, name in enumerate(PRIORITIES):
+            telemetry.gauge("insights_llm_queue_depth", sum(1 for row in waiting if row[1] == depth_priority), priority=name)
+        if len(running) >= self.settings["max_concurrency"]:
+            return False
+        for row_id, priority, finish, _, _ in waiting:
+            if priority == batch and batch_running >= self._batch_slots():
+                continue
+            if row_id != queue_id:
+                return False
+            connection.execute("UPDATE queue SET started_at = ? WHERE id = ?", (time.time(), queue_id))
+            connection.execute(
+                "INSERT INTO clock (organization, finish) VALUES ('', ?) "
+                "ON CONFLICT (organization) DO UPDATE SET finish = MAX(finish, excluded.finish)", (finish,)
+            )
+            return True
+        return False
+
+    def admit(self, analyzer: str, messages: list, params: dict, organization: str = None, priority: str = None) -> Ticket:
+        """
+        Waits for a slot and reserves the call's tokens. Raises
+        BudgetExceededError or QueueTimeoutError instead of admitting.
+        """
+        organization = organization or current_organization()
+        priority = priority or current_priority()
+        estimate = estimate_tokens(messages, params)
+        with _transaction(self.path) as connection:
+            admitted = self._charge(connection, organization, priority, estimate)
+            queue_id = None
+            if admitted and self.settings["max_concurrency"] > 0:
+                clock = dict(connection.execute("SELECT organization, finish FROM clock").fetchall())
+                finish = max(clock.get(organization, 0.0), clock.get("", 0.0)) + estimate / self._weight(organization)
+                connection.execute(
+                    "INSERT INTO clock (organization, finish) VALUES (?, ?) "
+                    "ON CONFLICT (organization) DO UPDATE SET finish = excluded.finish", (organization, finish)
+                )
+                queue_id = connection.execute(
+                    "INSERT INTO queue (organization, priority, finish, pid, enqueued_at) VALUES (?, ?, ?, ?, ?)",
+                    (organization, PRIORITIES.index(priority), finish, os.getpid(), time.time())
+                ).lastrowid
+        if not admitted:
+            deferred = priority == "batch"
+            telemetry.increment("insights_llm_admissions_total", priority=priority,
+                                outcome="deferred" if deferred else "rejected")
+            raise BudgetExceededError(organization, priority, deferred, _seconds_to_midnight())
+
+        ticket = Ticket(self, organization, priority, estimate, queue_id)
+        if queue_id is None:
+            telemetry.increment("insights_llm_admissions_total", priority=priority, outcome="admitted")
+            return ticket
+
+        enqueued = time.monotonic()
+        timeout = self.settings[f"{priority}_timeout"]
+        delay = self.settings["poll_seconds"]
+        with telemetry.span("llm.queue", analyzer=analyzer, priority=priority, organization=organization) as current:
+            while True:
+                with _transaction(self.path) as connection:
+                    started = self._try_start(connection, queue_id)
+                waited = time.monotonic() - enqueued
+                if started:
+                    break
+                if waited >= timeout:
+                    ticket.release(success=False)
+                    telemetry.increment("insights_llm_admissions_total", priority=priority, outcome="timeout")
+                    raise QueueTimeoutError(priority, waited)
+                time.sleep(delay)
+                # Back off a little while the queue is long
+                delay = min(delay * 1.5, 0.2)
+            current.set(waited=round(waited, 4))
+        telemetry.increment("insights_llm_queue_wait_seconds_total", waited, priority=priority)
+        telemetry.increment("insights_llm_admissions_total", priority=priority, outcome="admitted")
+        return ticket
+
+    def _adjust(self, ticket: Ticket, tokens: int):
+        if not tokens:
+            return
+        with _transaction(self.path) as connection:
+            connection.execute(
+                "UPDATE usage SET tokens = MAX(tokens + ?, 0) WHERE day = ? AND organization = ? AND priority = ?",
+                (tokens, ticket.day, ticket.organization, ticket.priority)
+            )
+
+    def _release(self, ticket: Ticket, refund: int):
+        if ticket.queue_id is None and not refund:
+            return
+        with _transaction(self.path) as connection:
+            if ticket.queue_id is not None:
+                connection.execute("DELETE FROM queue WHERE id = ?", (ticket.queue_id,))
+                running = connection.execute(
+                    "SELECT priority, COUNT(*) FROM queue WHERE started_at IS NOT NULL GROUP BY priority"
+                ).fetchall()
+                counts = dict(running)
+                for index, name in enumerate(PRIORITIES):
+                    telemetry.gauge("insights_llm_inflight", counts.get(index, 0), priority=name)
+            if refund:
+                connection.execute(
+                    "UPDATE usage SET tokens = MAX(tokens - ?, 0), requests = MAX(requests - 1, 0) "
+                    "WHERE day = ? AND organization = ? AND priority = ?",
+                    (refund, ticket.day, ticket.organization, ticket.priority)
+                )
+
+    def status(self) -> dict:
+        """Today's usage per organization and class, and the current queue."""
+        with _transaction(self.path) as connection:
+            usage = connection.execute(
+                "SELECT organization, priority, tokens, requests, refused FROM usage WHERE day = ? ORDER BY organization, priority",
+                (_today(),)
+            ).fetchall()
+            queue = connection.execute(
+                "SELECT organization, priority, started_at IS NOT NULL, COUNT(*) FROM queue GROUP BY 1, 2, 3"
+            ).fetchall()
+        organizations = {}
+        for organization, priority, tokens, requests, refused in usage:
+            entry = organizations.setdefault(organization, {"tokens": 0, "budget": self._budgets(organization)[0] or None, "by_priority": {}})
+            entry["tokens"] += tokens
+            entry["by_priority"][priority] = {"tokens": tokens, "requests": requests, "refused": refused}
+        return {
+            "day": _today(),
+            "organizations": organizations,
+            "queue": [
+                {"organization": organization, "priority": PRIORITIES[priority],
+                 "state": "running" if running else "waiting", "calls": count}
+                for organization, priority, running, count in queue
+            ],
+        }
+
+
+_governor = None
+
+
+def get_governor() -> Governor:
+    global _governor
+    if _governor is None:
+        _governor = Governor()
+    return _governor
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="LLM token budgets and scheduling")
+    parser.add_argument("command", choices=["status"])
+    parser.parse_args()
+    print(json.dumps(get_governor().status(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+llm_latency_bench.py
+
+Measures chat completion latency percentiles through llm.chat_completion,
+with and without hedging, against mock_llm_server.py or any configured
+backend.
+
+Usage:
+    python mock_llm_server.py --port 8090 --slow-rate 0.05 --slow-ms 4000 &
+    LLM_BACKEND=openai LLM_BASE_URL=http://127.0.0.1:8090/v1 \\
+        python llm_latency_bench.py --requests 400 --concurrency 8
+"""
+
+import argparse
+import collections
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import hedging
+import llm
+import telemetry
+
+
+def run(requests: int, concurrency: int, hedge: bool) -> dict:
+    os.environ["LLM_HEDGE"] = "1" if hedge else "0"
+    counters = collections.Counter()
+
+    def collect(record):
+        # Keep the counters instead of printing every record
+        if record.get("type") == "counter":
+            counters[record["name"]] += record["value"]
+
+    emit, telemetry.emit = telemetry.emit, collect
+    messages = [{"role": "user", "content": "Classify the buyer intent of this call: Sounds great, send me the contract."}]
+
+    def one(_):
+        started = time.monotonic()
+        llm.chat_completion("bench", messages, max_tokens=30)
+        return time.monotonic() - started
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = sorted(pool.map(one, range(requests)))
+    finally:
+        telemetry.emit = emit
+
+    hedges = counters["insights_llm_hedges_total"]
+    return {
+        "hedging": hedge,
+        "requests": requests,
+        "p50_ms": round(hedging.percentile(latencies, 50) * 1000),
+        "p95_ms": round(hedging.percentile(latencies, 95) * 1000),
+        "p99_ms": round(hedging.percentile(latencies, 99) * 1000),
+        "max_ms": round(latencies[-1] * 1000),
+        "hedge_rate": round(hedges / requests, 3),
+        "hedge_win_rate": round(counters["insights_llm_hedge_wins_total"] / hedges, 3) if hedges else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat completion latency with and without hedging")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    # Fresh latency history and circuit state, so runs do not influence each other
+    os.environ["LLM_CIRCUIT_DIR"] = tempfile.mkdtemp(prefix="veritas-llm-bench-")
+    # Warm-up fills the latency history the hedge delay is computed from
+    # (only hedged calls record latencies)
+    run(min(50, args.requests), args.concurrency, hedge=True)
+    results = [run(args.requests, args.concurrency, hedge) for hedge in (False, True)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+load_replay.py
+
+Open-loop load and replay testing of the insights server (server.js) and
+the FastAPI backend, to find where latency collapses.
+
+Requests are sent at their scheduled time whether or not earlier ones have
+finished, as real clients do, and latency is measured from the scheduled
+time, so queueing in an overloaded stack is not hidden by a slowed-down
+client. The schedule is either synthetic (Poisson arrivals with an
+endpoint mix) or a recorded trace: with REQUEST_TRACE_FILE set, server.js
+and the backend append every request they receive to that file as JSON
+lines. A trace is replayed with its inter-arrival times, sped up or slowed
+down to each target rate.
+
+For every rate in --rates the report gives the offered rate, the achieved
+throughput, latency percentiles and error rates per endpoint, and requests
+dropped because --max-inflight was reached. The saturation point is the
+first rate at which throughput falls below 90% of the offered rate, p99
+exceeds --slo-ms or errors exceed --max-error-rate.
+
+With --start-stack the whole stack runs locally: mock_supabase.py (seeded
+with calls and sales reps), mock_llm_server.py with log-normal latency and
+a slow tail, server.js and the backend under gunicorn, wired together
+through environment variables.
+
+Usage:
+    python load_replay.py run --start-stack --rates 1,2,4,8 --duration 30
+    python load_replay.py run --trace requests.trace.jsonl --rates 5,10,20
+    python load_replay.py generate --rate 5 --duration 60 --output synthetic.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import signal
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(HERE), "backend")
+
+# endpoint name -> (service, method, path template)
+ENDPOINTS = {
+    "insights": ("insights", "GET", "/api/call-insights/{call_id}"),
+    "insights_refresh": ("insights", "GET", "/api/call-insights/{call_id}?refresh=true"),
+    "login": ("backend", "POST", "/api/auth/sales-rep/login"),
+    "me": ("backend", "GET", "/api/auth/me"),
+}
+DEFAULT_MIX = "insights=0.55,insights_refresh=0.05,login=0.1,me=0.3"
+
+CALL_INSIGHTS_PATH = re.compile(r"^/api/call-insights/(\d+)")
+
+# Ports of the local stack started with --start-stack
+SUPABASE_PORT = 54321
+LLM_PORT = 8090
+INSIGHTS_PORT = 5001
+BACKEND_PORT = 5000
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint {name!r} in --mix; choose from {', '.join(ENDPOINTS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def synthetic_schedule(rate: float, duration: float, mix: dict, rng: random.Random) -> list:
+    """Poisson arrivals at rate per second: a list of {"at", "endpoint"}."""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    schedule = []
+    at = rng.expovariate(rate)
+    while at < duration:
+        schedule.append({"at": at, "endpoint": rng.choices(names, weights)[0]})
+        at += rng.expovariate(rate)
+    return schedule
+
+
+def classify(method: str, path: str) -> str:
+    """The endpoint name of a recorded request, or the path itself for other routes."""
+    if CALL_INSIGHTS_PATH.match(path):
+        return "insights_refresh" if "refresh=true" in path else "insights"
+    if method == "POST" and path.startswith("/api/auth/sales-rep/login"):
+        return "login"
+    if path.startswith("/api/auth/me"):
+        return "me"
+    return f"{method} {path.split('?')[0]}"
+
+
+def load_trace(path: str) -> list:
+    """
+    Reads a trace: synthetic lines ({"at", "endpoint"}) or lines recorded by
+    the servers ({"ts", "service", "method", "path"}). Returns entries sorted
+    by time, starting at 0.
+    """
+    entries = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if "endpoint" not in entry:
+                entry["endpoint"] = classify(entry.get("method", "GET"), entry.get("path", "/"))
+            entry["at"] = float(entry.get("at", entry.get("ts", 0)))
+            entries.append(entry)
+    entries.sort(key=lambda entry: entry["at"])
+    if entries:
+        origin = entries[0]["at"]
+        for entry in entries:
+            entry["at"] -= origin
+    return entries
+
+
+def scaled_schedule(trace: list, rate: float, duration: float) -> list:
+    """
+    Replays the trace at rate requests per second on average, keeping its
+    relative inter-arrival times, repeating it if it is shorter than duration.
+    """
+    if not trace:
+        return []
+    span = trace[-1]["at"] or 1.0
+    # The gap between repetitions is the trace's mean gap
+    period = span + span / max(len(trace) - 1, 1)
+    speed = rate / (len(trace) / period)
+    schedule = []
+    offset = 0.0
+    while True:
+        for entry in trace:
+            at = (offset + entry["at"]) / speed
+            if at >= duration:
+                return schedule
+            schedule.append(dict(entry, at=at))
+        offset += period
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+class Target:
+    """Builds the concrete request for a schedule entry."""
+
+    def __init__(self, args, tokens: list):
+        self.urls = {"insights": args.insights_url.rstrip("/"), "backend": args.backend_url.rstrip("/")}
+        self.call_ids = list(range(args.call_id_from, args.call_id_to + 1))
+        self.reps = args.reps
+        self.password = args.password
+        self.tokens = tokens
+        self.rng = random.Random(args.seed)
+
+    def request(self, entry: dict):
+        """Returns (method, url, json body, headers)."""
+        endpoint = entry["endpoint"]
+        if endpoint in ENDPOINTS:
+            service, method, path = ENDPOINTS[endpoint]
+            if "{call_id}" in path:
+                path = path.format(call_id=self.rng.choice(self.call_ids))
+        else:
+            service, method, path = entry.get("service", "insights"), entry.get("method", "GET"), entry.get("path", "/")
+        if endpoint.startswith("insights") and "path" in entry:
+            # Recorded call ids are mapped onto the calls the target database has
+            match = CALL_INSIGHTS_PATH.match(entry["path"])
+            call_id = self.call_ids[int(match.group(1)) % len(self.call_ids)]
+            path = CALL_INSIGHTS_PATH.sub(f"/api/call-insights/{call_id}", entry["path"])
+        body = None
+        headers = {}
+        if endpoint == "login":
+            body = {"email": f"rep{self.rng.randint(1, self.reps)}@loadtest.local", "password": self.password}
+        elif endpoint == "me" and self.tokens:
+            headers["Authorization"] = f"Bearer {self.rng.choice(self.tokens)}"
+        return method, f"{self.urls[service]}{path}", body, headers
+
+
+async def send(client, target: Target, entry: dict, scheduled: float, results: list):
+    import httpx
+
+    method, url, body, headers = target.request(entry)
+    try:
+        response = await client.request(method, url, json=body, headers=headers)
+        status = response.status_code
+    except httpx.TimeoutException:
+        status = "timeout"
+    except httpx.HTTPError:
+        status = "connection_error"
+    results.append((entry["endpoint"], status, time.perf_counter() - scheduled))
+
+
+async def run_step(schedule: list, target: Target, max_inflight: int, timeout: float) -> dict:
+    """Sends the schedule open-loop; returns the raw results and the elapsed time."""
+    import httpx
+
+    results = []
+    dropped = {}
+    tasks = set()
+    limits = httpx.Limits(max_connections=max_inflight, max_keepalive_connections=max_inflight)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        start = time.perf_counter() + 0.05
+        for entry in schedule:
+            scheduled = start + entry["at"]
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(tasks) >= max_inflight:
+                dropped[entry["endpoint"]] = dropped.get(entry["endpoint"], 0) + 1
+                continue
+            task = asyncio.create_task(send(client, target, entry, scheduled, results))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(set(tasks))
+    return {"results": results, "dropped": dropped, "elapsed": time.perf_counter() - start}
+
+
+def ok(status) -> bool:
+    return isinstance(status, int) and status < 400
+
+
+def summarize(rate: float, duration: float, step: dict, args) -> dict:
+    results = step["results"]
+    by_endpoint = {}
+    for endpoint, status, latency in results:
+        by_endpoint.setdefault(endpoint, []).append((status, latency))
+
+    def stats(entries: list, dropped: int) -> dict:
+        latencies = [latency for status, latency in entries if ok(status)]
+        statuses = {}
+        for status, _ in entries:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        errors = sum(1 for status, _ in entries if not ok(status))
+        return {
+            "requests": len(entries),
+            "errors": errors,
+            "error_rate": round(errors / len(entries), 4) if entries else 0.0,
+            "dropped": dropped,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p90_ms": round(percentile(latencies, 90) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "max_ms": round(max(latencies, default=0.0) * 1000, 1),
+            "statuses": statuses,
+        }
+
+    total_dropped = sum(step["dropped"].values())
+    overall = stats([(status, latency) for _, status, latency in results], total_dropped)
+    successes = sum(1 for _, status, _ in results if ok(status))
+    # Requests still queued after the schedule ended stretch the elapsed time
+    throughput = successes / max(step["elapsed"], duration)
+    offered = (len(results) + total_dropped) / duration
+    overall.update({
+        "offered_rps": round(offered, 2),
+        "throughput_rps": round(throughput, 2),
+    })
+    failures = []
+    if offered and throughput < 0.9 * offered:
+        failures.append("throughput")
+    if overall["p99_ms"] > args.slo_ms:
+        failures.append("p99")
+    if (overall["errors"] + total_dropped) / max(len(results) + total_dropped, 1) > args.max_error_rate:
+        failures.append("errors")
+    return {
+        "rate": rate,
+        "overall": overall,
+        "endpoints": {
+            endpoint: stats(entries, step["dropped"].get(endpoint, 0))
+            for endpoint, entries in sorted(by_endpoint.items())
+        },
+        "saturated": failures,
+    }
+
+
+def wait_until_ready(url: str, timeout: float = 60):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_stack(args) -> list:
+    """Starts the mock services, server.js and the backend. Returns the processes."""
+    import mock_supabase
+
+    key = mock_supabase.anon_key()
+    env = dict(
+        os.environ,
+        SUPABASE_URL=f"http://127.0.0.1:{SUPABASE_PORT}",
+        SUPABASE_ANON_KEY=key,
+        SUPABASE_SERVICE_ROLE_KEY=key,
+        LLM_BACKEND="openai",
+        LLM_BASE_URL=f"http://127.0.0.1:{LLM_PORT}/v1",
+        LLM_API_KEY="mock",
+        JWT_SECRET=os.getenv("JWT_SECRET", "load-replay-secret"),
+        PORT=str(INSIGHTS_PORT),
+        WEB_CONCURRENCY=str(args.backend_workers),
+        BIND=f"127.0.0.1:{BACKEND_PORT}",
+    )
+    output = None if args.verbose else subprocess.DEVNULL
+    commands = [
+        ([sys.executable, "mock_supabase.py", "--port", str(SUPABASE_PORT), "--calls", str(args.call_id_to),
+          "--reps", str(args.reps), "--password", args.password, "--latency-ms", str(args.db_latency_ms)],
+         HERE, f"http://127.0.0.1:{SUPABASE_PORT}/rest/v1/sales_reps?limit=1"),
+        ([sys.executable, "mock_llm_server.py", "--port", str(LLM_PORT), "--median-ms", str(args.llm_median_ms),
+          "--slow-rate", str(args.llm_slow_rate), "--slow-ms", str(args.llm_slow_ms),
+          "--error-rate", str(args.llm_error_rate)],
+         HERE, f"http://127.0.0.1:{LLM_PORT}/v1/models"),
+        (["node", "server.js"], HERE, f"http://127.0.0.1:{INSIGHTS_PORT}/metrics"),
+        ([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+         BACKEND_DIR, f"http://127.0.0.1:{BACKEND_PORT}/"),
+    ]
+    processes = []
+    try:
+        for command, cwd, ready_url in commands:
+            processes.append(subprocess.Popen(command, cwd=cwd, env=env, stdout=output, stderr=output))
+            wait_until_ready(ready_url)
+    except Exception:
+        stop_stack(processes)
+        raise
+    args.insights_url = f"http://127.0.0.1:{INSIGHTS_PORT}"
+    args.backend_url = f"http://127.0.0.1:{BACKEND_PORT}"
+    args.call_id_from = 1
+    return processes
+
+
+def stop_stack(processes: list):
+    for process in reversed(processes):
+        # SIGTERM is a graceful shutdown for gunicorn and node
+        process.send_signal(signal.SIGTERM)
+    for process in processes:
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def login_tokens(args, count: int = 5) -> list:
+    """Logs in a few seeded sales reps before the run, for the /me requests."""
+    import httpx
+
+    tokens = []
+    for index in range(1, min(count, args.reps) + 1):
+        try:
+            response = httpx.post(
+                f"{args.backend_url.rstrip('/')}/api/auth/sales-rep/login",
+                json={"email": f"rep{index}@loadtest.local", "password": args.password},
+                timeout=args.timeout
+            )
+            if response.status_code == 200:
+                tokens.append(response.json()["access_token"])
+        except httpx.HTTPError:
+            pass
+    if not tokens:
+        print("Warning: no sales rep could log in; /me requests will fail with 401/403", file=sys.stderr)
+    return tokens
+
+
+def run(args) -> dict:
+    processes = start_stack(args) if args.start_stack else []
+    try:
+        tokens = login_tokens(args)
+        target = Target(args, tokens)
+        rng = random.Random(args.seed)
+        trace = load_trace(args.trace) if args.trace else None
+        mix = parse_mix(args.mix)
+        steps = []
+        for rate in [float(rate) for rate in args.rates.split(",")]:
+            schedule = scaled_schedule(trace, rate, args.duration) if trace is not None else \
+                synthetic_schedule(rate, args.duration, mix, rng)
+            print(f"Offering {rate} req/s for {args.duration}s ({len(schedule)} requests)", file=sys.stderr)
+            step = asyncio.run(run_step(schedule, target, args.max_inflight, args.timeout))
+            steps.append(summarize(rate, args.duration, step, args))
+            if args.cooldown:
+                time.sleep(args.cooldown)
+    finally:
+        stop_stack(processes)
+
+    saturated = next((step for step in steps if step["saturated"]), None)
+    healthy = [step["rate"] for step in steps if not step["saturated"] and (saturated is None or step["rate"] < saturated["rate"])]
+    return {
+        "steps": steps,
+        "max_sustained_rate": max(healthy) if healthy else None,
+        "saturation_rate": saturated["rate"] if saturated else None,
+        "saturation_reasons": saturated["saturated"] if saturated else [],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load and replay testing of the insights server and backend")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run a load test at each rate")
+    run_parser.add_argument("--rates", default="1,2,4,8", help="Comma-separated arrival rates (requests per second)")
+    run_parser.add_argument("--duration", type=float, default=30, help="Seconds per rate")
+    run_parser.add_argument("--trace", default=None, help="Trace to replay instead of synthetic arrivals")
+    run_parser.add_argument("--mix", default=DEFAULT_MIX, help="Endpoint weights of synthetic arrivals")
+    run_parser.add_argument("--insights-url", default=f"http://127.0.0.1:{INSIGHTS_PORT}")
+    run_parser.add_argument("--backend-url", default=f"http://127.0.0.1:{BACKEND_PORT}")
+    run_parser.add_argument("--call-id-from", type=int, default=1, help="Smallest call_id to request")
+    run_parser.add_argument("--call-id-to", type=int, default=200, help="Largest call_id to request")
+    run_parser.add_argument("--reps", type=int, default=20, help="Sales reps rep1..repN@loadtest.local that can log in")
+    run_parser.add_argument("--password", default="loadtest-password")
+    run_parser.add_argument("--max-inflight", type=int, default=256, help="Concurrent requests before new ones are dropped")
+    run_parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout in seconds")
+    run_parser.add_argument("--slo-ms", type=float, default=10000, help="p99 latency above which a rate counts as saturated")
+    run_parser.add_argument("--max-error-rate", type=float, default=0.01)
+    run_parser.add_argument("--cooldown", type=float, default=5, help="Pause between rates")
+    run_parser.add_argument("--seed", type=int, default=None)
+    run_parser.add_argument("--output", default=None, help="Also write the report to this file")
+    stack = run_parser.add_argument_group("local stack (--start-stack)")
+    stack.add_argument("--start-stack", action="store_true", help="Run mock Supabase, mock LLM, server.js and the backend")
+    stack.add_argument("--backend-workers", type=int, default=2)
+    stack.add_argument("--db-latency-ms", type=float, default=10)
+    stack.add_argument("--llm-median-ms", type=float, default=800)
+    stack.add_argument("--llm-slow-rate", type=float, default=0.05)
+    stack.add_argument("--llm-slow-ms", type=float, default=6000)
+    stack.add_argument("--llm-error-rate", type=float, default=0.0)
+    stack.add_argument("--verbose", action="store_true", help="Show the output of the stack")
+
+    generate_parser = subparsers.add_parser("generate", help="Write a synthetic trace")
+    generate_parser.add_argument("--rate", type=float, default=5)
+    generate_parser.add_argument("--duration", type=float, default=60)
+    generate_parser.add_argument("--mix", default=DEFAULT_MIX)
+    generate_parser.add_argument("--seed", type=int, default=None)
+    generate_parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        schedule = synthetic_schedule(args.rate, args.duration, parse_mix(args.mix), random.Random(args.seed))
+        with open(args.output, "w") as f:
+            for entry in schedule:
+                f.write(json.dumps({"at": round(entry["at"], 4), "endpoint": entry["endpoint"]}) + "\n")
+        print(f"Wrote {len(schedule)} requests to {args.output}", file=sys.stderr)
+        return
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+local_fallbacks.py
+
+Results the analyzers return when the LLM is unavailable (circuit open,
+provider errors, groq not installed). They are computed locally in
+milliseconds from the transcript and carry "degraded": true, so they are
+never mistaken for LLM output.
+
+Degraded analyzers are reported by insights.py and get no fingerprint, which
+queues them for enrichment: reanalyze.py treats them as stale and re-runs
+them once the circuit has closed.
+"""
+
+import re
+
+import transcripts
+
+# Analyzers that fell back during this process (read by insights.py)
+DEGRADED = set()
+
+PENDING = "Pending - the coaching model was unavailable, this section will be filled in on re-analysis."
+
+# Customer phrases and their weight towards interest (+) or disinterest (-)
+INTENT_CUES = {
+    "sounds great": 2, "sounds good": 2, "let's do it": 3, "sign up": 3, "send me": 2,
+    "next step": 2, "schedule": 2, "demo": 1, "pricing": 1, "how much": 1, "interested": 2,
+    "definitely": 2, "perfect": 1, "love": 2, "when can": 2, "trial": 2,
+    "not interested": -3, "no thanks": -3, "too expensive": -2, "not a priority": -2,
+    "already have": -2, "call back later": -1, "maybe later": -1, "not sure": -1,
+    "don't need": -3, "remove me": -3, "busy": -1, "no budget": -2,
+}
+
+
+def mark_degraded(analyzer: str):
+    DEGRADED.add(analyzer)
+
+
+def _customer_text(segments: list) -> str:
+    resolved = transcripts.resolve_speakers(segments)
+    if not resolved:
+        return ""
+    rep = resolved[0][0]
+    return " ".join(text for speaker, text, _, _ in resolved if speaker != rep).lower()
+
+
+def classify_intent(segments: list) -> dict:
+    """Keyword-scored buyer intent from the customer's side of the call."""
+    text = _customer_text(segments)
+    score = sum(weight * len(re.findall(r"\b" + re.escape(cue) + r"\b", text)) for cue, weight in INTENT_CUES.items())
+    if score >= 5:
+        label = "Highly Interested"
+    elif score >= 2:
+        label = "Interested"
+    elif score <= -5:
+        label = "Highly Disinterested"
+    elif score <= -2:
+        label = "Disinterested"
+    else:
+        label = "Neutral"
+    mark_degraded("buyer_intent")
+    return {"buyer_intent": label, "confidence": 0.4, "degraded": True}
+
+
+def summarize(segments: list) -> dict:
+    """Summary, strengths and areas for improvement derived from talk metrics alone."""
+    metrics = transcripts.talk_metrics(segments)
+    rep_share = round(metrics["rep_talk_ratio"] * 100)
+    summary = (
+        f"Automated summary unavailable; call statistics: {metrics['turn_count']} speaker turns, "
+        f"the sales rep spoke {rep_share}% of the words and asked {metrics['rep_questions']} questions."
+    )
+    strengths = []
+    areas = []
+    if metrics["rep_questions"] >= 3:
+        strengths.append(f"Asked {metrics['rep_questions']} questions to engage the prospect")
+    else:
+        areas.append("Ask more open questions to understand the prospect's needs")
+    if 0.4 <= metrics["rep_talk_ratio"] <= 0.65:
+        strengths.append("Balanced talk time with the prospect")
+    elif metrics["rep_talk_ratio"] > 0.65:
+        areas.append(f"Talked {rep_share}% of the time; leave more room for the prospect")
+    elif metrics["turn_count"]:
+        areas.append("Guide the conversation more actively")
+    if metrics["longest_monologue_seconds"] > 60:
+        areas.append(f"Longest monologue lasted {metrics['longest_monologue_seconds']:.0f}s; break it up with questions")
+    mark_degraded("call_summary")
+    return {
+        "summary": summary,
+        "rating": None,
+        "strengths": strengths or ["Not enough information without the summary model"],
+        "areas_for_improvement": areas or ["Not enough information without the summary model"],
+        "degraded": True,
+    }
+
+
+def coaching(segments: list, sections: list) -> dict:
+    """Conversational balance from talk metrics; the other sections wait for re-analysis."""
+    metrics = transcripts.talk_metrics(segments)
+    rep_share = round(metrics["rep_talk_ratio"] * 100)
+    balance = (
+        f"The sales rep spoke {rep_share}% of the words over {metrics['turn_count']} turns "
+        f"and asked {metrics['rep_questions']} questions."
+    )
+    if metrics["rep_talk_ratio"] > 0.65:
+        balance += " Aim for the prospect to speak at least 40% of the time."
+    result = {section: PENDING for section in sections}
+    result["Conversational Balance"] = balance
+    result["degraded"] = True
+    mark_degraded("custom_rag")
+    return result
@@ -0,0 +1,89 @@
+-- 001_call_insights.sql
+-- Typed, indexed insights store. call_logs.insights keeps the full JSON blob
+-- shown in the UI; call_insights holds the fields analytics query on.
+-- Backfill existing rows afterwards with: python insights_store.py backfill
+
+ALTER TABLE public.call_logs ADD COLUMN IF NOT EXISTS insights jsonb NULL;
+ALTER TABLE public.call_logs ADD COLUMN IF NOT EXISTS processed_at timestamp with time zone NULL;
+
+CREATE TABLE IF NOT EXISTS public.call_insights (
+  call_id integer NOT NULL,
+  sales_rep_id integer NULL,
+  call_date timestamp without time zone NULL,
+  -- call_summary.py
+  summary text NULL,
+  rating smallint NULL,
+  strengths text[] NULL,
+  areas_for_improvement text[] NULL,
+  -- buyer_intent.py
+  buyer_intent character varying(30) NULL,
+  buyer_intent_probability real NULL,
+  -- detect_profanity.py
+  profanity_severity character varying(10) NOT NULL DEFAULT 'clean',
+  profanity_mild_count integer NOT NULL DEFAULT 0,
+  profanity_moderate_count integer NOT NULL DEFAULT 0,
+  profanity_severe_count integer NOT NULL DEFAULT 0,
+  detected_profanities text[] NULL,
+  -- custom_rag.py coaching sections
+  conversational_balance text NULL,
+  objection_handling text NULL,
+  pitch_optimization text NULL,
+  call_to_action text NULL,
+  -- talk-ratio metrics (transcripts.talk_metrics)
+  rep_talk_ratio real NULL,
+  customer_talk_ratio real NULL,
+  rep_words integer NULL,
+  customer_words integer NULL,
+  turn_count integer NULL,
+  rep_questions integer NULL,
+  longest_monologue_seconds real NULL,
+  transcript_hash character(64) NULL,
+  processed_at timestamp with time zone NULL,
+  CONSTRAINT call_insights_pkey PRIMARY KEY (call_id),
+  CONSTRAINT call_insights_call_id_fkey FOREIGN KEY (call_id) REFERENCES call_logs(call_id) ON DELETE CASCADE,
+  CONSTRAINT call_insights_rating_check CHECK (rating IS NULL OR (rating >= 0 AND rating <= 100)),
+  CONSTRAINT call_insights_buyer_intent_check CHECK (buyer_intent IS NULL OR buyer_intent = ANY (ARRAY['Highly Interested', 'Interested', 'Disinterested', 'Highly Disinterested', 'Neutral'])),
+  CONSTRAINT call_insights_profanity_severity_check CHECK (profanity_severity = ANY (ARRAY['clean', 'mild', 'moderate', 'severe']))
+) TABLESPACE pg_default;
+
+CREATE INDEX IF NOT EXISTS call_insights_rep_date_idx ON public.call_insights (sales_rep_id, call_date);
+CREATE INDEX IF NOT EXISTS call_insights_call_date_idx ON public.call_insights (call_date);
+CREATE INDEX IF NOT EXISTS call_insights_intent_date_idx ON public.call_insights (buyer_intent, call_date);
+CREATE INDEX IF NOT EXISTS call_insights_profanity_idx ON public.call_insights (profanity_severity, call_date)
+  WHERE profanity_severity <> 'clean';
+
+-- Aggregates used by InsightsRepository (called through PostgREST rpc)
+
+CREATE OR REPLACE FUNCTION public.insights_rating_by_rep(date_from timestamp DEFAULT NULL, date_to timestamp DEFAULT NULL)
+RETURNS TABLE (sales_rep_id integer, calls bigint, average_rating numeric, average_rep_talk_ratio numeric)
+LANGUAGE sql STABLE AS $$
+  SELECT sales_rep_id,
+         count(*),
+         round(avg(rating), 2),
+         round(avg(rep_talk_ratio)::numeric, 3)
+  FROM public.call_insights
+  WHERE (date_from IS NULL OR call_date >= date_from)
+    AND (date_to IS NULL OR call_date < date_to)
+  GROUP BY sales_rep_id
+$$;
+
+CREATE OR REPLACE FUNCTION public.insights_intent_distribution(date_from timestamp DEFAULT NULL, date_to timestamp DEFAULT NULL)
+RETURNS TABLE (buyer_intent character varying, calls bigint)
+LANGUAGE sql STABLE AS $$
+  SELECT buyer_intent, count(*)
+  FROM public.call_insights
+  WHERE (date_from IS NULL OR call_date >= date_from)
+    AND (date_to IS NULL OR call_date < date_to)
+  GROUP BY buyer_intent
+$$;
+
+CREATE OR REPLACE FUNCTION public.insights_profanity_counts(date_from timestamp DEFAULT NULL, date_to timestamp DEFAULT NULL)
+RETURNS TABLE (profanity_severity character varying, calls bigint)
+LANGUAGE sql STABLE AS $$
+  SELECT profanity_severity, count(*)
+  FROM public.call_insights
+  WHERE profanity_severity <> 'clean'
+    AND (date_from IS NULL OR call_date >= date_from)
+    AND (date_to IS NULL OR call_date < date_to)
+  GROUP BY profanity_severity
+$$;
@@ -0,0 +1,9 @@
+-- 002_analyzer_fingerprints.sql
+-- Per-analyzer input fingerprints (see analysis_graph.py), so reanalyze.py
+-- can find calls whose stored results are stale without reading the blobs:
+-- {"analyzers": {"custom_rag": "<hash>", ...}, "inputs": {"benchmarks": "<hash>", ...}}
+
+ALTER TABLE public.call_insights ADD COLUMN IF NOT EXISTS fingerprints jsonb NULL;
+
+CREATE INDEX IF NOT EXISTS call_insights_fingerprints_idx
+  ON public.call_insights USING gin (fingerprints jsonb_path_ops);
@@ -0,0 +1,18 @@
+-- 003_call_sentiment.sql
+-- Local sentiment summary (sentiment.py) in the typed insights store. The
+-- per-segment timeline stays in call_logs.insights; the label is also
+-- written to call_logs."Sentiment Result", which the dashboards read.
+-- Fill existing calls with: python sentiment.py backfill
+-- and re-run python insights_store.py backfill for these columns.
+
+ALTER TABLE public.call_insights ADD COLUMN IF NOT EXISTS sentiment_label character varying(10) NULL;
+ALTER TABLE public.call_insights ADD COLUMN IF NOT EXISTS sentiment_score real NULL;
+ALTER TABLE public.call_insights ADD COLUMN IF NOT EXISTS customer_sentiment_score real NULL;
+ALTER TABLE public.call_insights ADD COLUMN IF NOT EXISTS sentiment_trend character varying(10) NULL;
+ALTER TABLE public.call_insights ADD COLUMN IF NOT EXISTS final_minute_sentiment real NULL;
+
+ALTER TABLE public.call_insights DROP CONSTRAINT IF EXISTS call_insights_sentiment_label_check;
+ALTER TABLE public.call_insights ADD CONSTRAINT call_insights_sentiment_label_check
+  CHECK (sentiment_label IS NULL OR sentiment_label = ANY (ARRAY['Positive', 'Negative', 'Neutral']));
+
+CREATE INDEX IF NOT EXISTS call_insights_sentiment_idx ON public.call_insights (sentiment_label, call_date);
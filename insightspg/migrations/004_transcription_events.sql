@@ -0,0 +1,47 @@
+-- 004_transcription_events.sql
+-- Change events for insights_worker.py. Every write that sets or changes
+-- call_logs.transcription stamps the row with the time of the change, the
+-- watermark the worker polls on, and sends a NOTIFY on the
+-- transcription_changed channel:
+-- {"table": "call_logs", "call_id": 42, "stamp": "2026-10-19T09:30:00.123456+00:00"}
+-- call_transcription gets no events: the analysis reads call_logs.transcription
+-- only, and nothing in the app writes call_transcription.
+
+ALTER TABLE public.call_logs ADD COLUMN IF NOT EXISTS transcription_updated_at timestamp with time zone NULL;
+
+CREATE INDEX IF NOT EXISTS call_logs_transcription_updated_at_idx
+  ON public.call_logs (transcription_updated_at);
+
+CREATE OR REPLACE FUNCTION public.stamp_call_logs_transcription() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP = 'INSERT' OR NEW.transcription IS DISTINCT FROM OLD.transcription THEN
+    NEW.transcription_updated_at := clock_timestamp();
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+-- TG_ARGV[0] is the stamp column of the table
+CREATE OR REPLACE FUNCTION public.notify_transcription_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM pg_notify('transcription_changed', json_build_object(
+    'table', TG_TABLE_NAME,
+    'call_id', NEW.call_id,
+    'stamp', to_jsonb(NEW) ->> TG_ARGV[0]
+  )::text);
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS call_logs_transcription_stamp ON public.call_logs;
+CREATE TRIGGER call_logs_transcription_stamp
+  BEFORE INSERT OR UPDATE OF transcription ON public.call_logs
+  FOR EACH ROW EXECUTE FUNCTION public.stamp_call_logs_transcription();
+
+DROP TRIGGER IF EXISTS call_logs_transcription_notify ON public.call_logs;
+CREATE TRIGGER call_logs_transcription_notify
+  AFTER INSERT OR UPDATE OF transcription ON public.call_logs
+  FOR EACH ROW WHEN (NEW.transcription IS NOT NULL AND NEW.transcription <> '')
+  EXECUTE FUNCTION public.notify_transcription_changed('transcription_updated_at');
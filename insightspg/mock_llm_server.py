@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+mock_llm_server.py
+
+Local OpenAI-compatible chat completion server with injected latency, for
+testing hedging, the circuit breaker and the analyzers without a provider.
+
+Serves POST /v1/chat/completions and /openai/v1/chat/completions (the path
+the Groq SDK uses), so either GROQ_BASE_URL=http://localhost:8090 or
+LLM_BACKEND=openai LLM_BASE_URL=http://localhost:8090/v1 works. POST
+/v1/chat/completions/batch answers {"requests": [...]} with
+{"responses": [...]} after a single latency sample, for micro-batching
+(LLM_BATCH_PATH=/chat/completions/batch).
+
+Latency is log-normal around --median-ms, and a --slow-rate share of the
+requests takes --slow-ms instead, which produces the long tail seen with
+hosted providers. --error-rate returns 503s. Replies are canned JSON that
+passes the analyzer schemas in structured_output.py.
+
+Usage:
+    python mock_llm_server.py --port 8090 --median-ms 300 --slow-rate 0.05 --slow-ms 4000
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED = {
+    "buyer_intent": {"buyer_intent": "Interested"},
+    "custom_rag": {
+        "Conversational Balance": "The rep leads the conversation but leaves room for the prospect to answer.",
+        "Objection Handling": "Concerns about pricing are acknowledged and answered with concrete value.",
+        "Pitch Optimization": "The value proposition is clear; tie it more closely to the prospect's goals.",
+        "Call-to-Action Execution": "A follow-up meeting is proposed; confirm a specific date before ending.",
+    },
+    "call_summary": {
+        "summary": "The rep introduced the product, explored the prospect's needs and agreed on a follow-up.",
+        "rating": 72,
+        "strengths": ["Clear introduction", "Good discovery questions", "Friendly tone"],
+        "areas_for_improvement": ["Quantify the value", "Handle objections earlier", "Confirm next steps"],
+    },
+}
+
+
+def pick_reply(messages: list) -> dict:
+    """Chooses the canned reply that matches the analyzer that sent the prompt."""
+    prompt = " ".join(str(message.get("content", "")) for message in messages)
+    if "buyer" in prompt.lower() and "intent" in prompt.lower():
+        return CANNED["buyer_intent"]
+    if "Conversational Balance" in prompt:
+        return CANNED["custom_rag"]
+    return CANNED["call_summary"]
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    config = None
+
+    def log_message(self, format, *args):
+        if self.config.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            return self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        path = self.path.rstrip("/")
+        if not path.endswith(("/chat/completions", "/chat/completions/batch")):
+            return self._send_json(404, {"error": {"message": "not found"}})
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send_json(400, {"error": {"message": "invalid JSON"}})
+
+        # A batch costs one latency sample, like a batched forward pass
+        time.sleep(self.sample_latency())
+        if path.endswith("/batch"):
+            responses = [
+                {"status": 503, "error": {"message": "injected failure"}} if self.failed() else completion_body(item)
+                for item in request.get("requests", [])
+            ]
+            return self._send_json(200, {"responses": responses})
+        if self.failed():
+            return self._send_json(503, {"error": {"message": "injected failure", "type": "server_error"}})
+        self._send_json(200, completion_body(request))
+
+    def sample_latency(self) -> float:
+        if random.random() < self.config.slow_rate:
+            return self.config.slow_ms / 1000
+        return random.lognormvariate(math.log(self.config.median_ms / 1000), self.config.sigma)
+
+    def failed(self) -> bool:
+        return random.random() < self.config.error_rate
+
+
+def completion_body(request: dict) -> dict:
+    """An OpenAI chat.completion response for one request."""
+    messages = request.get("messages", [])
+    content = json.dumps(pick_reply(messages))
+    prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in messages)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(content.split()),
+            "total_tokens": prompt_tokens + len(content.split()),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server with injected latency")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--median-ms", type=float, default=300, help="Median latency of normal requests")
+    parser.add_argument("--sigma", type=float, default=0.3, help="Log-normal spread of normal requests")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="Share of requests that are slow")
+    parser.add_argument("--slow-ms", type=float, default=4000, help="Latency of slow requests")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    MockLLMHandler.config = args
+    server = ThreadingHTTPServer((args.host, args.port), MockLLMHandler)
+    print(f"Mock LLM server listening on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+mock_supabase.py
+
+In-memory stand-in for the Supabase REST API (PostgREST), for load tests
+and offline runs of server.js, the FastAPI backend and the Python tools.
+
+Serves the subset the code base uses on /rest/v1/<table>:
+- GET with select=, column filters (eq, neq, gt, gte, lt, lte, in, is,
+  not.is), order= and limit=; embedded resources in select are ignored;
+- POST (insert, or upsert with on_conflict= and
+  Prefer: resolution=merge-duplicates), PATCH and DELETE with filters;
+- Prefer: return=representation and the single-object Accept header
+  (.single()), which answers 406 unless exactly one row matches.
+Writes that change call_logs.transcription stamp transcription_updated_at
+like the triggers of migration 004, so insights_worker.py can poll the mock. There is no LISTEN/NOTIFY.
+GET /auth/v1/user answers 401, as Supabase does for the backend's own
+sales rep tokens.
+
+Tables start empty or are seeded with --calls synthetic calls built from
+the benchmark_folder transcripts and --reps sales reps, each with a
+user_auth row (rep<N>@loadtest.local, password --password). Every request
+waits a log-normal --latency-ms, the database round trip. Data lives in
+memory only.
+
+Usage:
+    python mock_supabase.py --port 54321 --calls 200 --reps 20 --latency-ms 15
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_ANON_KEY="$(python mock_supabase.py --print-key)" node server.js
+"""
+
+import argparse
+import base64
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Generated keys per table, as in the real schema
+PRIMARY_KEYS = {
+    "call_logs": "call_id",
+    "call_insights": "call_id",
+    "sales_reps": "sales_rep_id",
+    "user_auth": "id",
+    "sales_data": "sale_id",
+    "customers": "customer_id",
+    "call_transcription": "id",
+}
+
+# Transcription columns and the column stamped when they change, as the
+# triggers of migrations/004_transcription_events.sql do (for insights_worker.py)
+TRANSCRIPTION_STAMPS = {
+    "call_logs": ("transcription", "transcription_updated_at"),
+}
+
+OBJECT_MEDIA_TYPE = "application/vnd.pgrst.object+json"
+FILTER = re.compile(r"^(not\.)?(eq|neq|gt|gte|lt|lte|in|is)\.(.*)$", re.DOTALL)
+SPEAKER_LINE = re.compile(r"^([^:\n]{1,40}):\s+(.+)$")
+
+DEFAULT_PASSWORD = "loadtest-password"
+
+
+def anon_key() -> str:
+    """A JWT-shaped key: the Supabase clients check the format, the mock never checks the key."""
+    def encode(value: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).rstrip(b"=").decode("ascii")
+    return f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode({'iss': 'mock-supabase', 'role': 'service_role'})}.mock"
+
+
+def rep_email(index: int) -> str:
+    return f"rep{index}@loadtest.local"
+
+
+class Database:
+    """Tables of row dicts with generated keys, guarded by one lock."""
+
+    def __init__(self):
+        self.tables = {}
+        self.sequences = {}
+        self.lock = threading.Lock()
+
+    def rows(self, table: str) -> list:
+        return self.tables.setdefault(table, [])
+
+    def update(self, table: str, row: dict, changes: dict):
+        """Applies changes to a stored row, stamping a changed transcription."""
+        column, stamp = TRANSCRIPTION_STAMPS.get(table, (None, None))
+        if column in changes and changes[column] != row.get(column):
+            changes = {**changes, stamp: datetime.now(timezone.utc).isoformat(timespec="microseconds")}
+        row.update(changes)
+
+    def insert(self, table: str, row: dict, on_conflict: str = None) -> dict:
+        key = PRIMARY_KEYS.get(table)
+        conflict = on_conflict or key
+        rows = self.rows(table)
+        if conflict and row.get(conflict) is not None:
+            for existing in rows:
+                if existing.get(conflict) == row[conflict]:
+                    if on_conflict is None:
+                        raise ValueError(f'duplicate key value violates unique constraint "{table}_pkey"')
+                    self.update(table, existing, row)
+                    return existing
+        row = dict(row)
+        column, stamp = TRANSCRIPTION_STAMPS.get(table, (None, None))
+        if row.get(column) is not None:
+            row[stamp] = datetime.now(timezone.utc).isoformat(timespec="microseconds")
+        if key and row.get(key) is None:
+            self.sequences[table] = self.sequences.get(table, 0) + 1
+            row[key] = self.sequences[table]
+        elif key:
+            self.sequences[table] = max(self.sequences.get(table, 0), int(row[key]))
+        rows.append(row)
+        return row
+
+
+def _coerce(value: str, sample):
+    """Converts a filter value to the type of the stored value it is compared with."""
+    if value == "null":
+        return None
+    if isinstance(sample, bool):
+        return value.lower() == "true"
+    if isinstance(sample, (int, float)) and not isinstance(sample, bool):
+        try:
+            return float(value) if "." in value or isinstance(sample, float) else int(value)
+        except ValueError:
+            return value
+    return value.strip('"')
+
+
+def matches(row: dict, column: str, expression: str) -> bool:
+    match = FILTER.match(expression)
+    if match is None:
+        return True
+    negate, operator, value = match.groups()
+    stored = row.get(column)
+    if operator == "is":
+        result = stored is None if value == "null" else stored is (value == "true")
+    elif operator == "in":
+        values = [item.strip().strip('"') for item in value.strip("()").split(",") if item.strip()]
+        result = stored is not None and any(stored == _coerce(item, stored) for item in values)
+    elif stored is None:
+        result = False
+    else:
+        target = _coerce(value, stored)
+        try:
+            result = {
+                "eq": stored == target,
+                "neq": stored != target,
+                "gt": stored > target,
+                "gte": stored >= target,
+                "lt": stored < target,
+                "lte": stored <= target,
+            }[operator]
+        except TypeError:
+            result = False
+    return not result if negate else result
+
+
+def project(row: dict, select: str) -> dict:
+    """Applies select=: plain columns only, embedded resources ("call_insights(rating)") are skipped."""
+    if not select or select.strip() == "*":
+        return dict(row)
+    columns = []
+    depth = 0
+    current = ""
+    for character in select:
+        if character == "(":
+            depth += 1
+        elif character == ")":
+            depth -= 1
+        elif character == "," and depth == 0:
+            columns.append(current)
+            current = ""
+            continue
+        current += character
+    columns.append(current)
+    result = {}
+    for column in columns:
+        column = column.strip()
+        if not column or "(" in column:
+            continue
+        if column == "*":
+            result.update(row)
+            continue
+        name = column.strip('"')
+        result[name] = row.get(name)
+    return result
+
+
+class MockSupabaseHandler(BaseHTTPRequestHandler):
+    config = None
+    database = None
+
+    def log_message(self, format, *args):
+        if self.config.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body=None, headers: dict = None):
+        payload = b"" if body is None else json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _route(self):
+        time.sleep(self.sample_latency())
+        url = urlsplit(self.path)
+        if url.path.startswith("/auth/v1/"):
+            return None, None, self._send_json(401, {"code": 401, "error_code": "bad_jwt", "msg": "invalid JWT"})
+        if not url.path.startswith("/rest/v1/"):
+            return None, None, self._send_json(404, {"message": "not found"})
+        table = unquote(url.path[len("/rest/v1/"):]).strip("/")
+        return table, parse_qsl(url.query, keep_blank_values=True), None
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _select(self, table: str, params: list) -> list:
+        rows = self.database.rows(table)
+        for column, expression in params:
+            if column not in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+                rows = [row for row in rows if matches(row, unquote(column).strip('"'), expression)]
+        options = dict(params)
+        if options.get("order"):
+            for term in reversed(options["order"].split(",")):
+                column, _, direction = term.partition(".")
+                descending = direction.startswith("desc")
+                present = [row for row in rows if row.get(column) is not None]
+                missing = [row for row in rows if row.get(column) is None]
+                rows = sorted(present, key=lambda row: row[column], reverse=descending) + missing
+        offset = int(options.get("offset") or 0)
+        if options.get("limit"):
+            rows = rows[offset:offset + int(options["limit"])]
+        elif offset:
+            rows = rows[offset:]
+        return rows
+
+    def _respond_rows(self, rows: list, select: str = None):
+        rows = [project(row, select) for row in rows]
+        headers = {"Content-Range": f"0-{max(len(rows) - 1, 0)}/{len(rows)}"}
+        status = 201 if self.command == "POST" else 200
+        if self.command != "GET" and "return=representation" not in (self.headers.get("Prefer") or ""):
+            return self._send_json(201 if self.command == "POST" else 204, None, headers)
+        if OBJECT_MEDIA_TYPE in (self.headers.get("Accept") or ""):
+            if len(rows) != 1:
+                return self._send_json(406, {
+                    "code": "PGRST116",
+                    "details": f"The result contains {len(rows)} rows",
+                    "hint": None,
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                })
+            return self._send_json(status, rows[0], headers)
+        return self._send_json(status, rows, headers)
+
+    def do_GET(self):
+        table, params, handled = self._route()
+        if table is None:
+            return handled
+        with self.database.lock:
+            rows = [dict(row) for row in self._select(table, params)]
+        self._respond_rows(rows, dict(params).get("select"))
+
+    def do_POST(self):
+        table, params, handled = self._route()
+        if table is None:
+            return handled
+        body = self._read_body()
+        upsert = "merge-duplicates" in (self.headers.get("Prefer") or "")
+        on_conflict = dict(params).get("on_conflict") if upsert else None
+        if upsert and on_conflict is None:
+            on_conflict = PRIMARY_KEYS.get(table)
+        try:
+            with self.database.lock:
+                rows = [dict(self.database.insert(table, row, on_conflict)) for row in (body if isinstance(body, list) else [body])]
+        except ValueError as e:
+            return self._send_json(409, {"code": "23505", "message": str(e), "details": None, "hint": None})
+        self._respond_rows(rows, dict(params).get("select"))
+
+    def do_PATCH(self):
+        table, params, handled = self._route()
+        if table is None:
+            return handled
+        body = self._read_body() or {}
+        with self.database.lock:
+            rows = self._select(table, params)
+            for row in rows:
+                self.database.update(table, row, body)
+            rows = [dict(row) for row in rows]
+        self._respond_rows(rows, dict(params).get("select"))
+
+    def do_DELETE(self):
+        table, params, handled = self._route()
+        if table is None:
+            return handled
+        with self.database.lock:
+            doomed = self._select(table, params)
+            self.database.tables[table] = [row for row in self.database.rows(table) if not any(row is d for d in doomed)]
+        self._respond_rows(doomed, dict(params).get("select"))
+
+    def sample_latency(self) -> float:
+        if not self.config.latency_ms:
+            return 0.0
+        return random.lognormvariate(math.log(self.config.latency_ms / 1000), self.config.sigma)
+
+
+def transcription_from_benchmark(text: str) -> str:
+    """Converts "Name: text" lines into the stored "Speaker N: text" blocks."""
+    speakers = {}
+    blocks = []
+    for line in text.splitlines():
+        match = SPEAKER_LINE.match(line.strip())
+        if match is None:
+            continue
+        name, spoken = match.groups()
+        speakers.setdefault(name, f"Speaker {len(speakers) + 1}")
+        blocks.append(f"{speakers[name]}: {spoken}")
+    return "\n\n".join(blocks)
+
+
+def seed(database: Database, calls: int, reps: int, password: str, benchmark_folder: str):
+    """Adds sales reps with logins, and calls rotating through the benchmark transcripts."""
+    password_hash = None
+    if reps:
+        try:
+            import bcrypt
+            password_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+        except ImportError:
+            print("Warning: bcrypt not installed, seeded sales reps cannot log in", file=sys.stderr)
+    for index in range(1, reps + 1):
+        database.insert("sales_reps", {
+            "sales_rep_first_name": "Load",
+            "sales_rep_last_name": f"Rep {index}",
+            "Email": rep_email(index),
+            "Phone Number": None,
+        })
+        database.insert("user_auth", {
+            "email": rep_email(index),
+            "Password": password_hash or "",
+            "Full Name": f"Load Rep {index}",
+            "Role": "sales_rep",
+            "Is active": True,
+        })
+
+    transcriptions = []
+    if os.path.isdir(benchmark_folder):
+        for name in sorted(os.listdir(benchmark_folder)):
+            if name.endswith(".txt"):
+                with open(os.path.join(benchmark_folder, name), encoding="utf-8") as f:
+                    transcription = transcription_from_benchmark(f.read())
+                if transcription:
+                    transcriptions.append(transcription)
+    transcriptions = transcriptions or ["Speaker 1: Hello, thanks for taking the call.\n\nSpeaker 2: Happy to talk."]
+    start = datetime(2024, 1, 1, 9)
+    for index in range(calls):
+        database.insert("call_logs", {
+            "sales_rep_id": index % reps + 1 if reps else None,
+            "customer_id": None,
+            "call_date": (start + timedelta(hours=index)).isoformat(),
+            "duration_minutes": 15,
+            "call_outcome": ["In-progress", "Closed", "Fail"][index % 3],
+            "transcription": transcriptions[index % len(transcriptions)],
+            "insights": None,
+            "processed_at": None,
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory Supabase REST stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--calls", type=int, default=0, help="Synthetic call_logs rows to seed")
+    parser.add_argument("--reps", type=int, default=0, help="Sales reps with user_auth logins to seed")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="Password of the seeded sales reps")
+    parser.add_argument("--benchmark-folder", default=os.path.join(HERE, "benchmark_folder"))
+    parser.add_argument("--latency-ms", type=float, default=0, help="Median latency of every request")
+    parser.add_argument("--sigma", type=float, default=0.4, help="Log-normal spread of the latency")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--print-key", action="store_true", help="Print a key the Supabase clients accept and exit")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if args.print_key:
+        print(anon_key())
+        return
+
+    random.seed(args.seed)
+    database = Database()
+    seed(database, args.calls, args.reps, args.password, args.benchmark_folder)
+    MockSupabaseHandler.config = args
+    MockSupabaseHandler.database = database
+    server = ThreadingHTTPServer((args.host, args.port), MockSupabaseHandler)
+    print(f"Mock Supabase listening on http://{args.host}:{args.port} "
+          f"({args.calls} calls, {args.reps} reps)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+"""
+near_duplicates.py
+
+Near-duplicate and script-adherence detection over call transcripts
+(call_logs.transcription), without comparing calls pairwise.
+
+Each transcript is reduced to its set of word 5-shingles (speaker labels
+removed) and summarized by a MinHash signature: NUM_PERM minimums of
+independent hash functions, whose agreement rate between two calls
+estimates the Jaccard similarity of their shingle sets. Signatures are cut
+into BANDS bands of ROWS values (locality-sensitive hashing); calls sharing
+any whole band become candidates, and only candidates are compared. With 32
+bands of 4 rows, pairs with a similarity of 0.5 are found with 87%
+probability and pairs above 0.6 with 99%.
+
+The index follows search_index.py: a directory of immutable segment files
+plus a manifest. A segment holds the call ids, sales rep ids, shingle
+counts, signatures and, per band, the band keys sorted for binary search,
+so a query costs BANDS binary searches per segment plus the candidates,
+not a scan of the archive. Re-indexed calls tombstone their older version;
+compact() merges segments.
+
+Script adherence is measured against the benchmark_folder scripts: the
+coverage of a script is the share of the rep's shingles in it (the first
+speaker's lines) that also occur in the call. It is computed exactly when a
+call is indexed and stored with the segment, together with a fingerprint
+of the scripts; after the scripts change, `update --full` re-scores.
+
+Usage:
+    python near_duplicates.py update                 # index new and changed calls from Supabase
+    python near_duplicates.py similar --call-id 42   # near-copies of one call
+    python near_duplicates.py similar --transcript diarized-transcript.json
+    python near_duplicates.py duplicates --threshold 0.8
+    python near_duplicates.py coverage --rep 3
+    python near_duplicates.py compact
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+import telemetry
+import transcripts
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_DIR = os.path.join(BASE_DIR, "near_duplicate_index")
+BENCHMARK_FOLDER = os.path.join(BASE_DIR, "benchmark_folder")
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+# Fixed so signatures stay comparable across runs and machines
+SEED = 20240601
+DEFAULT_THRESHOLD = 0.5
+
+TOKEN = re.compile(r"[a-z0-9]+")
+# "Speaker 1: ", "Sales Rep (Sophie): " at the start of a line
+SPEAKER_LABEL = re.compile(r"^[^\S\n]*([A-Z][^:\n]{0,40}):[^\S\n]+", re.MULTILINE)
+
+MAGIC = b"VMHS"
+VERSION = 1
+# magic, version, call count, num_perm, bands, script count, scripts fingerprint
+HEADER = struct.Struct("<4sIIIII16s")
+
+_rng = np.random.default_rng(SEED)
+# Multiply-shift hashing: the high 32 bits of (a * x + b) mod 2**64, a odd
+HASH_A = _rng.integers(1, 2 ** 63, size=NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+HASH_B = _rng.integers(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64)
+# Combines the token hashes of a shingle, and the rows of a band, into one key
+SHINGLE_COEFFICIENTS = _rng.integers(1, 2 ** 63, size=SHINGLE_SIZE, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+BAND_COEFFICIENTS = _rng.integers(1, 2 ** 63, size=ROWS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+EMPTY = np.uint32(0xFFFFFFFF)
+
+
+def strip_speakers(text: str) -> str:
+    return SPEAKER_LABEL.sub("", text or "")
+
+
+def shingles(text: str) -> np.ndarray:
+    """
+    Returns the distinct 32-bit hashes of the word SHINGLE_SIZE-grams of text,
+    speaker labels removed. Texts shorter than one shingle hash as a whole.
+    """
+    tokens = TOKEN.findall(strip_speakers(text).lower())
+    if not tokens:
+        return np.zeros(0, dtype=np.uint64)
+    hashes = np.fromiter((zlib.crc32(token.encode("utf-8")) for token in tokens), dtype=np.uint64, count=len(tokens))
+    width = min(SHINGLE_SIZE, len(hashes))
+    combined = np.zeros(len(hashes) - width + 1, dtype=np.uint64)
+    for offset in range(width):
+        combined += hashes[offset:offset + len(combined)] * SHINGLE_COEFFICIENTS[offset]
+    return np.unique(combined >> np.uint64(32))
+
+
+def signature(shingle_hashes: np.ndarray) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32 values) of a shingle set."""
+    if not len(shingle_hashes):
+        return np.full(NUM_PERM, EMPTY, dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        values = (HASH_A[:, None] * shingle_hashes[None, :] + HASH_B[:, None]) >> np.uint64(32)
+    return values.min(axis=1).astype(np.uint32)
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """Returns a (BANDS, n) array of 64-bit keys, one per band of each (n, NUM_PERM) signature."""
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        return (bands * BAND_COEFFICIENTS).sum(axis=2, dtype=np.uint64).T.copy()
+
+
+def transcription_text(call: dict) -> str:
+    return " ".join(segment["text"] for segment in transcripts.segments_from_transcription(call.get("transcription")))
+
+
+class Scripts:
+    """The benchmark_folder scripts as rep-side shingle sets."""
+
+    def __init__(self, folder: str = BENCHMARK_FOLDER):
+        self.names = []
+        self.shingles = []
+        if os.path.isdir(folder):
+            for name in sorted(os.listdir(folder)):
+                if name.endswith(".txt"):
+                    with open(os.path.join(folder, name), encoding="utf-8") as f:
+                        self.names.append(name)
+                        self.shingles.append(shingles(self.rep_lines(f.read())))
+        digest = hashlib.sha256()
+        for name, hashes in zip(self.names, self.shingles):
+            digest.update(name.encode("utf-8"))
+            digest.update(hashes.tobytes())
+        self.fingerprint = digest.hexdigest()[:16]
+
+    @staticmethod
+    def rep_lines(text: str) -> str:
+        """The lines of the first speaker (the rep places the call); all text if unlabeled."""
+        rep = None
+        lines = []
+        for line in text.splitlines():
+            match = SPEAKER_LABEL.match(line)
+            if match is None:
+                continue
+            rep = rep or match.group(1)
+            if match.group(1) == rep:
+                lines.append(line)
+        return "\n".join(lines) if lines else text
+
+    def coverage(self, call_shingles: np.ndarray) -> np.ndarray:
+        """Share of each script's shingles found in the call, as float32 in [0, 1]."""
+        return np.array([
+            np.isin(script, call_shingles, assume_unique=True).mean() if len(script) else 0.0
+            for script in self.shingles
+        ], dtype=np.float32)
+
+
+def write_segment(path: str, rows: list, scripts_fingerprint: str, script_count: int):
+    """
+    Writes an immutable segment file.
+    rows: list of (call_id, sales_rep_id, shingle count, signature, coverage).
+    """
+    count = len(rows)
+    call_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    rep_ids = np.array([-1 if row[1] is None else row[1] for row in rows], dtype=np.int64)
+    sizes = np.array([row[2] for row in rows], dtype=np.uint32)
+    signatures = np.array([row[3] for row in rows], dtype=np.uint32).reshape(count, NUM_PERM)
+    coverage = np.array([row[4] for row in rows], dtype=np.float32).reshape(count, script_count)
+    keys = band_keys(signatures)
+    order = np.argsort(keys, axis=1, kind="stable").astype(np.uint32)
+    sorted_keys = np.take_along_axis(keys, order.astype(np.int64), axis=1)
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, count, NUM_PERM, BANDS, script_count, scripts_fingerprint.encode("ascii")))
+        # 8-byte arrays first so every array stays aligned
+        for array in (call_ids, rep_ids, sorted_keys, signatures, order, sizes, coverage):
+            f.write(array.tobytes())
+    os.replace(temp_path, path)
+
+
+class Segment:
+    """Read-only, memory-mapped view of a segment file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._file = open(path, "rb")
+        self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, num_perm, bands, script_count, fingerprint = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != VERSION or num_perm != NUM_PERM or bands != BANDS:
+            raise ValueError(f"{path} is not a version {VERSION} MinHash segment with {NUM_PERM}x{BANDS} signatures")
+        self.count = count
+        self.script_count = script_count
+        self.scripts_fingerprint = fingerprint.decode("ascii")
+
+        offset = HEADER.size
+        arrays = {}
+        for name, dtype, shape in (
+            ("call_ids", np.int64, (count,)),
+            ("rep_ids", np.int64, (count,)),
+            ("keys", np.uint64, (BANDS, count)),
+            ("signatures", np.uint32, (count, NUM_PERM)),
+            ("order", np.uint32, (BANDS, count)),
+            ("sizes", np.uint32, (count,)),
+            ("coverage", np.float32, (count, script_count)),
+        ):
+            size = int(np.prod(shape))
+            arrays[name] = np.frombuffer(self.buffer, dtype=dtype, count=size, offset=offset).reshape(shape)
+            offset += size * np.dtype(dtype).itemsize
+        self.call_ids = arrays["call_ids"]
+        self.rep_ids = arrays["rep_ids"]
+        self.keys = arrays["keys"]
+        self.signatures = arrays["signatures"]
+        self.order = arrays["order"]
+        self.sizes = arrays["sizes"]
+        self.coverage = arrays["coverage"]
+
+    def close(self):
+        # The numpy views must go before the map can be closed
+        self.call_ids = self.rep_ids = self.keys = self.signatures = None
+        self.order = self.sizes = self.coverage = None
+        self.buffer.close()
+        self._file.close()
+
+    def candidates(self, keys: np.ndarray) -> np.ndarray:
+        """Rows sharing at least one band key with keys (one per band)."""
+        found = []
+        for band in range(BANDS):
+            band_keys_sorted = self.keys[band]
+            low = np.searchsorted(band_keys_sorted, keys[band], side="left")
+            high = np.searchsorted(band_keys_sorted, keys[band], side="right")
+            if high > low:
+                found.append(self.order[band, low:high])
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.uint32)
+
+
+class NearDuplicateIndex:
+    """A directory of segments plus a manifest tracking tombstones and the update watermark."""
+
+    def __init__(self, directory: str = DEFAULT_INDEX_DIR, scripts: Scripts = None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.scripts = scripts or Scripts()
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"segments": [], "deleted": {}, "next_segment": 0, "watermark": None, "scripts": {}}
+        self.segments = [Segment(os.path.join(directory, name)) for name in self.manifest["segments"]]
+        self.pending = {}
+        self._load_rows()
+
+    def _load_rows(self):
+        """Maps each live call_id to its (segment, row) and builds the per-segment live masks."""
+        self.locations = {}
+        self.deleted = {name: set(rows) for name, rows in self.manifest["deleted"].items()}
+        self.live = {}
+        for segment in self.segments:
+            live = np.ones(segment.count, dtype=bool)
+            live[list(self.deleted.get(segment.name, ()))] = False
+            self.live[segment.name] = live
+            for row in np.flatnonzero(live):
+                self.locations[int(segment.call_ids[row])] = (segment, int(row))
+        self.live_count = len(self.locations)
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+
+    def _save_manifest(self):
+        self.manifest["deleted"] = {name: sorted(rows) for name, rows in self.deleted.items() if rows}
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def add(self, call_id: int, text: str, sales_rep_id=None):
+        """Buffers a call's transcript text for the next commit()."""
+        call_shingles = shingles(text)
+        self.pending[int(call_id)] = (
+            int(call_id), sales_rep_id, len(call_shingles),
+            signature(call_shingles), self.scripts.coverage(call_shingles)
+        )
+
+    def commit(self):
+        """Writes buffered calls as a new segment and tombstones their older versions."""
+        if not self.pending:
+            return
+        with telemetry.span("near_duplicates.commit", documents=len(self.pending)):
+            self._write([row for _, row in sorted(self.pending.items())], self.scripts.fingerprint, len(self.scripts.names))
+            self.manifest["scripts"][self.scripts.fingerprint] = self.scripts.names
+            for call_id in self.pending:
+                if call_id in self.locations:
+                    old_segment, row = self.locations[call_id]
+                    self.deleted.setdefault(old_segment.name, set()).add(row)
+            self.pending = {}
+            self._save_manifest()
+            self._load_rows()
+
+    def _write(self, rows: list, scripts_fingerprint: str, script_count: int) -> Segment:
+        name = f"seg_{self.manifest['next_segment']:06d}.vmhs"
+        write_segment(os.path.join(self.directory, name), rows, scripts_fingerprint, script_count)
+        self.manifest["next_segment"] += 1
+        self.manifest["segments"].append(name)
+        segment = Segment(os.path.join(self.directory, name))
+        self.segments.append(segment)
+        return segment
+
+    def compact(self):
+        """
+        Merges the segments scored against the same scripts into one,
+        dropping tombstoned rows. Signatures are kept, so no text is re-read.
+        """
+        if len(self.segments) <= 1 and not any(self.deleted.values()):
+            return
+        with telemetry.span("near_duplicates.compact", segments=len(self.segments)):
+            groups = {}
+            for segment in self.segments:
+                groups.setdefault((segment.scripts_fingerprint, segment.script_count), []).append(segment)
+            old_segments = self.segments
+            self.segments = []
+            self.manifest["segments"] = []
+            for (fingerprint, script_count), segments in groups.items():
+                rows = []
+                for segment in segments:
+                    for row in np.flatnonzero(self.live[segment.name]):
+                        rep_id = int(segment.rep_ids[row])
+                        rows.append((
+                            int(segment.call_ids[row]), rep_id if rep_id >= 0 else None,
+                            int(segment.sizes[row]), np.array(segment.signatures[row]),
+                            np.array(segment.coverage[row])
+                        ))
+                if rows:
+                    rows.sort(key=lambda row: row[0])
+                    self._write(rows, fingerprint, script_count)
+            self.deleted = {}
+            self._save_manifest()
+            for segment in old_segments:
+                segment.close()
+                os.remove(segment.path)
+            self._load_rows()
+
+    def signature_of(self, call_id: int):
+        location = self.locations.get(int(call_id))
+        if location is None:
+            return None
+        segment, row = location
+        return np.array(segment.signatures[row])
+
+    def similar(self, query_signature: np.ndarray, threshold: float = DEFAULT_THRESHOLD,
+                limit: int = 10, exclude_call_id=None) -> list:
+        """
+        Returns the indexed calls whose estimated Jaccard similarity to the
+        signature is at least threshold, as dicts with call_id, similarity and
+        sales_rep_id, most similar first.
+        """
+        if (query_signature == EMPTY).all():
+            return []
+        keys = band_keys(query_signature.reshape(1, NUM_PERM))[:, 0]
+        results = []
+        with telemetry.span("near_duplicates.similar") as current:
+            candidate_count = 0
+            for segment in self.segments:
+                rows = segment.candidates(keys)
+                rows = rows[self.live[segment.name][rows]]
+                candidate_count += len(rows)
+                if not len(rows):
+                    continue
+                similarity = (segment.signatures[rows] == query_signature).mean(axis=1)
+                for row, value in zip(rows, similarity):
+                    call_id = int(segment.call_ids[row])
+                    if value >= threshold and call_id != exclude_call_id:
+                        rep_id = int(segment.rep_ids[row])
+                        results.append({
+                            "call_id": call_id,
+                            "similarity": round(float(value), 3),
+                            "sales_rep_id": rep_id if rep_id >= 0 else None,
+                        })
+            current.set(candidates=candidate_count, results=len(results))
+        results.sort(key=lambda result: (-result["similarity"], result["call_id"]))
+        return results[:limit]
+
+    def duplicates(self, threshold: float = DEFAULT_THRESHOLD) -> list:
+        """
+        Groups the indexed calls into clusters of near-copies: calls joined by
+        a chain of pairs with estimated similarity >= threshold. Returns
+        dicts with call_ids and the lowest similarity among the cluster's
+        matched pairs, largest clusters first.
+        """
+        if not self.live_count:
+            return []
+        with telemetry.span("near_duplicates.duplicates", calls=self.live_count) as current:
+            call_ids = np.concatenate([segment.call_ids[self.live[segment.name]] for segment in self.segments])
+            signatures = np.concatenate([segment.signatures[self.live[segment.name]] for segment in self.segments])
+            keys = band_keys(signatures)
+            empty = (signatures == EMPTY).all(axis=1)
+
+            candidates = set()
+            for band in range(BANDS):
+                order = np.argsort(keys[band], kind="stable")
+                sorted_keys = keys[band][order]
+                # Runs of equal keys are the band's buckets
+                starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+                ends = np.r_[starts[1:], len(order)]
+                for start, end in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+                    bucket = np.sort(order[start:end])
+                    for position, first in enumerate(bucket[:-1]):
+                        candidates.update((int(first), int(second)) for second in bucket[position + 1:])
+
+            parent = list(range(len(call_ids)))
+
+            def find(node):
+                while parent[node] != node:
+                    parent[node] = parent[parent[node]]
+                    node = parent[node]
+                return node
+
+            weakest = {}
+            if candidates:
+                pairs = np.array(sorted(candidates), dtype=np.int64)
+                pairs = pairs[~(empty[pairs[:, 0]] | empty[pairs[:, 1]])]
+                similarity = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+                for (first, second), value in zip(pairs[similarity >= threshold], similarity[similarity >= threshold]):
+                    root_first, root_second = find(int(first)), find(int(second))
+                    value = min(float(value), weakest.pop(root_first, 1.0), weakest.pop(root_second, 1.0))
+                    if root_first != root_second:
+                        parent[root_second] = root_first
+                    weakest[root_first] = value
+            current.set(candidate_pairs=len(candidates))
+
+            clusters = {}
+            for node in range(len(call_ids)):
+                clusters.setdefault(find(node), []).append(int(call_ids[node]))
+        groups = [
+            {"call_ids": sorted(members), "min_similarity": round(weakest[root], 3)}
+            for root, members in clusters.items() if len(members) > 1
+        ]
+        groups.sort(key=lambda group: (-len(group["call_ids"]), -group["min_similarity"], group["call_ids"][0]))
+        return groups
+
+    def coverage(self, call_id=None, sales_rep_id=None) -> dict:
+        """
+        Script coverage from the stored scores. For one call, the coverage of
+        each script; otherwise per sales rep, the number of calls, the mean
+        coverage of each call's closest script and how often each script was
+        the closest. Calls scored against other scripts than the current ones
+        are counted as stale and left out.
+        """
+        names = self.scripts.names
+        if call_id is not None:
+            location = self.locations.get(int(call_id))
+            if location is None:
+                return {}
+            segment, row = location
+            if segment.scripts_fingerprint != self.scripts.fingerprint:
+                return {"call_id": int(call_id), "stale": True}
+            return {
+                "call_id": int(call_id),
+                "coverage": {name: round(float(value) * 100, 1) for name, value in zip(names, segment.coverage[row])},
+            }
+
+        by_rep = {}
+        stale = 0
+        for segment in self.segments:
+            live = self.live[segment.name]
+            if sales_rep_id is not None:
+                live = live & (segment.rep_ids == int(sales_rep_id))
+            if segment.scripts_fingerprint != self.scripts.fingerprint:
+                stale += int(live.sum())
+                continue
+            if not live.any() or not names:
+                continue
+            coverage = segment.coverage[live]
+            best = coverage.argmax(axis=1)
+            best_coverage = coverage.max(axis=1)
+            for rep_id, script, value in zip(segment.rep_ids[live], best, best_coverage):
+                entry = by_rep.setdefault(int(rep_id), {"calls": 0, "total": 0.0, "closest_script": {}})
+                entry["calls"] += 1
+                entry["total"] += float(value)
+                if value > 0:
+                    entry["closest_script"][names[script]] = entry["closest_script"].get(names[script], 0) + 1
+
+        reps = []
+        for rep_id, entry in sorted(by_rep.items()):
+            reps.append({
+                "sales_rep_id": rep_id if rep_id >= 0 else None,
+                "calls": entry["calls"],
+                "mean_coverage": round(entry["total"] / entry["calls"] * 100, 1),
+                "closest_script": dict(sorted(entry["closest_script"].items(), key=lambda item: -item[1])),
+            })
+        return {"scripts": names, "reps": reps, "stale_calls": stale}
+
+
+def update_from_supabase(index: NearDuplicateIndex, batch_size: int = 500, full: bool = False) -> int:
+    """
+    Indexes the call_logs rows whose transcription changed since the
+    manifest watermark (db.ChangedCalls), or every row with full=True (to
+    re-score after the scripts changed); a re-indexed call replaces its
+    previous signature. Returns the number of calls indexed.
+    """
+    import db
+
+    changed = db.ChangedCalls(
+        "call_id, sales_rep_id, transcription",
+        None if full else index.manifest.get("watermark"), batch_size=batch_size
+    )
+    count = 0
+    for row in changed:
+        index.add(row["call_id"], transcription_text(row), row.get("sales_rep_id"))
+        count += 1
+        if len(index.pending) >= batch_size:
+            index.commit()
+    index.commit()
+    # Only a complete pass moves the watermark
+    index.manifest["watermark"] = changed.watermark
+    index._save_manifest()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate and script-adherence detection over call transcripts")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    update_parser = subparsers.add_parser("update", help="Index new and changed calls from Supabase")
+    update_parser.add_argument("--full", action="store_true", help="Re-index every call, e.g. after the scripts changed")
+    subparsers.add_parser("compact", help="Merge segments")
+    similar_parser = subparsers.add_parser("similar", help="Find near-copies of one call")
+    source = similar_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--call-id", type=int, help="An indexed call")
+    source.add_argument("--transcript", help="A diarized transcript JSON file")
+    similar_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    similar_parser.add_argument("--limit", type=int, default=10)
+    duplicates_parser = subparsers.add_parser("duplicates", help="List clusters of near-copies")
+    duplicates_parser.add_argument("--threshold", type=float, default=0.8)
+    coverage_parser = subparsers.add_parser("coverage", help="Script coverage per sales rep or for one call")
+    coverage_parser.add_argument("--call-id", type=int, default=None)
+    coverage_parser.add_argument("--rep", type=int, default=None, help="Filter by sales_rep_id")
+    args = parser.parse_args()
+
+    index = NearDuplicateIndex(args.index_dir)
+    try:
+        if args.command == "update":
+            count = update_from_supabase(index, full=args.full)
+            print(f"Indexed {count} calls ({index.live_count} in index)", file=sys.stderr)
+        elif args.command == "compact":
+            index.compact()
+            print(f"Compacted index to {len(index.segments)} segment(s)", file=sys.stderr)
+        elif args.command == "similar":
+            if args.call_id is not None:
+                query_signature = index.signature_of(args.call_id)
+                if query_signature is None:
+                    raise SystemExit(f"Call {args.call_id} is not indexed; run `update` first")
+            else:
+                text = transcripts.transcript_to_text(transcripts.load_transcript(args.transcript))
+                query_signature = signature(shingles(text))
+            results = index.similar(query_signature, args.threshold, args.limit, exclude_call_id=args.call_id)
+            print(json.dumps(results, indent=2))
+        elif args.command == "duplicates":
+            print(json.dumps(index.duplicates(args.threshold), indent=2))
+        else:
+            print(json.dumps(index.coverage(args.call_id, args.rep), indent=2))
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+profiling.py
+
+Opt-in profiling of a single insights run.
+
+A run is profiled when INSIGHTS_PROFILE=1 (server.js sets it for a request
+sent by an admin with the X-Profile: 1 header) or, otherwise, with
+probability INSIGHTS_PROFILE_SAMPLE_RATE (0 to 1, default 0). When neither
+applies the only cost is reading those variables.
+
+A profile covers the main thread with cProfile and all allocations with
+tracemalloc, and is stored under the request ID in PROFILE_DIR (default
+<tmp>/veritas-profiles):
+- <request_id>.prof, cProfile stats for pstats or snakeviz;
+- <request_id>.json, a summary: wall and CPU time, the top functions by
+  cumulative and by own time, and the top allocation sites.
+Only the newest PROFILE_KEEP (default 50) profiles are kept. server.js
+lists and serves them on /api/admin/profiles.
+
+Usage:
+    python profiling.py list
+    python profiling.py show <request_id>
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+import telemetry
+
+TOP_ENTRIES = 25
+
+# Request IDs can come from the client (X-Request-Id), so only these
+# characters make it into file names; server.js applies the same rule
+UNSAFE_ID_CHARS = re.compile(r"[^A-Za-z0-9_-]")
+
+
+def profile_dir() -> str:
+    return os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "veritas-profiles")
+
+
+def profile_id(request_id: str) -> str:
+    return UNSAFE_ID_CHARS.sub("_", request_id)[:128]
+
+
+def enabled() -> bool:
+    if os.getenv("INSIGHTS_PROFILE", "0").lower() in ("1", "true", "yes"):
+        return True
+    try:
+        rate = float(os.getenv("INSIGHTS_PROFILE_SAMPLE_RATE") or 0)
+    except ValueError:
+        # A malformed rate must not fail the analysis; profile nothing
+        rate = 0
+    return rate > 0 and random.random() < rate
+
+
+def _function_name(key) -> str:
+    filename, line, function = key
+    return f"{os.path.basename(filename)}:{line}({function})" if line else function
+
+
+def summarize(profiler, snapshot, request_id: str, name: str, wall: float, cpu: float, peak: int) -> dict:
+    """Builds the JSON summary of a cProfile run and a tracemalloc snapshot."""
+    import pstats
+
+    stats = pstats.Stats(profiler).stats
+
+    def top(sort_index: int) -> list:
+        # stats values: (primitive calls, total calls, own time, cumulative time, callers)
+        ranked = sorted(stats.items(), key=lambda item: item[1][sort_index], reverse=True)[:TOP_ENTRIES]
+        return [
+            {
+                "function": _function_name(key),
+                "calls": total_calls,
+                "own_seconds": round(own, 6),
+                "cumulative_seconds": round(cumulative, 6),
+            }
+            for key, (_, total_calls, own, cumulative, _) in ranked
+        ]
+
+    allocations = [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_bytes": stat.size,
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics("lineno")[:TOP_ENTRIES]
+    ] if snapshot is not None else []
+
+    return {
+        "request_id": request_id,
+        "name": name,
+        "created_at": time.time(),
+        "wall_seconds": round(wall, 6),
+        "cpu_seconds": round(cpu, 6),
+        "peak_traced_bytes": peak,
+        "top_cumulative": top(3),
+        "top_own": top(2),
+        "top_allocations": allocations,
+    }
+
+
+def store(profiler, summary: dict, directory: str = None, keep: int = None):
+    """Writes the .prof and .json files and drops the oldest profiles beyond keep."""
+    directory = directory or profile_dir()
+    keep = keep if keep is not None else int(os.getenv("PROFILE_KEEP") or 50)
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, profile_id(summary["request_id"]))
+    profiler.dump_stats(base + ".prof")
+    with open(base + ".json.tmp", "w") as f:
+        json.dump(summary, f, indent=2)
+    # The summary appears last, so listed profiles are always complete
+    os.replace(base + ".json.tmp", base + ".json")
+
+    summaries = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime, reverse=True
+    )
+    for entry in summaries[keep:]:
+        for suffix in (".json", ".prof"):
+            with contextlib.suppress(OSError):
+                os.remove(entry.path[:-len(".json")] + suffix)
+
+
+@contextlib.contextmanager
+def maybe_profile(name: str):
+    """Profiles the enclosed block if this run is selected, see enabled()."""
+    if not enabled():
+        yield
+        return
+
+    import cProfile
+    import tracemalloc
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        try:
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+            ])
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+            request_id = telemetry.get_request_id()
+            store(profiler, summarize(profiler, snapshot, request_id, name, wall, cpu, peak))
+            telemetry.increment("insights_profiles_total")
+        except Exception as e:
+            # Profiling must never break the analysis
+            print(f"Error storing profile: {e}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List and show stored insights profiles")
+    parser.add_argument("--dir", default=None, help="Profile directory (default PROFILE_DIR)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List stored profiles, newest first")
+    show_parser = subparsers.add_parser("show", help="Print the top functions of a profile")
+    show_parser.add_argument("request_id")
+    show_parser.add_argument("--sort", default="cumulative", choices=["cumulative", "tottime", "ncalls"])
+    args = parser.parse_args()
+
+    directory = args.dir or profile_dir()
+    if args.command == "list":
+        summaries = []
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.endswith(".json"):
+                    with open(os.path.join(directory, name)) as f:
+                        summary = json.load(f)
+                    summaries.append({key: summary[key] for key in
+                                      ("request_id", "name", "created_at", "wall_seconds", "cpu_seconds", "peak_traced_bytes")})
+        print(json.dumps(sorted(summaries, key=lambda summary: -summary["created_at"]), indent=2))
+    else:
+        import pstats
+        pstats.Stats(os.path.join(directory, f"{profile_id(args.request_id)}.prof")).sort_stats(args.sort).print_stats(TOP_ENTRIES)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+reanalyze.py
+
+Re-runs only the analyzers whose inputs changed since a call was analyzed.
+
+For every analyzed call the fingerprints stored with its insights are
+compared with the current ones from analysis_graph.py. Stale analyzers are
+re-run through the insights server (POST /api/call-insights/:callId?analyzers=...),
+which merges the fresh results into the stored ones and writes both
+call_logs.insights and call_insights. Adding a benchmark file therefore
+re-runs custom_rag only; an edited transcription re-runs everything.
+Results produced by local fallbacks while the LLM was down carry no
+fingerprint, so they are picked up here for enrichment as well. The re-runs
+are sent as batch work (X-LLM-Priority: batch), so they wait behind user
+requests and are deferred once an organization nears its daily budget.
+
+Usage:
+    python reanalyze.py --dry-run                 # report what is stale
+    python reanalyze.py --concurrency 2           # re-run stale analyzers
+    python reanalyze.py --baseline                # stamp current fingerprints on
+                                                  # calls analyzed before fingerprints existed
+"""
+
+import argparse
+import collections
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import analysis_graph
+import circuit_breaker
+import db
+import llm
+import telemetry
+
+DEFAULT_SERVER = os.getenv("INSIGHTS_SERVER_URL", "http://localhost:5001")
+
+
+def find_stale(call_ids=None, only=None, batch_size: int = 200):
+    """
+    Yields (call_id, stale analyzers, changed inputs) for every analyzed call
+    with at least one stale analyzer. `only` restricts the check to the named
+    analyzers.
+    """
+    # Everything but the transcript is the same for every call
+    base_versions = analysis_graph.input_versions(None)
+    analyzers = only or list(analysis_graph.ANALYZERS)
+
+    def filters(query):
+        query = query.not_.is_("insights", "null")
+        if call_ids:
+            query = query.in_("call_id", call_ids)
+        return query
+
+    for call in db.iter_rows(
+        "call_logs",
+        "call_id, transcription, fingerprints:insights->fingerprints",
+        key="call_id",
+        batch_size=batch_size,
+        filters=filters
+    ):
+        if not call.get("transcription"):
+            continue
+        versions = dict(base_versions, transcript=analysis_graph.transcript_version(call["transcription"]))
+        current = analysis_graph.fingerprints(versions, analyzers)
+        stale = analysis_graph.stale_analyzers(call.get("fingerprints"), current)
+        if stale:
+            yield call["call_id"], stale, analysis_graph.changed_inputs(call.get("fingerprints"), current)
+
+
+def reanalyze_call(server: str, call_id, analyzers: list, timeout: float = 600) -> dict:
+    """Asks the insights server to re-run `analyzers` for one call."""
+    if set(analyzers) == set(analysis_graph.ANALYZERS):
+        url = f"{server}/api/call-insights/{call_id}?refresh=true"
+    else:
+        url = f"{server}/api/call-insights/{call_id}?analyzers={','.join(sorted(analyzers))}"
+    request = urllib.request.Request(url, method="POST", headers={
+        "X-Request-Id": telemetry.get_request_id(),
+        # Scheduled behind interactive requests, see llm_governor.py
+        "X-LLM-Priority": "batch",
+    })
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def stamp_baseline(call_ids=None, batch_size: int = 200) -> int:
+    """
+    Records the current fingerprints on analyzed calls that have none, without
+    re-running anything. Meant for calls analyzed before fingerprints were
+    stored, whose results are known to be current.
+    """
+    supabase = db.get_supabase()
+    base_versions = analysis_graph.input_versions(None)
+    stamped = 0
+
+    def filters(query):
+        query = query.not_.is_("insights", "null").is_("insights->fingerprints", "null")
+        if call_ids:
+            query = query.in_("call_id", call_ids)
+        return query
+
+    for call in db.iter_rows("call_logs", "call_id, transcription, insights", key="call_id", batch_size=batch_size, filters=filters):
+        if not call.get("transcription"):
+            continue
+        versions = dict(base_versions, transcript=analysis_graph.transcript_version(call["transcription"]))
+        fingerprints = analysis_graph.fingerprints(versions)
+        insights = dict(call["insights"], fingerprints=fingerprints)
+        supabase.table("call_logs").update({"insights": insights}).eq("call_id", call["call_id"]).execute()
+        supabase.table("call_insights").update({"fingerprints": fingerprints}).eq("call_id", call["call_id"]).execute()
+        stamped += 1
+    return stamped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run stale analyzers for analyzed calls")
+    parser.add_argument("--call-id", type=int, action="append", help="Only check these calls (repeatable)")
+    parser.add_argument("--only", action="append", choices=sorted(analysis_graph.ANALYZERS), help="Only check these analyzers (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Report stale analyzers without re-running them")
+    parser.add_argument("--baseline", action="store_true", help="Stamp current fingerprints on calls that have none")
+    parser.add_argument("--server", default=DEFAULT_SERVER, help=f"Insights server URL (default: {DEFAULT_SERVER})")
+    parser.add_argument("--concurrency", type=int, default=2, help="Calls re-analyzed at once (default: 2)")
+    args = parser.parse_args()
+
+    if args.baseline:
+        count = stamp_baseline(args.call_id)
+        print(f"Stamped fingerprints on {count} calls", file=sys.stderr)
+        return
+
+    stale_calls = list(find_stale(args.call_id, args.only))
+    per_analyzer = collections.Counter(name for _, stale, _ in stale_calls for name in stale)
+    per_input = collections.Counter(node for _, _, changed in stale_calls for node in changed)
+    print(json.dumps({
+        "stale_calls": len(stale_calls),
+        "stale_analyzers": dict(per_analyzer),
+        "changed_inputs": dict(per_input),
+    }, indent=2))
+    if args.dry_run or not stale_calls:
+        return
+
+    # Re-running now would only produce degraded results again
+    for name in per_analyzer:
+        if f"prompt:{name}" not in analysis_graph.ANALYZERS[name]["inputs"]:
+            continue  # not an LLM analyzer
+        breaker = circuit_breaker.for_endpoint(llm.endpoint_for(name))
+        if breaker.state() == circuit_breaker.OPEN:
+            print(f"Circuit for {breaker.endpoint} is open, retry in {breaker.retry_after():.0f}s", file=sys.stderr)
+            sys.exit(1)
+
+    def run(item):
+        call_id, stale, _ = item
+        try:
+            with telemetry.span("reanalyze.call", call_id=call_id, analyzers=",".join(stale)):
+                reanalyze_call(args.server, call_id, stale)
+            telemetry.increment("insights_reanalyzed_total", value=len(stale))
+            return None
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            print(f"Re-analysis of call {call_id} failed: {e}", file=sys.stderr)
+            return call_id
+
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        failed = [call_id for call_id in pool.map(run, stale_calls) if call_id is not None]
+    print(f"Re-analyzed {len(stale_calls) - len(failed)} of {len(stale_calls)} calls", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
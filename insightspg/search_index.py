@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+search_index.py
+
+Full-text search over call transcripts (call_logs.transcription).
+
+The index is a directory of immutable segment files plus a manifest:
+- Each segment holds a fixed-width document table (call_id, sales_rep_id,
+  call date, outcome, length), a sorted term dictionary and varint-encoded
+  postings with term positions. Segments are memory-mapped read-only and
+  terms are found by binary search, so opening an index reads almost nothing.
+- New or re-processed calls are buffered and written as a new segment on
+  commit(). A call that already exists in an older segment is tombstoned in
+  the manifest, so the newest version wins.
+- compact() merges all segments into one and drops tombstoned documents.
+
+Queries are ranked with BM25. Quoted phrases ("pricing objection") must match
+as consecutive words. Results can be filtered by sales rep, call date range
+and call outcome.
+
+Usage:
+    python search_index.py update                      # index new and changed calls from Supabase
+    python search_index.py search '"pricing objection" budget' --rep 3 --outcome Closed
+    python search_index.py compact
+"""
+
+import argparse
+import datetime
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+
+import telemetry
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_index")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+PHRASE_PATTERN = re.compile(r'"([^"]+)"')
+
+# Values allowed by the call_logs_call_outcome_check constraint
+OUTCOMES = ["", "In-progress", "Closed", "Fail"]
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+MAGIC = b"VSEG"
+VERSION = 1
+# magic, version, doc_count, term_count, total_length, terms_offset, strings_offset, postings_offset
+HEADER = struct.Struct("<4sIIIQQQQ")
+# call_id, sales_rep_id, call date (proleptic ordinal, 0 = unknown), outcome code, length in tokens
+DOC = struct.Struct("<qqiBI")
+# string offset, string length, document frequency, postings offset, doc block length, positions block length
+TERM = struct.Struct("<IHIQII")
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+
+def encode_varints(values, out: bytearray):
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+
+def decode_varints(buffer, start: int, end: int):
+    """Yields the unsigned varints stored in buffer[start:end]."""
+    value = 0
+    shift = 0
+    for position in range(start, end):
+        byte = buffer[position]
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            yield value
+            value = 0
+            shift = 0
+
+
+def date_ordinal(value) -> int:
+    """Converts a call_date (ISO string, date or datetime) to a day ordinal, 0 if unknown."""
+    if not value:
+        return 0
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.toordinal()
+    try:
+        return datetime.date.fromisoformat(str(value)[:10]).toordinal()
+    except ValueError:
+        return 0
+
+
+def write_segment(path: str, documents: list):
+    """
+    Writes an immutable segment file.
+    documents: list of (metadata dict, tokens) in the order of their doc numbers.
+    """
+    postings = {}
+    doc_table = bytearray()
+    total_length = 0
+    for docnum, (meta, tokens) in enumerate(documents):
+        doc_table += DOC.pack(
+            int(meta["call_id"]),
+            -1 if meta.get("sales_rep_id") is None else int(meta["sales_rep_id"]),
+            date_ordinal(meta.get("call_date")),
+            OUTCOMES.index(meta.get("call_outcome") or "") if (meta.get("call_outcome") or "") in OUTCOMES else 0,
+            len(tokens)
+        )
+        total_length += len(tokens)
+        for position, token in enumerate(tokens):
+            postings.setdefault(token, {}).setdefault(docnum, []).append(position)
+
+    terms = sorted(postings)
+    term_table = bytearray()
+    strings = bytearray()
+    postings_blob = bytearray()
+    for term in terms:
+        encoded_term = term.encode("utf-8")
+        doc_block = bytearray()
+        positions_block = bytearray()
+        previous_doc = 0
+        for docnum in sorted(postings[term]):
+            positions = postings[term][docnum]
+            encode_varints((docnum - previous_doc, len(positions)), doc_block)
+            previous_doc = docnum
+            previous_position = 0
+            deltas = []
+            for position in positions:
+                deltas.append(position - previous_position)
+                previous_position = position
+            encode_varints(deltas, positions_block)
+        term_table += TERM.pack(
+            len(strings), len(encoded_term), len(postings[term]),
+            len(postings_blob), len(doc_block), len(positions_block)
+        )
+        strings += encoded_term
+        postings_blob += doc_block
+        postings_blob += positions_block
+
+    terms_offset = HEADER.size + len(doc_table)
+    strings_offset = terms_offset + len(term_table)
+    postings_offset = strings_offset + len(strings)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(
+            MAGIC, VERSION, len(documents), len(terms), total_length,
+            terms_offset, strings_offset, postings_offset
+        ))
+        f.write(doc_table)
+        f.write(term_table)
+        f.write(strings)
+        f.write(postings_blob)
+    os.replace(temp_path, path)
+
+
+class Segment:
+    """Read-only, memory-mapped view of a segment file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._file = open(path, "rb")
+        self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.doc_count, self.term_count, self.total_length,
+         self.terms_offset, self.strings_offset, self.postings_offset) = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} search segment")
+
+    def close(self):
+        self.buffer.close()
+        self._file.close()
+
+    def document(self, docnum: int) -> tuple:
+        """Returns (call_id, sales_rep_id, date ordinal, outcome code, length)."""
+        return DOC.unpack_from(self.buffer, HEADER.size + docnum * DOC.size)
+
+    def _term_at(self, index: int) -> tuple:
+        entry = TERM.unpack_from(self.buffer, self.terms_offset + index * TERM.size)
+        start = self.strings_offset + entry[0]
+        return bytes(self.buffer[start:start + entry[1]]), entry
+
+    def lookup(self, term: str):
+        """Binary search of the term dictionary. Returns the term entry or None."""
+        target = term.encode("utf-8")
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            value, entry = self._term_at(middle)
+            if value < target:
+                low = middle + 1
+            elif value > target:
+                high = middle
+            else:
+                return entry
+        return None
+
+    def postings(self, entry, with_positions: bool = False):
+        """
+        Decodes a term's postings into {docnum: tf} or, with positions,
+        {docnum: [positions]}.
+        """
+        _, _, _, offset, doc_block_length, positions_length = entry
+        start = self.postings_offset + offset
+        values = decode_varints(self.buffer, start, start + doc_block_length)
+        docs = []
+        docnum = 0
+        for delta in values:
+            docnum += delta
+            docs.append((docnum, next(values)))
+        if not with_positions:
+            return dict(docs)
+
+        positions = decode_varints(self.buffer, start + doc_block_length, start + doc_block_length + positions_length)
+        result = {}
+        for docnum, tf in docs:
+            current = 0
+            doc_positions = []
+            for _ in range(tf):
+                current += next(positions)
+                doc_positions.append(current)
+            result[docnum] = doc_positions
+        return result
+
+    def iter_terms(self):
+        for index in range(self.term_count):
+            value, entry = self._term_at(index)
+            yield value.decode("utf-8"), entry
+
+
+class SearchIndex:
+    """A directory of segments plus a manifest tracking tombstones and the update watermark."""
+
+    def __init__(self, directory: str = DEFAULT_INDEX_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"segments": [], "deleted": {}, "next_segment": 0, "watermark": None}
+        self.segments = [Segment(os.path.join(directory, name)) for name in self.manifest["segments"]]
+        self.pending = {}
+        self._load_documents()
+
+    def _load_documents(self):
+        """Maps each live call_id to its (segment, docnum) and collects length statistics."""
+        self.locations = {}
+        self.deleted = {name: set(docnums) for name, docnums in self.manifest["deleted"].items()}
+        self.live_count = 0
+        self.live_length = 0
+        for segment in self.segments:
+            deleted = self.deleted.get(segment.name, set())
+            for docnum in range(segment.doc_count):
+                if docnum in deleted:
+                    continue
+                call_id, _, _, _, length = segment.document(docnum)
+                self.locations[call_id] = (segment.name, docnum)
+                self.live_count += 1
+                self.live_length += length
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+
+    def _save_manifest(self):
+        self.manifest["deleted"] = {name: sorted(docnums) for name, docnums in self.deleted.items() if docnums}
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def add(self, call: dict):
+        """
+        Buffers a call_logs row (call_id, transcription, sales_rep_id,
+        call_date, call_outcome) for the next commit().
+        """
+        self.pending[int(call["call_id"])] = call
+
+    def commit(self):
+        """Writes buffered calls as a new segment and tombstones their older versions."""
+        if not self.pending:
+            return
+        with telemetry.span("search.commit", documents=len(self.pending)):
+            documents = [
+                (call, tokenize(call.get("transcription")))
+                for _, call in sorted(self.pending.items())
+            ]
+            name = f"seg_{self.manifest['next_segment']:06d}.vseg"
+            write_segment(os.path.join(self.directory, name), documents)
+            for call_id in self.pending:
+                if call_id in self.locations:
+                    old_segment, docnum = self.locations[call_id]
+                    self.deleted.setdefault(old_segment, set()).add(docnum)
+            self.manifest["next_segment"] += 1
+            self.manifest["segments"].append(name)
+            self.segments.append(Segment(os.path.join(self.directory, name)))
+            self.pending = {}
+            self._save_manifest()
+            self._load_documents()
+
+    def compact(self):
+        """Merges all segments into one, dropping tombstoned documents."""
+        if len(self.segments) <= 1 and not any(self.deleted.values()):
+            return
+        with telemetry.span("search.compact", segments=len(self.segments)):
+            documents = []
+            for segment in self.segments:
+                deleted = self.deleted.get(segment.name, set())
+                live = {}
+                for docnum in range(segment.doc_count):
+                    if docnum not in deleted:
+                        call_id, sales_rep_id, ordinal, outcome, length = segment.document(docnum)
+                        live[docnum] = ({
+                            "call_id": call_id,
+                            "sales_rep_id": sales_rep_id if sales_rep_id >= 0 else None,
+                            "call_date": datetime.date.fromordinal(ordinal) if ordinal else None,
+                            "call_outcome": OUTCOMES[outcome] or None,
+                        }, [None] * length)
+                for term, entry in segment.iter_terms():
+                    for docnum, positions in segment.postings(entry, with_positions=True).items():
+                        if docnum in live:
+                            for position in positions:
+                                live[docnum][1][position] = term
+                documents.extend(live.values())
+            documents.sort(key=lambda document: document[0]["call_id"])
+
+            name = f"seg_{self.manifest['next_segment']:06d}.vseg"
+            write_segment(os.path.join(self.directory, name), documents)
+            old_segments = self.segments
+            self.manifest["next_segment"] += 1
+            self.manifest["segments"] = [name]
+            self.deleted = {}
+            self.segments = [Segment(os.path.join(self.directory, name))]
+            self._save_manifest()
+            for segment in old_segments:
+                segment.close()
+                os.remove(segment.path)
+            self._load_documents()
+
+    def search(self, query: str, limit: int = 10, sales_rep_id=None, date_from=None, date_to=None, outcome=None) -> list:
+        """
+        Returns the best matching calls as dicts with call_id, score,
+        sales_rep_id, call_date and call_outcome, best first.
+        """
+        phrases = [tokenize(phrase) for phrase in PHRASE_PATTERN.findall(query)]
+        phrases = [phrase for phrase in phrases if phrase]
+        terms = set(tokenize(PHRASE_PATTERN.sub(" ", query)))
+        for phrase in phrases:
+            terms.update(phrase)
+        if not terms or not self.live_count:
+            return []
+
+        with telemetry.span("search.query", terms=len(terms), phrases=len(phrases)) as current:
+            average_length = self.live_length / self.live_count
+            entries = {segment.name: {term: segment.lookup(term) for term in terms} for segment in self.segments}
+            idf = {}
+            for term in terms:
+                df = sum(entries[segment.name][term][2] for segment in self.segments if entries[segment.name][term])
+                idf[term] = math.log(1 + (self.live_count - df + 0.5) / (df + 0.5))
+
+            from_ordinal = date_ordinal(date_from)
+            to_ordinal = date_ordinal(date_to)
+            outcome_code = OUTCOMES.index(outcome) if outcome in OUTCOMES else None
+
+            heap = []
+            for segment in self.segments:
+                deleted = self.deleted.get(segment.name, set())
+                postings = {}
+                for term in terms:
+                    entry = entries[segment.name][term]
+                    if entry is not None:
+                        postings[term] = segment.postings(entry)
+
+                if phrases:
+                    # Only documents containing every phrase are candidates
+                    candidates = None
+                    for phrase in phrases:
+                        matched = self._phrase_matches(segment, entries[segment.name], phrase)
+                        candidates = matched if candidates is None else candidates & matched
+                else:
+                    candidates = set()
+                    for term_postings in postings.values():
+                        candidates.update(term_postings)
+
+                for docnum in candidates:
+                    if docnum in deleted:
+                        continue
+                    call_id, rep_id, ordinal, outcome_value, length = segment.document(docnum)
+                    if sales_rep_id is not None and rep_id != int(sales_rep_id):
+                        continue
+                    if from_ordinal and ordinal < from_ordinal:
+                        continue
+                    if to_ordinal and (not ordinal or ordinal > to_ordinal):
+                        continue
+                    if outcome_code is not None and outcome_value != outcome_code:
+                        continue
+                    score = 0.0
+                    for term, term_postings in postings.items():
+                        tf = term_postings.get(docnum)
+                        if tf:
+                            score += idf[term] * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / average_length))
+                    result = (score, call_id, rep_id, ordinal, outcome_value)
+                    if len(heap) < limit:
+                        heapq.heappush(heap, result)
+                    elif result > heap[0]:
+                        heapq.heapreplace(heap, result)
+            current.set(results=len(heap))
+
+        return [
+            {
+                "call_id": call_id,
+                "score": round(score, 4),
+                "sales_rep_id": rep_id if rep_id >= 0 else None,
+                "call_date": datetime.date.fromordinal(ordinal).isoformat() if ordinal else None,
+                "call_outcome": OUTCOMES[outcome_value] or None,
+            }
+            for score, call_id, rep_id, ordinal, outcome_value in sorted(heap, reverse=True)
+        ]
+
+    def _phrase_matches(self, segment: Segment, entries: dict, phrase: list) -> set:
+        """Returns the docnums of a segment in which the phrase occurs as consecutive tokens."""
+        if any(entries.get(term) is None for term in phrase):
+            return set()
+        positions = [segment.postings(entries[term], with_positions=True) for term in phrase]
+        matched = set()
+        for docnum in set(positions[0]).intersection(*positions[1:]):
+            starts = set(positions[0][docnum])
+            for offset, term_positions in enumerate(positions[1:], start=1):
+                starts &= {position - offset for position in term_positions[docnum]}
+                if not starts:
+                    break
+            if starts:
+                matched.add(docnum)
+        return matched
+
+
+def update_from_supabase(index: SearchIndex, batch_size: int = 500) -> int:
+    """
+    Indexes the call_logs rows whose transcription changed since the
+    manifest watermark (db.ChangedCalls); a re-indexed call tombstones its
+    previous version. Returns the number of calls indexed.
+    """
+    import db
+
+    changed = db.ChangedCalls(
+        "call_id, sales_rep_id, call_date, call_outcome, transcription",
+        index.manifest.get("watermark"), batch_size=batch_size
+    )
+    count = 0
+    for row in changed:
+        index.add(row)
+        count += 1
+        if len(index.pending) >= batch_size:
+            index.commit()
+    index.commit()
+    # Only a complete pass moves the watermark
+    index.manifest["watermark"] = changed.watermark
+    index._save_manifest()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search over call transcripts")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("update", help="Index new and changed calls from Supabase")
+    subparsers.add_parser("compact", help="Merge all segments into one")
+    search_parser = subparsers.add_parser("search", help="Search the index")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--limit", type=int, default=10)
+    search_parser.add_argument("--rep", type=int, default=None, help="Filter by sales_rep_id")
+    search_parser.add_argument("--from", dest="date_from", default=None, help="Earliest call date (YYYY-MM-DD)")
+    search_parser.add_argument("--to", dest="date_to", default=None, help="Latest call date (YYYY-MM-DD)")
+    search_parser.add_argument("--outcome", choices=OUTCOMES[1:], default=None)
+    args = parser.parse_args()
+
+    index = SearchIndex(args.index_dir)
+    try:
+        if args.command == "update":
+            count = update_from_supabase(index)
+            print(f"Indexed {count} calls ({index.live_count} in index)", file=sys.stderr)
+        elif args.command == "compact":
+            index.compact()
+            print(f"Compacted index to {len(index.segments)} segment(s)", file=sys.stderr)
+        else:
+            results = index.search(
+                args.query, limit=args.limit, sales_rep_id=args.rep,
+                date_from=args.date_from, date_to=args.date_to, outcome=args.outcome
+            )
+            print(json.dumps(results, indent=2))
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
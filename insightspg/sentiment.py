@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+sentiment.py
+
+Local, rule-based sentiment scoring for transcript segments, with no model
+download and no network access.
+
+Each word of a segment gets the valence of the lexicon below (-4 .. +4).
+Intensifiers ("very", "really") and diminishers ("slightly") shift the
+next two words, a negator ("not", "never", "don't") up to three words
+before flips and dampens a word, and words after "but" weigh more than the
+words before it. The segment sum is normalized to a compound score in
+[-1, 1]. The rules are compiled once into lookup tables indexed by token
+id, so scoring one segment is a few dictionary lookups, and score_batch()
+scores thousands of segments at once with numpy.
+
+analyze() turns the segment scores of one call into a timeline and a
+summary: overall, rep and customer scores, the trend over the call, the
+lowest point, the sentiment of the final minute and the Positive /
+Negative / Neutral label stored in call_logs."Sentiment Result".
+
+Usage:
+    python sentiment.py                       # analyze TRANSCRIPT_FILE_PATH
+    python sentiment.py backfill              # fill "Sentiment Result" for stored calls
+    python sentiment.py bench --segments 20000
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import sys
+import time
+
+import transcripts
+
+# Bump when the rules below change, so stored results are re-computed
+RULES_VERSION = "1"
+
+LEXICON = {
+    # positive
+    "absolutely": 1.5, "agree": 1.5, "amazing": 2.8, "appreciate": 2.0, "awesome": 3.0,
+    "beneficial": 1.9, "benefit": 1.5, "best": 3.0, "better": 1.9, "brilliant": 2.8,
+    "clear": 1.2, "comfortable": 1.5, "confident": 2.0, "convenient": 1.6, "cool": 1.3,
+    "definitely": 1.3, "delighted": 2.9, "easy": 1.9, "effective": 2.0, "efficient": 1.8,
+    "enjoy": 2.2, "excellent": 3.1, "excited": 2.5, "exciting": 2.3, "fair": 1.3,
+    "fantastic": 3.0, "fine": 0.8, "fit": 1.0, "flexible": 1.4, "fortunate": 1.9,
+    "free": 1.2, "glad": 2.0, "good": 1.9, "great": 3.1, "happy": 2.7,
+    "helpful": 1.9, "impressed": 2.3, "impressive": 2.4, "improve": 1.6, "improved": 1.7,
+    "interested": 1.7, "interesting": 1.7, "like": 1.5, "love": 3.2, "lovely": 2.8,
+    "nice": 1.8, "offer": 0.8, "ok": 0.9, "okay": 0.9, "opportunity": 1.6,
+    "perfect": 2.7, "pleased": 2.4, "pleasure": 2.6, "positive": 2.2, "recommend": 1.5,
+    "reliable": 1.9, "right": 0.8, "save": 1.4, "saving": 1.4, "savings": 1.6,
+    "secure": 1.4, "simple": 1.2, "smooth": 1.4, "solution": 1.3, "solve": 1.5,
+    "solved": 1.5, "sounds": 0.4, "success": 2.7, "successful": 2.6, "super": 2.4,
+    "sure": 1.1, "thank": 1.5, "thanks": 1.9, "trust": 2.2, "useful": 1.9,
+    "valuable": 2.1, "value": 1.4, "welcome": 2.0, "willing": 1.1, "win": 2.6,
+    "wonderful": 2.7, "worth": 1.6, "yes": 1.2,
+    # negative
+    "afraid": -2.0, "angry": -2.3, "annoyed": -1.6, "annoying": -1.9, "awful": -2.9,
+    "bad": -2.5, "broken": -1.8, "bug": -1.4, "bugs": -1.4, "busy": -0.6,
+    "cancel": -1.7, "cancelled": -1.8, "complaint": -1.9, "complicated": -1.4, "concern": -1.2,
+    "concerned": -1.4, "concerns": -1.2, "confused": -1.3, "confusing": -1.5, "costly": -1.5,
+    "difficult": -1.5, "disappointed": -2.3, "disappointing": -2.2, "doubt": -1.5, "expensive": -1.6,
+    "fail": -2.5, "failed": -2.3, "frustrated": -2.1, "frustrating": -2.2, "hard": -0.8,
+    "hate": -2.7, "hesitant": -1.2, "horrible": -2.8, "issue": -1.2, "issues": -1.3,
+    "lose": -1.7, "losing": -1.6, "lost": -1.3, "mistake": -1.6, "no": -1.2,
+    "pass": -0.6, "pricey": -1.5, "problem": -1.7, "problems": -1.7, "risk": -1.1,
+    "risky": -1.4, "slow": -1.2, "sorry": -0.5, "stuck": -1.4, "terrible": -2.9,
+    "toxic": -2.3, "trouble": -1.7, "unclear": -1.1, "unfortunately": -1.6, "unhappy": -2.1,
+    "upset": -1.8, "useless": -2.2, "waste": -1.8, "worried": -1.5, "worry": -1.4,
+    "worse": -2.1, "worst": -3.1, "wrong": -2.1,
+}
+
+# Multiplied by -NEGATION_SCALAR when a negator precedes the word
+NEGATORS = {
+    "not", "no", "never", "nothing", "nobody", "none", "neither", "nor", "without",
+    "cannot", "cant", "dont", "doesnt", "didnt", "isnt", "wasnt", "arent", "wont", "wouldnt",
+    "shouldnt", "couldnt", "hardly", "barely",
+}
+NEGATION_SCALAR = 0.74
+NEGATION_WINDOW = 3
+
+# Added in the direction of the following word's valence
+BOOSTERS = {
+    "absolutely": 0.293, "completely": 0.293, "extremely": 0.293, "highly": 0.293, "incredibly": 0.293,
+    "really": 0.293, "so": 0.293, "totally": 0.293, "truly": 0.293, "very": 0.293,
+    "especially": 0.293, "super": 0.293, "quite": 0.15,
+    "slightly": -0.293, "somewhat": -0.293, "barely": -0.293, "kind": -0.2, "sort": -0.2,
+    "little": -0.2, "bit": -0.2,
+}
+# Weight of a booster one and two words before the boosted word
+BOOSTER_DECAY = (1.0, 0.95)
+
+BUT_BEFORE = 0.5
+BUT_AFTER = 1.5
+
+# Compound normalization, as in VADER: s / sqrt(s^2 + ALPHA)
+ALPHA = 15.0
+
+LABEL_THRESHOLD = 0.05
+
+# Apostrophes are dropped first, so "don't" is the negator "dont"
+APOSTROPHES = str.maketrans("", "", "'\u2019")
+TOKEN = re.compile(r"[a-z]+|[,.;:!?]")
+# score_batch() tokenizes all segments in one pass, joined by this separator
+SEPARATOR = "\x00"
+BATCH_TOKEN = re.compile(r"[a-z]+|[,.;:!?]|\x00")
+# Punctuation ends a clause, and with it the reach of a negator
+CLAUSE_BREAKS = ",.;:!?"
+
+# Lookup tables by token id; id 0 is any unknown word
+VOCABULARY = {}
+VALENCE = [0.0]
+IS_NEGATOR = [False]
+IS_BREAK = [False]
+BOOST = [0.0]
+
+
+def _compile():
+    words = sorted(set(LEXICON) | NEGATORS | set(BOOSTERS) | {"but"})
+    for word in words:
+        VOCABULARY[word] = len(VALENCE)
+        VALENCE.append(LEXICON.get(word, 0.0))
+        IS_NEGATOR.append(word in NEGATORS)
+        IS_BREAK.append(False)
+        BOOST.append(BOOSTERS.get(word, 0.0))
+    # All clause punctuation shares one id
+    for mark in CLAUSE_BREAKS:
+        VOCABULARY[mark] = len(VALENCE)
+    VALENCE.append(0.0)
+    IS_NEGATOR.append(False)
+    IS_BREAK.append(True)
+    BOOST.append(0.0)
+
+
+_compile()
+BUT_ID = VOCABULARY["but"]
+
+
+def rules_version() -> str:
+    """Hash of the lexicon and rules, an input node of analysis_graph.py."""
+    rules = [RULES_VERSION, LEXICON, sorted(NEGATORS), BOOSTERS, NEGATION_SCALAR, BUT_BEFORE, BUT_AFTER, ALPHA, CLAUSE_BREAKS]
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def token_ids(text: str) -> list:
+    """Lowercased word ids; "don't" and "isn't" become the negators "dont" and "isnt"."""
+    lookup = VOCABULARY.get
+    return [lookup(token, 0) for token in TOKEN.findall(text.lower().translate(APOSTROPHES))]
+
+
+def _normalize(total: float) -> float:
+    return total / math.sqrt(total * total + ALPHA)
+
+
+def score_ids(ids: list) -> float:
+    """Compound score of one tokenized segment. score_batch() applies the same rules."""
+    has_but = BUT_ID in ids
+    seen_but = False
+    total = 0.0
+    for position, token in enumerate(ids):
+        if token == BUT_ID:
+            seen_but = True
+        valence = VALENCE[token]
+        if not valence:
+            continue
+        boost = 0.0
+        for distance, decay in enumerate(BOOSTER_DECAY, start=1):
+            if position >= distance:
+                boost += BOOST[ids[position - distance]] * decay
+        valence += boost if valence > 0 else -boost
+        for distance in range(1, min(NEGATION_WINDOW, position) + 1):
+            previous = ids[position - distance]
+            if IS_BREAK[previous]:
+                break
+            if IS_NEGATOR[previous]:
+                valence *= -NEGATION_SCALAR
+                break
+        if has_but:
+            valence *= BUT_AFTER if seen_but else BUT_BEFORE
+        total += valence
+    return _normalize(total)
+
+
+def score_text(text: str) -> float:
+    return score_ids(token_ids(text))
+
+
+def score_batch(texts: list):
+    """
+    Compound scores of many segments as a numpy array, computed over all
+    their tokens at once. numpy is imported here, on first use.
+    """
+    import numpy as np
+
+    valence_table = np.asarray(VALENCE, dtype=np.float64)
+    negator_table = np.asarray(IS_NEGATOR, dtype=bool)
+    break_table = np.asarray(IS_BREAK, dtype=bool)
+    boost_table = np.asarray(BOOST, dtype=np.float64)
+
+    # One regex pass over all segments; separators get id -1 and mark the boundaries
+    lookup = {**VOCABULARY, SEPARATOR: -1}.get
+    joined = SEPARATOR.join(texts).lower().translate(APOSTROPHES)
+    tokens = BATCH_TOKEN.findall(joined)
+    all_ids = np.fromiter((lookup(token, 0) for token in tokens), dtype=np.int64, count=len(tokens))
+    is_separator = all_ids == -1
+    ids = all_ids[~is_separator]
+    lengths = np.bincount(np.cumsum(is_separator)[~is_separator], minlength=len(texts))
+    if not len(ids):
+        return np.zeros(len(texts))
+    segment = np.repeat(np.arange(len(texts)), lengths)
+    starts = np.cumsum(lengths) - lengths
+    position = np.arange(len(ids)) - np.repeat(starts, lengths)
+
+    def shifted(values, distance, fill):
+        """values of the token `distance` places earlier in the same segment"""
+        result = np.full_like(values, fill)
+        if distance < len(values):
+            result[distance:] = values[:-distance]
+        result[position < distance] = fill
+        return result
+
+    valence = valence_table[ids]
+    boost = np.zeros(len(ids))
+    for distance, decay in enumerate(BOOSTER_DECAY, start=1):
+        boost += shifted(boost_table[ids], distance, 0.0) * decay
+    valence = valence + np.sign(valence) * boost
+
+    negated = np.zeros(len(ids), dtype=bool)
+    # Whether no clause break lies between a token and the one `distance` places earlier
+    open_clause = np.ones(len(ids), dtype=bool)
+    for distance in range(1, NEGATION_WINDOW + 1):
+        if distance > 1:
+            open_clause &= ~shifted(break_table[ids], distance - 1, True)
+        negated |= open_clause & shifted(negator_table[ids], distance, False)
+    valence = np.where(negated, valence * -NEGATION_SCALAR, valence)
+
+    is_but = ids == BUT_ID
+    buts_so_far = _within_segment_cumsum(is_but, starts, lengths)
+    has_but = np.repeat(np.bincount(segment, weights=is_but, minlength=len(texts)) > 0, lengths)
+    valence = np.where(has_but, valence * np.where(buts_so_far > 0, BUT_AFTER, BUT_BEFORE), valence)
+
+    totals = np.bincount(segment, weights=valence, minlength=len(texts))
+    return totals / np.sqrt(totals * totals + ALPHA)
+
+
+def _within_segment_cumsum(flags, starts, lengths):
+    """Running count of flags within each segment, restarting at every segment."""
+    import numpy as np
+    running = np.cumsum(flags)
+    before_segment = np.where(starts > 0, running[np.maximum(starts - 1, 0)], 0)
+    return running - np.repeat(before_segment, lengths)
+
+
+def label(score: float) -> str:
+    if score >= LABEL_THRESHOLD:
+        return "Positive"
+    if score <= -LABEL_THRESHOLD:
+        return "Negative"
+    return "Neutral"
+
+
+def _weighted_mean(pairs: list):
+    weight = sum(words for _, words in pairs)
+    return round(sum(score * words for score, words in pairs) / weight, 3) if weight else None
+
+
+def summarize(segments: list, scores: list) -> dict:
+    """
+    Builds the timeline and summary of one call from its segments and their
+    compound scores. The rep is whoever speaks first, as in
+    transcripts.talk_metrics().
+    """
+    resolved = transcripts.resolve_speakers(segments)
+    if not resolved:
+        return {"label": "Neutral", "score": 0.0, "rep_score": None, "customer_score": None,
+                "trend": "stable", "trend_change": 0.0, "lowest_point": None,
+                "final_minute_score": None, "timeline": [], "rules_version": rules_version()}
+
+    rep_speaker = resolved[0][0]
+    timeline = []
+    everyone, rep, customer = [], [], []
+    for (speaker, text, start, end), score in zip(resolved, scores):
+        score = round(float(score), 3)
+        words = max(1, len(text.split()))
+        timeline.append({"start": start, "end": end, "speaker": speaker, "score": score})
+        everyone.append((score, words))
+        (rep if speaker == rep_speaker else customer).append((score, words))
+
+    overall = _weighted_mean(everyone)
+    customer_score = _weighted_mean(customer)
+
+    # Least-squares slope over time (or position, without timestamps),
+    # reported as the change it predicts from the first to the last segment
+    times = [(point["start"] + point["end"]) / 2 for point in timeline]
+    if len(set(times)) <= 1:
+        times = list(range(len(timeline)))
+    mean_time = sum(times) / len(times)
+    mean_score = sum(point["score"] for point in timeline) / len(timeline)
+    variance = sum((t - mean_time) ** 2 for t in times)
+    slope = sum((t - mean_time) * (point["score"] - mean_score) for t, point in zip(times, timeline)) / variance \
+        if variance else 0.0
+    change = round(slope * (times[-1] - times[0]), 3)
+
+    lowest = min(range(len(timeline)), key=lambda index: timeline[index]["score"])
+    final_start = max(point["end"] for point in timeline) - 60
+    final_minute = [(point["score"], 1) for point in timeline if point["start"] >= final_start]
+    if len(final_minute) == len(timeline) and len(timeline) > 5:
+        # No usable timestamps: use the last fifth of the call
+        final_minute = [(point["score"], 1) for point in timeline[-max(1, len(timeline) // 5):]]
+
+    return {
+        # The customer's reaction decides the call label when they speak at all
+        "label": label(customer_score if customer_score is not None else overall),
+        "score": overall,
+        "rep_score": _weighted_mean(rep),
+        "customer_score": customer_score,
+        "trend": "improving" if change >= 0.1 else "declining" if change <= -0.1 else "stable",
+        "trend_change": change,
+        "lowest_point": {
+            **timeline[lowest],
+            "index": lowest,
+            "text": resolved[lowest][1][:160],
+        },
+        "final_minute_score": _weighted_mean(final_minute),
+        "timeline": timeline,
+        "rules_version": rules_version(),
+    }
+
+
+def analyze(segments: list) -> dict:
+    """Sentiment timeline and summary of one call."""
+    return summarize(segments, [score_text(text) for _, text, _, _ in transcripts.resolve_speakers(segments)])
+
+
+def analyze_many(calls: list) -> list:
+    """analyze() for many calls, scoring all their segments in one score_batch() call."""
+    resolved = [transcripts.resolve_speakers(segments) for segments in calls]
+    scores = score_batch([text for call in resolved for _, text, _, _ in call])
+    results = []
+    offset = 0
+    for segments, call in zip(calls, resolved):
+        results.append(summarize(segments, scores[offset:offset + len(call)]))
+        offset += len(call)
+    return results
+
+
+def backfill(batch_size: int = 500, only_missing: bool = False) -> int:
+    """
+    Writes the label of every stored call with a transcription to
+    call_logs."Sentiment Result", one update per label and page.
+    """
+    import db
+
+    supabase = db.get_supabase()
+
+    def filters(query):
+        query = query.not_.is_("transcription", "null")
+        return query.is_("Sentiment Result", "null") if only_missing else query
+
+    written = 0
+    page = []
+
+    def flush():
+        by_label = {}
+        results = analyze_many([transcripts.segments_from_transcription(call["transcription"]) for call in page])
+        for call, result in zip(page, results):
+            by_label.setdefault(result["label"], []).append(call["call_id"])
+        for call_label, call_ids in by_label.items():
+            supabase.table("call_logs").update({"Sentiment Result": call_label}).in_("call_id", call_ids).execute()
+        return len(page)
+
+    for call in db.iter_rows("call_logs", "call_id, transcription", key="call_id", batch_size=batch_size, filters=filters):
+        page.append(call)
+        if len(page) >= batch_size:
+            written += flush()
+            page = []
+    if page:
+        written += flush()
+    return written
+
+
+def bench(segment_count: int):
+    """Per-segment scoring time, one at a time and batched, on the sample transcript."""
+    segments = transcripts.get_segments(transcripts.load_transcript())
+    texts = [segment.get("text", "") for segment in segments] or ["Sounds great, but the price is not really what we hoped."]
+    texts = (texts * (segment_count // len(texts) + 1))[:segment_count]
+
+    started = time.perf_counter()
+    single = [score_text(text) for text in texts]
+    single_seconds = time.perf_counter() - started
+    score_batch(texts[:10])  # import numpy outside the measurement
+    started = time.perf_counter()
+    batched = score_batch(texts)
+    batch_seconds = time.perf_counter() - started
+
+    print(json.dumps({
+        "segments": segment_count,
+        "single_us_per_segment": round(single_seconds / segment_count * 1e6, 2),
+        "batch_us_per_segment": round(batch_seconds / segment_count * 1e6, 2),
+        "max_difference": round(max(abs(a - b) for a, b in zip(single, batched)), 9),
+    }, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local sentiment timeline for call transcripts")
+    subparsers = parser.add_subparsers(dest="command")
+    backfill_parser = subparsers.add_parser("backfill", help='Fill call_logs."Sentiment Result" for stored calls')
+    backfill_parser.add_argument("--batch-size", type=int, default=500)
+    backfill_parser.add_argument("--only-missing", action="store_true", help="Skip calls that already have a result")
+    bench_parser = subparsers.add_parser("bench", help="Measure scoring speed")
+    bench_parser.add_argument("--segments", type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        count = backfill(args.batch_size, args.only_missing)
+        print(f"Wrote sentiment for {count} calls", file=sys.stderr)
+    elif args.command == "bench":
+        bench(args.segments)
+    else:
+        result = analyze(transcripts.get_segments(transcripts.load_transcript()))
+        print(json.dumps({"sentiment": result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
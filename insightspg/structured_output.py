@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+structured_output.py
+
+Schema-constrained LLM output for the analyzers.
+
+Each analyzer describes the JSON it expects as a pydantic model. The model is
+asked for JSON mode output, the reply is parsed tolerantly (code fences, prose
+around the object, trailing commas, truncated output) and validated field by
+field. Fields that are missing or invalid are requested again in a single
+targeted repair call instead of throwing the whole response away.
+
+Metrics (reported through telemetry.py):
+- insights_llm_parse_total{analyzer, outcome}  outcome is ok, repaired or failed
+- insights_llm_parse_failures_total{analyzer}  responses with missing/invalid fields
+- insights_llm_repairs_total{analyzer}         repair requests sent
+- insights_llm_repair_tokens_total{analyzer}   tokens spent on repair requests
+"""
+
+import json
+import os
+import re
+from typing import List, Literal
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+import llm
+import telemetry
+
+INTENT_LABELS = (
+    "Highly Interested",
+    "Interested",
+    "Disinterested",
+    "Highly Disinterested",
+    "Neutral",
+)
+
+COACHING_SECTIONS = (
+    "Conversational Balance",
+    "Objection Handling",
+    "Pitch Optimization",
+    "Call-to-Action Execution",
+)
+
+
+class CallSummaryOutput(BaseModel):
+    """Schema for call_summary.py"""
+    summary: str = Field(..., min_length=1)
+    rating: int = Field(..., ge=0, le=100)
+    strengths: List[str] = Field(..., min_length=1)
+    areas_for_improvement: List[str] = Field(..., min_length=1)
+
+
+class CoachingOutput(BaseModel):
+    """Schema for custom_rag.py; keys are the section headers shown in the UI"""
+    model_config = ConfigDict(populate_by_name=True)
+
+    conversational_balance: str = Field(..., min_length=1, alias="Conversational Balance")
+    objection_handling: str = Field(..., min_length=1, alias="Objection Handling")
+    pitch_optimization: str = Field(..., min_length=1, alias="Pitch Optimization")
+    call_to_action_execution: str = Field(..., min_length=1, alias="Call-to-Action Execution")
+
+
+class BuyerIntentOutput(BaseModel):
+    """Schema for buyer_intent.py"""
+    buyer_intent: Literal[INTENT_LABELS]
+
+
+def max_repairs() -> int:
+    return int(os.getenv("LLM_MAX_REPAIRS", "1"))
+
+
+def describe_schema(schema, fields=None) -> str:
+    """
+    Renders a compact JSON skeleton of the schema (or of a subset of its
+    fields) for use in prompts.
+    """
+    properties = schema.model_json_schema(by_alias=True)["properties"]
+    skeleton = {}
+    for name, field in schema.model_fields.items():
+        key = field.alias or name
+        if fields is not None and key not in fields:
+            continue
+        spec = properties[key]
+        if "enum" in spec:
+            skeleton[key] = " | ".join(spec["enum"])
+        elif spec.get("type") == "array":
+            skeleton[key] = ["string"]
+        elif spec.get("type") == "integer":
+            skeleton[key] = f"integer {spec.get('minimum', '')}-{spec.get('maximum', '')}".strip()
+        else:
+            skeleton[key] = "string"
+    return json.dumps(skeleton, indent=2)
+
+
+def _strip_code_fences(text: str) -> str:
+    match = re.search(r"```(?:json)?\s*(.*?)(?:```|$)", text, re.DOTALL)
+    return match.group(1) if match else text
+
+
+def _close_truncated(text: str) -> str:
+    """
+    Completes JSON cut off mid-way (e.g. by max_tokens): closes an open
+    string, drops a dangling key or comma, and closes open brackets.
+    """
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    # Drop a trailing comma or a key that never received its value
+    text = re.sub(r',\s*$', '', text)
+    text = re.sub(r',?\s*"[^"]*"\s*:\s*$', '', text)
+    return text + "".join(reversed(stack))
+
+
+def extract_json(text: str):
+    """
+    Parses the first JSON object found in text, tolerating code fences,
+    surrounding prose, trailing commas and truncation.
+    Returns a dict, or None if no object can be recovered.
+    """
+    if not text:
+        return None
+    candidate = _strip_code_fences(text)
+    start = candidate.find("{")
+    if start < 0:
+        return None
+    candidate = candidate[start:]
+    decoder = json.JSONDecoder()
+    attempts = (
+        candidate,
+        re.sub(r",\s*([}\]])", r"\1", candidate),
+        _close_truncated(candidate),
+        re.sub(r",\s*([}\]])", r"\1", _close_truncated(candidate)),
+    )
+    for attempt in attempts:
+        try:
+            value, _ = decoder.raw_decode(attempt)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict):
+            return value
+    return None
+
+
+def validate_fields(schema, data: dict):
+    """
+    Validates each schema field independently.
+    Returns (valid values keyed by alias, list of missing or invalid keys).
+    """
+    valid = {}
+    problems = []
+    for name, field in schema.model_fields.items():
+        key = field.alias or name
+        value = data.get(key, data.get(name))
+        if value is None:
+            problems.append(key)
+            continue
+        try:
+            model = schema.model_validate({**_placeholders(schema), key: value})
+        except ValidationError:
+            problems.append(key)
+            continue
+        valid[key] = getattr(model, name)
+    return valid, problems
+
+
+def _placeholders(schema) -> dict:
+    """Builds valid values for every field so a single field can be checked against its constraints."""
+    placeholders = {}
+    for name, field in schema.model_fields.items():
+        key = field.alias or name
+        annotation = field.annotation
+        if getattr(annotation, "__origin__", None) is Literal:
+            placeholders[key] = annotation.__args__[0]
+        elif annotation is int:
+            placeholders[key] = 0
+        elif getattr(annotation, "__origin__", None) is list:
+            placeholders[key] = ["placeholder"]
+        else:
+            placeholders[key] = "placeholder"
+    return placeholders
+
+
+def structured_completion(analyzer: str, schema, messages: list, fallback_parser=None, **params) -> dict:
+    """
+    Requests JSON output matching schema and returns a dict keyed by field
+    alias. Missing or invalid fields trigger up to LLM_MAX_REPAIRS targeted
+    repair requests; fields that still fail are left out of the result.
+
+    fallback_parser, if given, is applied to a reply that contains no JSON
+    object at all (e.g. markdown prose) and must return a dict.
+    """
+    response_text = llm.chat_completion(
+        analyzer,
+        messages=messages,
+        response_format={"type": "json_object"},
+        **params
+    )
+    data = extract_json(response_text)
+    if data is None and fallback_parser is not None:
+        data = fallback_parser(response_text)
+    valid, problems = validate_fields(schema, data or {})
+
+    outcome = "ok"
+    repairs = 0
+    while problems and repairs < max_repairs():
+        if repairs == 0:
+            telemetry.increment("insights_llm_parse_failures_total", analyzer=analyzer)
+        repairs += 1
+        telemetry.increment("insights_llm_repairs_total", analyzer=analyzer)
+        usage = {}
+        try:
+            repair_text = llm.chat_completion(
+                f"{analyzer}.repair",
+                messages=messages + [
+                    {"role": "assistant", "content": response_text},
+                    {
+                        "role": "user",
+                        "content": (
+                            "Your previous answer was missing or had invalid values for these fields: "
+                            f"{', '.join(problems)}.\n"
+                            "Reply with a JSON object containing only these fields, in this format:\n"
+                            f"{describe_schema(schema, problems)}"
+                        )
+                    }
+                ],
+                usage=usage,
+                response_format={"type": "json_object"},
+                **params
+            )
+        except (llm.CircuitOpenError, llm.BudgetExceededError, llm.QueueTimeoutError):
+            # Keep the fields that already validated rather than losing them
+            break
+        telemetry.increment(
+            "insights_llm_repair_tokens_total",
+            usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0),
+            analyzer=analyzer
+        )
+        repaired, problems = validate_fields(schema, {**valid, **(extract_json(repair_text) or {})})
+        valid.update(repaired)
+        outcome = "repaired"
+
+    if problems:
+        if repairs == 0:
+            telemetry.increment("insights_llm_parse_failures_total", analyzer=analyzer)
+        outcome = "failed"
+    telemetry.increment("insights_llm_parse_total", analyzer=analyzer, outcome=outcome)
+    return valid
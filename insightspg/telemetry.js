@@ -0,0 +1,260 @@
+// telemetry.js
+// Request tracing and Prometheus metrics for the insights service.
+//
+// Spans recorded here and the ones forwarded by the Python pipeline (see
+// telemetry.py) end up in the same registry, which server.js exposes on
+// GET /metrics in the Prometheus text format.
+const crypto = require('crypto');
+const fs = require('fs');
+
+// Prefix of the telemetry lines telemetry.py writes to stderr
+const TELEMETRY_PREFIX = '@@telemetry ';
+
+const DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120];
+
+const escapeLabelValue = (value) =>
+  String(value).replace(/\\/g, '\\\\').replace(/\n/g, '\\n').replace(/"/g, '\\"');
+
+const formatLabels = (labels) => {
+  const keys = Object.keys(labels).sort();
+  if (keys.length === 0) {
+    return '';
+  }
+  return `{${keys.map((key) => `${key}="${escapeLabelValue(labels[key])}"`).join(',')}}`;
+};
+
+const labelKey = (labels) => JSON.stringify(Object.keys(labels).sort().map((key) => [key, String(labels[key])]));
+
+class Counter {
+  constructor(name, help) {
+    this.name = name;
+    this.help = help;
+    this.type = 'counter';
+    this.series = new Map();
+  }
+
+  inc(labels = {}, value = 1) {
+    const key = labelKey(labels);
+    const entry = this.series.get(key) || { labels, value: 0 };
+    entry.value += value;
+    this.series.set(key, entry);
+  }
+
+  render() {
+    return Array.from(this.series.values()).map(({ labels, value }) => `${this.name}${formatLabels(labels)} ${value}`);
+  }
+}
+
+class Gauge extends Counter {
+  constructor(name, help) {
+    super(name, help);
+    this.type = 'gauge';
+  }
+
+  set(labels = {}, value = 0) {
+    this.series.set(labelKey(labels), { labels, value });
+  }
+}
+
+class Histogram {
+  constructor(name, help, buckets = DEFAULT_BUCKETS) {
+    this.name = name;
+    this.help = help;
+    this.type = 'histogram';
+    this.buckets = buckets;
+    this.series = new Map();
+  }
+
+  observe(labels = {}, value) {
+    const key = labelKey(labels);
+    let entry = this.series.get(key);
+    if (!entry) {
+      entry = { labels, counts: new Array(this.buckets.length).fill(0), sum: 0, count: 0 };
+      this.series.set(key, entry);
+    }
+    this.buckets.forEach((bound, index) => {
+      if (value <= bound) {
+        entry.counts[index] += 1;
+      }
+    });
+    entry.sum += value;
+    entry.count += 1;
+  }
+
+  render() {
+    const lines = [];
+    for (const { labels, counts, sum, count } of this.series.values()) {
+      this.buckets.forEach((bound, index) => {
+        lines.push(`${this.name}_bucket${formatLabels({ ...labels, le: bound })} ${counts[index]}`);
+      });
+      lines.push(`${this.name}_bucket${formatLabels({ ...labels, le: '+Inf' })} ${count}`);
+      lines.push(`${this.name}_sum${formatLabels(labels)} ${sum}`);
+      lines.push(`${this.name}_count${formatLabels(labels)} ${count}`);
+    }
+    return lines;
+  }
+}
+
+class Registry {
+  constructor() {
+    this.metrics = new Map();
+  }
+
+  getOrCreate(name, MetricClass, help, ...args) {
+    if (!this.metrics.has(name)) {
+      this.metrics.set(name, new MetricClass(name, help, ...args));
+    }
+    return this.metrics.get(name);
+  }
+
+  counter(name, help = 'Forwarded from the insights pipeline') {
+    return this.getOrCreate(name, Counter, help);
+  }
+
+  gauge(name, help = 'Forwarded from the insights pipeline') {
+    return this.getOrCreate(name, Gauge, help);
+  }
+
+  histogram(name, help, buckets) {
+    return this.getOrCreate(name, Histogram, help, buckets);
+  }
+
+  render() {
+    const lines = [];
+    for (const metric of this.metrics.values()) {
+      lines.push(`# HELP ${metric.name} ${metric.help}`);
+      lines.push(`# TYPE ${metric.name} ${metric.type}`);
+      lines.push(...metric.render());
+    }
+    return `${lines.join('\n')}\n`;
+  }
+}
+
+const registry = new Registry();
+
+const stageDuration = registry.histogram(
+  'insights_stage_duration_seconds',
+  'Duration of each insights pipeline stage'
+);
+const stageErrors = registry.counter(
+  'insights_stage_errors_total',
+  'Failed insights pipeline stages'
+);
+const httpDuration = registry.histogram(
+  'insights_http_request_duration_seconds',
+  'HTTP request latency of the insights service'
+);
+const httpErrors = registry.counter(
+  'insights_http_errors_total',
+  'HTTP responses of the insights service with a 5xx status'
+);
+
+const newRequestId = () => crypto.randomUUID().replace(/-/g, '');
+
+// Records a finished span: one structured log line plus the stage metrics
+const recordSpan = (record) => {
+  const labels = { stage: record.name, analyzer: (record.attributes && record.attributes.analyzer) || '' };
+  stageDuration.observe(labels, record.duration);
+  if (record.status === 'error') {
+    stageErrors.inc(labels);
+  }
+  console.log(JSON.stringify(record));
+};
+
+// Runs fn (sync or async) inside a span named `name`
+const span = async (requestId, name, attributes, fn) => {
+  const startedAt = Date.now() / 1000;
+  const start = process.hrtime.bigint();
+  const record = {
+    type: 'span',
+    name,
+    request_id: requestId,
+    span_id: crypto.randomBytes(8).toString('hex'),
+    parent_id: null,
+    start: startedAt,
+    status: 'ok',
+    attributes: { ...attributes }
+  };
+  try {
+    return await fn(record);
+  } catch (error) {
+    record.status = 'error';
+    record.attributes.error = error.message;
+    throw error;
+  } finally {
+    record.duration = Number(process.hrtime.bigint() - start) / 1e9;
+    recordSpan(record);
+  }
+};
+
+// Applies the telemetry lines found in a Python process's stderr and
+// returns the remaining stderr text.
+const ingestPythonTelemetry = (stderr) => {
+  const remaining = [];
+  for (const line of (stderr || '').split('\n')) {
+    if (!line.startsWith(TELEMETRY_PREFIX)) {
+      remaining.push(line);
+      continue;
+    }
+    try {
+      const record = JSON.parse(line.slice(TELEMETRY_PREFIX.length));
+      if (record.type === 'span') {
+        recordSpan(record);
+      } else if (record.type === 'counter') {
+        registry.counter(record.name).inc(record.labels || {}, record.value);
+      } else if (record.type === 'gauge') {
+        registry.gauge(record.name).set(record.labels || {}, record.value);
+      }
+    } catch (parseError) {
+      remaining.push(line);
+    }
+  }
+  return remaining.join('\n').trim();
+};
+
+// Express middleware: assigns the request ID and records HTTP metrics
+// With REQUEST_TRACE_FILE set, every request is appended to it as a JSON
+// line that load_replay.py can replay (no headers or bodies are recorded)
+const traceStream = process.env.REQUEST_TRACE_FILE
+  ? fs.createWriteStream(process.env.REQUEST_TRACE_FILE, { flags: 'a' })
+  : null;
+
+const requestMetrics = (req, res, next) => {
+  req.requestId = req.get('X-Request-Id') || newRequestId();
+  res.set('X-Request-Id', req.requestId);
+  const receivedAt = Date.now() / 1000;
+  const start = process.hrtime.bigint();
+  res.on('finish', () => {
+    const route = req.route ? `${req.baseUrl}${req.route.path}` : 'unmatched';
+    const labels = { method: req.method, route, status: res.statusCode };
+    const duration = Number(process.hrtime.bigint() - start) / 1e9;
+    httpDuration.observe(labels, duration);
+    if (res.statusCode >= 500) {
+      httpErrors.inc({ method: req.method, route });
+    }
+    if (traceStream) {
+      traceStream.write(`${JSON.stringify({
+        ts: receivedAt,
+        service: 'insights',
+        method: req.method,
+        path: req.originalUrl,
+        status: res.statusCode,
+        duration_ms: Math.round(duration * 1000)
+      })}\n`);
+    }
+  });
+  next();
+};
+
+const metricsHandler = (req, res) => {
+  res.set('Content-Type', 'text/plain; version=0.0.4; charset=utf-8');
+  res.send(registry.render());
+};
+
+module.exports = {
+  registry,
+  span,
+  ingestPythonTelemetry,
+  requestMetrics,
+  metricsHandler
+};
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+telemetry.py
+
+Structured tracing and metric events for the insights pipeline.
+
+Every span and metric is written to stderr as a single line prefixed with
+TELEMETRY_PREFIX and followed by a JSON record. server.js runs insights.py as a
+child process, picks those lines out of stderr, and folds them into the
+Prometheus registry it serves on /metrics. All records of one analysis carry
+the same request ID, which server.js passes down in the REQUEST_ID variable.
+
+Record types:
+- span    → {"type": "span", "name", "request_id", "span_id", "parent_id",
+             "start", "duration", "status", "attributes"}
+- counter → {"type": "counter", "name", "value", "labels"}
+- gauge   → {"type": "gauge", "name", "value", "labels"}
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import time
+import uuid
+
+TELEMETRY_PREFIX = "@@telemetry "
+
+_fallback_request_id = uuid.uuid4().hex
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def get_request_id() -> str:
+    """
+    Returns the request ID shared by every record of the current analysis.
+    """
+    return os.getenv("REQUEST_ID") or _fallback_request_id
+
+
+def emit(record: dict):
+    """
+    Writes a telemetry record to stderr. Telemetry must never break the
+    analysis, so serialization problems are swallowed.
+    """
+    try:
+        line = json.dumps(record, default=str)
+    except (TypeError, ValueError):
+        return
+    print(TELEMETRY_PREFIX + line, file=sys.stderr, flush=True)
+
+
+class Span:
+    """A timed unit of work. Attributes can be added while the span is open."""
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.status = "ok"
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """
+    Times the enclosed block and emits it as a span record. Exceptions mark
+    the span as failed and are re-raised unchanged.
+    """
+    current = Span(name, attributes)
+    token = _current_span.set(current)
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        emit({
+            "type": "span",
+            "name": name,
+            "request_id": get_request_id(),
+            "span_id": current.span_id,
+            "parent_id": current.parent_id,
+            "start": started_at,
+            "duration": time.perf_counter() - start,
+            "status": current.status,
+            "attributes": current.attributes,
+        })
+
+
+def increment(name: str, value: float = 1, **labels):
+    """Adds value to the counter `name` with the given labels."""
+    emit({"type": "counter", "name": name, "value": value, "labels": labels})
+
+
+def gauge(name: str, value: float, **labels):
+    """Sets the gauge `name` with the given labels to value."""
+    emit({"type": "gauge", "name": name, "value": value, "labels": labels})
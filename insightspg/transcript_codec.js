@@ -0,0 +1,169 @@
+// Node encoder of the compact transcript format (VTC1) defined in
+// transcript_codec.py, which has the layout, the decoder and the dictionary
+// trainer. server.js uses it for the transcript it hands to insights.py and
+// for GET /api/call-transcript/:callId. Blocks are compressed with raw
+// deflate and the current dictionary of transcript_dicts/; zstd blobs are
+// only written by the Python side.
+
+const fs = require('fs');
+const path = require('path');
+const zlib = require('zlib');
+
+const MAGIC = Buffer.from('VTC1', 'ascii');
+const MEDIA_TYPE = 'application/vnd.veritas.transcript';
+const STORED = 0;
+const DEFLATE = 1;
+const FLOAT_TIMES = 1;
+const BLOCK_SEGMENTS = 64;
+const DEFLATE_LEVEL = 6;
+// Speaker index of a segment kept whole in the extras document
+const IRREGULAR = 0xFFFF;
+const SEGMENT_KEYS = ['speaker', 'text', 'start', 'end'];
+const NO_DICTIONARY = Buffer.alloc(4);
+
+const dictionaryDir = () => process.env.TRANSCRIPT_DICT_DIR || path.join(__dirname, 'transcript_dicts');
+
+// Path of a dictionary file, or null for an id that is not one
+const dictionaryPath = (id) => (/^[0-9a-f]{8}$/.test(id) ? path.join(dictionaryDir(), `${id}.dict`) : null);
+
+// The current dictionary, read on first use: { id, bytes }
+let currentDictionary = null;
+const loadDictionary = () => {
+  if (currentDictionary === null) {
+    try {
+      const id = fs.readFileSync(path.join(dictionaryDir(), 'CURRENT'), 'utf8').trim();
+      currentDictionary = { id: Buffer.from(id, 'hex'), bytes: fs.readFileSync(dictionaryPath(id)) };
+    } catch (error) {
+      currentDictionary = { id: NO_DICTIONARY, bytes: null };
+    }
+  }
+  return currentDictionary;
+};
+
+const compress = (codec, data, dictionary) => {
+  if (codec === STORED) {
+    return data;
+  }
+  return zlib.deflateRawSync(data, dictionary ? { level: DEFLATE_LEVEL, dictionary } : { level: DEFLATE_LEVEL });
+};
+
+// Milliseconds of a time that round-trips exactly, else null
+const milliseconds = (value, floatTimes) => {
+  if (typeof value !== 'number' || !Number.isFinite(value) || (!floatTimes && !Number.isInteger(value))) {
+    return null;
+  }
+  const ms = Math.round(value * 1000);
+  return ms >= 0 && ms <= 0xFFFFFFFF && ms / 1000 === value ? ms : null;
+};
+
+const column = (values, width) => {
+  const buffer = Buffer.alloc(values.length * width);
+  values.forEach((value, index) => {
+    if (width === 2) {
+      buffer.writeUInt16LE(value, index * 2);
+    } else {
+      buffer.writeUInt32LE(value, index * 4);
+    }
+  });
+  return buffer;
+};
+
+const lengthPrefixed = (buffer, width) => {
+  const prefix = Buffer.alloc(width);
+  if (width === 2) {
+    prefix.writeUInt16LE(buffer.length);
+  } else {
+    prefix.writeUInt32LE(buffer.length);
+  }
+  return Buffer.concat([prefix, buffer]);
+};
+
+// Encodes { transcript: [...] } (or "segments") into a VTC1 buffer
+const encode = (transcript, codecName = 'deflate') => {
+  const codec = codecName === 'stored' ? STORED : DEFLATE;
+  const dictionary = codec === STORED ? { id: NO_DICTIONARY, bytes: null } : loadDictionary();
+  const key = 'transcript' in transcript || !('segments' in transcript) ? 'transcript' : 'segments';
+  const segments = transcript[key] || [];
+  const meta = {};
+  for (const [name, value] of Object.entries(transcript)) {
+    if (name !== key) {
+      meta[name] = value;
+    }
+  }
+  if (key !== 'transcript') {
+    meta.__key__ = key;
+  }
+
+  const floatTimes = segments.some(segment =>
+    segment && typeof segment.start === 'number' && !Number.isInteger(segment.start));
+  const speakers = new Map();
+  const speakerIndex = [];
+  const starts = [];
+  const durations = [];
+  const textLengths = [];
+  const texts = [];
+  const extras = {};
+  segments.forEach((segment, index) => {
+    let regular = segment !== null && typeof segment === 'object' && !Array.isArray(segment)
+      && Object.keys(segment).join() === SEGMENT_KEYS.join()
+      && typeof segment.speaker === 'string' && typeof segment.text === 'string';
+    let start = null;
+    let end = null;
+    if (regular) {
+      start = milliseconds(segment.start, floatTimes);
+      end = milliseconds(segment.end, floatTimes);
+      regular = start !== null && end !== null && end >= start
+        && (speakers.has(segment.speaker) || speakers.size < IRREGULAR);
+    }
+    if (!regular) {
+      extras[String(index)] = segment;
+      speakerIndex.push(IRREGULAR);
+      starts.push(0);
+      durations.push(0);
+      textLengths.push(0);
+      texts.push(Buffer.alloc(0));
+      return;
+    }
+    if (!speakers.has(segment.speaker)) {
+      speakers.set(segment.speaker, speakers.size);
+    }
+    const text = Buffer.from(segment.text, 'utf8');
+    speakerIndex.push(speakers.get(segment.speaker));
+    starts.push(start);
+    durations.push(end - start);
+    textLengths.push(text.length);
+    texts.push(text);
+  });
+
+  const columns = [column([speakers.size], 2)];
+  for (const name of speakers.keys()) {
+    columns.push(lengthPrefixed(Buffer.from(name, 'utf8'), 2));
+  }
+  columns.push(column(speakerIndex, 2), column(starts, 4), column(durations, 4), column(textLengths, 4));
+  for (const document of [meta, extras]) {
+    const encoded = Object.keys(document).length ? Buffer.from(JSON.stringify(document), 'utf8') : Buffer.alloc(0);
+    columns.push(lengthPrefixed(encoded, 4));
+  }
+  const columnSection = compress(codec, Buffer.concat(columns));
+
+  const blocks = [];
+  for (let first = 0; first < texts.length; first += BLOCK_SEGMENTS) {
+    blocks.push(compress(codec, Buffer.concat(texts.slice(first, first + BLOCK_SEGMENTS)), dictionary.bytes));
+  }
+  const offsets = [0];
+  for (const block of blocks) {
+    offsets.push(offsets[offsets.length - 1] + block.length);
+  }
+
+  const header = Buffer.alloc(20);
+  MAGIC.copy(header, 0);
+  header.writeUInt8(codec, 4);
+  header.writeUInt8(floatTimes ? FLOAT_TIMES : 0, 5);
+  dictionary.id.copy(header, 6);
+  header.writeUInt32LE(segments.length, 10);
+  header.writeUInt16LE(BLOCK_SEGMENTS, 14);
+  header.writeUInt32LE(columnSection.length, 16);
+  return Buffer.concat([header, columnSection, column([blocks.length], 4), column(offsets, 4), ...blocks]);
+};
+
+module.exports = { MEDIA_TYPE, encode, dictionaryPath };
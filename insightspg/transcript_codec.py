@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+transcript_codec.py
+
+Compact binary format for diarized transcripts ("VTC1"), used for the
+server.js -> insights.py hand-off, by GET /api/call-transcript/:callId
+(application/vnd.veritas.transcript) and for transcript files
+(audio_ingest.py --output call.vtc). transcripts.load_transcript() reads both
+this format and JSON. transcript_codec.js is the Node encoder.
+
+Layout (little-endian):
+    magic "VTC1" | codec u8 | flags u8 | dictionary id 4s | segments u32 |
+    segments per block u16 | column section length u32 | column section |
+    blocks u32 | block offsets u32[blocks + 1] | blocks
+The column section is compressed on its own and holds, one column at a time:
+the speaker names, a speaker index (u16), the start and the duration in
+milliseconds (u32), and the text length in bytes (u32) of every segment. It
+also holds two JSON documents: the other top-level keys of the transcript,
+and any segment that does not fit the columns, e.g. one with extra fields.
+The texts are stored as UTF-8, BLOCK_SEGMENTS segments to a block, and each
+block is compressed with the dictionary. A single segment is read by
+decompressing the columns and one block (TranscriptReader).
+
+Compression is zstd when TRANSCRIPT_CODEC=zstd and the zstandard package is
+installed. Otherwise it is raw deflate (zlib), which Python and Node both
+have built in. Both use the same raw-content dictionary of phrases common in
+our calls. Dictionaries are in transcript_dicts/<id>.dict, with the id of
+the current one in transcript_dicts/CURRENT. Old ones are kept, because
+every blob names the dictionary it needs. Training a new one is
+deterministic:
+    python transcript_codec.py train                 # benchmark_folder
+    python transcript_codec.py train --from-db       # plus stored call transcriptions
+
+Usage:
+    python transcript_codec.py encode diarized-transcript.json call.vtc
+    python transcript_codec.py decode call.vtc
+    python transcript_codec.py segment call.vtc 12
+    python transcript_codec.py bench --repeat 40     # size and speed against JSON
+"""
+
+import argparse
+import array
+import collections
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MAGIC = b"VTC1"
+MEDIA_TYPE = "application/vnd.veritas.transcript"
+HEADER = struct.Struct("<4sBB4sIHI")
+
+STORED, DEFLATE, ZSTD = 0, 1, 2
+CODECS = {"stored": STORED, "deflate": DEFLATE, "zstd": ZSTD}
+FLOAT_TIMES = 1
+
+BLOCK_SEGMENTS = 64
+DEFLATE_LEVEL = 6
+ZSTD_LEVEL = 9
+DICTIONARY_BYTES = 8192
+# Speaker index of a segment kept whole in the extras document
+IRREGULAR = 0xFFFF
+SEGMENT_KEYS = ["speaker", "text", "start", "end"]
+NO_DICTIONARY = b"\0\0\0\0"
+
+
+def dictionary_dir() -> str:
+    return os.getenv("TRANSCRIPT_DICT_DIR") or os.path.join(HERE, "transcript_dicts")
+
+
+_dictionaries = {}
+
+
+def load_dictionary(dictionary_id: bytes = None) -> tuple:
+    """
+    (id, bytes) of the dictionary with this id, or of the current one.
+    Returns (NO_DICTIONARY, b"") when there is no current dictionary.
+    """
+    directory = dictionary_dir()
+    if dictionary_id is None:
+        try:
+            with open(os.path.join(directory, "CURRENT")) as f:
+                dictionary_id = bytes.fromhex(f.read().strip())
+        except OSError:
+            return NO_DICTIONARY, b""
+    if dictionary_id == NO_DICTIONARY:
+        return NO_DICTIONARY, b""
+    if dictionary_id not in _dictionaries:
+        with open(os.path.join(directory, f"{dictionary_id.hex()}.dict"), "rb") as f:
+            _dictionaries[dictionary_id] = f.read()
+    return dictionary_id, _dictionaries[dictionary_id]
+
+
+def default_codec() -> str:
+    codec = os.getenv("TRANSCRIPT_CODEC") or "deflate"
+    if codec == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            return "deflate"
+    return codec if codec in CODECS else "deflate"
+
+
+def _compress(codec: int, data: bytes, dictionary: bytes = b"") -> bytes:
+    if codec == DEFLATE:
+        compressor = zlib.compressobj(DEFLATE_LEVEL, zlib.DEFLATED, -15, zdict=dictionary) if dictionary \
+            else zlib.compressobj(DEFLATE_LEVEL, zlib.DEFLATED, -15)
+        return compressor.compress(data) + compressor.flush()
+    if codec == ZSTD:
+        import zstandard
+        dict_data = zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT) if dictionary else None
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dict_data).compress(data)
+    return data
+
+
+def _decompress(codec: int, data: bytes, dictionary: bytes = b"") -> bytes:
+    if codec == DEFLATE:
+        decompressor = zlib.decompressobj(-15, zdict=dictionary) if dictionary else zlib.decompressobj(-15)
+        return decompressor.decompress(data) + decompressor.flush()
+    if codec == ZSTD:
+        import zstandard
+        dict_data = zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT) if dictionary else None
+        return zstandard.ZstdDecompressor(dict_data=dict_data).decompressobj().decompress(data)
+    return data
+
+
+def _column(typecode: str, values) -> bytes:
+    column = array.array(typecode, values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tobytes()
+
+
+def _read_column(typecode: str, data: bytes, offset: int, count: int) -> tuple:
+    column = array.array(typecode)
+    end = offset + column.itemsize * count
+    column.frombytes(data[offset:end])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column, end
+
+
+def _milliseconds(value, float_times: bool):
+    """Milliseconds of a time that round-trips exactly, else None."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or isinstance(value, float) != float_times:
+        return None
+    ms = round(value * 1000)
+    if not 0 <= ms <= 0xFFFFFFFF or (ms / 1000 if float_times else ms // 1000) != value:
+        return None
+    return ms
+
+
+def encode(transcript: dict, codec: str = None, dictionary: tuple = None) -> bytes:
+    """Encodes {"transcript": [...], ...} (or "segments") into a VTC1 blob."""
+    codec = CODECS[codec or default_codec()]
+    dictionary_id, dictionary_bytes = dictionary if dictionary is not None else load_dictionary()
+    if codec == STORED:
+        dictionary_id, dictionary_bytes = NO_DICTIONARY, b""
+    key = "transcript" if "transcript" in transcript or "segments" not in transcript else "segments"
+    segments = transcript.get(key) or []
+    meta = {name: value for name, value in transcript.items() if name != key}
+    if key != "transcript":
+        meta["__key__"] = key
+
+    float_times = any(isinstance(segment.get("start"), float) for segment in segments if isinstance(segment, dict))
+    speakers = {}
+    speaker_index, starts, durations, text_lengths, texts = [], [], [], [], []
+    extras = {}
+    for index, segment in enumerate(segments):
+        regular = isinstance(segment, dict) and list(segment) == SEGMENT_KEYS \
+            and isinstance(segment["speaker"], str) and isinstance(segment["text"], str)
+        if regular:
+            start = _milliseconds(segment["start"], float_times)
+            end = _milliseconds(segment["end"], float_times)
+            regular = start is not None and end is not None and end >= start \
+                and (segment["speaker"] in speakers or len(speakers) < IRREGULAR)
+        if not regular:
+            extras[str(index)] = segment
+            speaker_index.append(IRREGULAR)
+            starts.append(0)
+            durations.append(0)
+            text_lengths.append(0)
+            texts.append(b"")
+            continue
+        text = segment["text"].encode("utf-8")
+        speaker_index.append(speakers.setdefault(segment["speaker"], len(speakers)))
+        starts.append(start)
+        durations.append(end - start)
+        text_lengths.append(len(text))
+        texts.append(text)
+
+    columns = [struct.pack("<H", len(speakers))]
+    for name in speakers:
+        encoded = name.encode("utf-8")
+        columns.append(struct.pack("<H", len(encoded)) + encoded)
+    columns += [_column("H", speaker_index), _column("I", starts), _column("I", durations), _column("I", text_lengths)]
+    for document in (meta, extras):
+        encoded = json.dumps(document, separators=(",", ":"), ensure_ascii=False).encode("utf-8") if document else b""
+        columns.append(struct.pack("<I", len(encoded)) + encoded)
+    column_section = _compress(codec, b"".join(columns))
+
+    blocks = [
+        _compress(codec, b"".join(texts[first:first + BLOCK_SEGMENTS]), dictionary_bytes)
+        for first in range(0, len(texts), BLOCK_SEGMENTS)
+    ]
+    offsets = [0]
+    for block in blocks:
+        offsets.append(offsets[-1] + len(block))
+    header = HEADER.pack(MAGIC, codec, FLOAT_TIMES if float_times else 0, dictionary_id, len(segments),
+                         BLOCK_SEGMENTS, len(column_section))
+    return b"".join([header, column_section, struct.pack("<I", len(blocks)), _column("I", offsets)] + blocks)
+
+
+def is_encoded(data: bytes) -> bool:
+    return data[:4] == MAGIC
+
+
+class TranscriptReader:
+    """Random access to the segments of a VTC1 blob; only the blocks read are decompressed."""
+
+    def __init__(self, data: bytes):
+        magic, self.codec, flags, dictionary_id, self.count, self.block_segments, column_length = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a VTC1 transcript")
+        self.data = memoryview(data)
+        self.float_times = bool(flags & FLOAT_TIMES)
+        self.dictionary = load_dictionary(dictionary_id)[1]
+        offset = HEADER.size
+        columns = _decompress(self.codec, bytes(self.data[offset:offset + column_length]))
+        offset += column_length
+
+        (speaker_count,) = struct.unpack_from("<H", columns)
+        position = 2
+        self.speakers = []
+        for _ in range(speaker_count):
+            (length,) = struct.unpack_from("<H", columns, position)
+            self.speakers.append(columns[position + 2:position + 2 + length].decode("utf-8"))
+            position += 2 + length
+        self.speaker_index, position = _read_column("H", columns, position, self.count)
+        self.starts, position = _read_column("I", columns, position, self.count)
+        self.durations, position = _read_column("I", columns, position, self.count)
+        self.text_lengths, position = _read_column("I", columns, position, self.count)
+        documents = []
+        for _ in range(2):
+            (length,) = struct.unpack_from("<I", columns, position)
+            documents.append(json.loads(columns[position + 4:position + 4 + length]) if length else {})
+            position += 4 + length
+        self.meta, self.extras = documents
+
+        (block_count,) = struct.unpack_from("<I", self.data, offset)
+        self.block_offsets, offset = _read_column("I", self.data, offset + 4, block_count + 1)
+        self.blocks_start = offset
+        self._block = (None, None)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _text_block(self, block: int) -> tuple:
+        """(text bytes, start offset of every segment) of a block, keeping the last one decoded."""
+        if self._block[0] != block:
+            first = block * self.block_segments
+            data = _decompress(self.codec, bytes(self.data[
+                self.blocks_start + self.block_offsets[block]:self.blocks_start + self.block_offsets[block + 1]
+            ]), self.dictionary)
+            starts = [0]
+            for length in self.text_lengths[first:first + self.block_segments]:
+                starts.append(starts[-1] + length)
+            self._block = (block, (data, starts))
+        return self._block[1]
+
+    def _time(self, ms: int):
+        return ms / 1000 if self.float_times else ms // 1000 if ms % 1000 == 0 else ms / 1000
+
+    def segment(self, index: int) -> dict:
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        if self.speaker_index[index] == IRREGULAR:
+            return self.extras[str(index)]
+        data, starts = self._text_block(index // self.block_segments)
+        within = index % self.block_segments
+        return {
+            "speaker": self.speakers[self.speaker_index[index]],
+            "text": data[starts[within]:starts[within + 1]].decode("utf-8"),
+            "start": self._time(self.starts[index]),
+            "end": self._time(self.starts[index] + self.durations[index]),
+        }
+
+    def segments(self, start: int = 0, stop: int = None) -> list:
+        stop = self.count if stop is None else min(stop, self.count)
+        return [self.segment(index) for index in range(max(start, 0), stop)]
+
+    def transcript(self) -> dict:
+        meta = dict(self.meta)
+        key = meta.pop("__key__", "transcript")
+        return {key: self.segments(), **meta}
+
+
+def decode(data: bytes) -> dict:
+    return TranscriptReader(data).transcript()
+
+
+def _corpus_texts(from_db: bool) -> list:
+    """Segment texts of the benchmark transcripts and, with from_db, of stored calls."""
+    import call_phases
+    import transcripts
+
+    texts = []
+    folder = os.path.join(HERE, "benchmark_folder")
+    for name in sorted(os.listdir(folder)):
+        if name.endswith(".txt"):
+            with open(os.path.join(folder, name), encoding="utf-8") as f:
+                texts += [segment["text"] for segment in call_phases.segments_from_text(f.read())]
+    if from_db:
+        import db
+        for call in db.iter_rows("call_logs", "call_id, transcription", key="call_id",
+                                 filters=lambda query: query.not_.is_("transcription", "null")):
+            texts += [segment["text"] for segment in transcripts.segments_from_transcription(call["transcription"])]
+    return texts
+
+
+def train(texts: list, size: int = DICTIONARY_BYTES, max_words: int = 6) -> bytes:
+    """
+    A raw-content dictionary: the word sequences that would save the most
+    bytes (length x repeats), without phrases already covered by a longer
+    pick. The most valuable come last, the closest to the data for deflate.
+    """
+    counts = collections.Counter()
+    # Bounds the memory of the n-gram counts on large corpora
+    for text in texts[::max(1, len(texts) // 20000)]:
+        words = text.split()
+        for n in range(1, max_words + 1):
+            for first in range(len(words) - n + 1):
+                counts[" ".join(words[first:first + n])] += 1
+    ranked = sorted(
+        ((count - 1) * (len(phrase.encode("utf-8")) + 1), phrase)
+        for phrase, count in counts.items() if count > 1 and len(phrase) > 3
+    )
+    chosen = []
+    used = 0
+    for score, phrase in reversed(ranked):
+        if used >= size:
+            break
+        if any(phrase in longer for longer in chosen):
+            continue
+        chosen.append(phrase)
+        used += len(phrase.encode("utf-8")) + 1
+    return " ".join(reversed(chosen)).encode("utf-8")[-size:]
+
+
+def save_dictionary(dictionary: bytes) -> str:
+    directory = dictionary_dir()
+    os.makedirs(directory, exist_ok=True)
+    dictionary_id = hashlib.sha256(dictionary).digest()[:4].hex()
+    with open(os.path.join(directory, f"{dictionary_id}.dict"), "wb") as f:
+        f.write(dictionary)
+    with open(os.path.join(directory, "CURRENT"), "w") as f:
+        f.write(dictionary_id + "\n")
+    return dictionary_id
+
+
+def bench(paths: list, repeat: int, rounds: int = 5):
+    """Size and encode/decode time of JSON and of each codec, for every transcript."""
+    import call_phases
+    import transcripts
+
+    def timed(function, *args):
+        best = float("inf")
+        for _ in range(rounds):
+            started = time.perf_counter()
+            result = function(*args)
+            best = min(best, time.perf_counter() - started)
+        return result, best * 1000
+
+    formats = {
+        "json (indent=2)": (lambda t: json.dumps(t, indent=2).encode("utf-8"), json.loads),
+        "json (compact)": (lambda t: json.dumps(t, separators=(",", ":")).encode("utf-8"), json.loads),
+        "vtc stored": (lambda t: encode(t, "stored"), decode),
+        "vtc deflate, no dict": (lambda t: encode(t, "deflate", (NO_DICTIONARY, b"")), decode),
+        "vtc deflate": (lambda t: encode(t, "deflate"), decode),
+    }
+    try:
+        import zstandard  # noqa: F401
+        formats["vtc zstd"] = (lambda t: encode(t, "zstd"), decode)
+    except ImportError:
+        print("zstandard is not installed, skipping zstd", file=sys.stderr)
+
+    for path in paths:
+        if path.endswith(".txt"):
+            with open(path, encoding="utf-8") as f:
+                transcript = {"transcript": call_phases.segments_from_text(f.read())}
+        else:
+            transcript = transcripts.load_transcript(path)
+        segments = transcripts.get_segments(transcript) * repeat
+        transcript = {"transcript": [
+            dict(segment, start=index * 5, end=(index + 1) * 5) for index, segment in enumerate(segments)
+        ]}
+        print(f"\n{os.path.basename(path)} x{repeat}: {len(segments)} segments")
+        print(f"{'format':<24}{'bytes':>10}{'ratio':>8}{'encode ms':>11}{'decode ms':>11}{'1 segment ms':>14}")
+        baseline = None
+        for name, (encoder, decoder) in formats.items():
+            data, encode_ms = timed(encoder, transcript)
+            decoded, decode_ms = timed(decoder, data)
+            assert transcripts.get_segments(decoded) == transcript["transcript"], name
+            baseline = baseline or len(data)
+            if name.startswith("vtc"):
+                _, one_ms = timed(lambda: TranscriptReader(data).segment(len(segments) // 2))
+                one = f"{one_ms:14.3f}"
+            else:
+                one = f"{decode_ms:14.3f}"
+            print(f"{name:<24}{len(data):>10}{baseline / len(data):>7.1f}x{encode_ms:>11.3f}{decode_ms:>11.3f}{one}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact binary transcript format")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    encode_parser = subparsers.add_parser("encode", help="JSON transcript to VTC1")
+    encode_parser.add_argument("input")
+    encode_parser.add_argument("output")
+    encode_parser.add_argument("--codec", choices=sorted(CODECS), default=None)
+    decode_parser = subparsers.add_parser("decode", help="VTC1 to JSON on stdout")
+    decode_parser.add_argument("input")
+    segment_parser = subparsers.add_parser("segment", help="Print one segment of a VTC1 file")
+    segment_parser.add_argument("input")
+    segment_parser.add_argument("index", type=int)
+    train_parser = subparsers.add_parser("train", help="Train a dictionary and make it the current one")
+    train_parser.add_argument("--from-db", action="store_true", help="Include the stored call transcriptions")
+    train_parser.add_argument("--size", type=int, default=DICTIONARY_BYTES)
+    bench_parser = subparsers.add_parser("bench", help="Compare sizes and speed with JSON")
+    bench_parser.add_argument("paths", nargs="*", default=[os.path.join(HERE, "diarized-transcript.json")])
+    bench_parser.add_argument("--repeat", type=int, default=1, help="Repeat the segments, for long calls")
+    args = parser.parse_args()
+
+    if args.command == "encode":
+        import transcripts
+        data = encode(transcripts.load_transcript(args.input), args.codec)
+        with open(args.output, "wb") as f:
+            f.write(data)
+        print(f"Wrote {len(data)} bytes to {args.output}", file=sys.stderr)
+    elif args.command in ("decode", "segment"):
+        with open(args.input, "rb") as f:
+            reader = TranscriptReader(f.read())
+        result = reader.transcript() if args.command == "decode" else reader.segment(args.index)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    elif args.command == "train":
+        texts = _corpus_texts(args.from_db)
+        dictionary = train(texts, args.size)
+        dictionary_id = save_dictionary(dictionary)
+        print(f"Trained dictionary {dictionary_id} ({len(dictionary)} bytes) from {len(texts)} segments", file=sys.stderr)
+    else:
+        bench(args.paths, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+transcripts.py
+
+Helpers shared by the analyzers for reading diarized transcripts.
+
+A transcript is {"transcript": [{"speaker", "text", "start", "end"}, ...]}
+as written by server.js and audio_ingest.py; older files use "segments"
+instead of "transcript". Files are JSON or the compact binary format of
+transcript_codec.py (what server.js hands to insights.py).
+"""
+
+import json
+import os
+import re
+
+# "Speaker 2: Sounds good" – one block of a stored call_logs.transcription
+SPEAKER_BLOCK = re.compile(r"^(Speaker \d+):\s(.+)$", re.DOTALL)
+
+# "Charlie: Hi, I'm calling from ..." – a speaker name written into the text
+NAME_PREFIX = re.compile(r"^\s*([A-Z][\w.'-]*(?: [A-Z][\w.'-]*){0,2}):\s+(.*)$", re.DOTALL)
+
+
+def transcript_path() -> str:
+    return os.getenv('TRANSCRIPT_FILE_PATH', 'diarized-transcript.json')
+
+
+def load_transcript(file_path: str = None) -> dict:
+    """Reads a JSON or transcript_codec.py file."""
+    with open(file_path or transcript_path(), 'rb') as f:
+        data = f.read()
+    if data[:4] == b"VTC1":
+        import transcript_codec
+        return transcript_codec.decode(data)
+    return json.loads(data.decode('utf-8'))
+
+
+def get_segments(transcript: dict) -> list:
+    """Returns the list of segments, whichever key the transcript uses."""
+    return transcript.get('transcript') or transcript.get('segments') or []
+
+
+def segments_from_transcription(transcription: str) -> list:
+    """
+    Splits a call_logs.transcription ("Speaker N: text" blocks separated by
+    blank lines) into segments with approximate 5-second timestamps, the
+    same way server.js convertTranscriptionToInsightsFormat() does.
+    """
+    segments = []
+    for index, block in enumerate((transcription or "").split("\n\n")):
+        match = SPEAKER_BLOCK.match(block)
+        speaker, text = match.groups() if match else ("Speaker 1", block)
+        segments.append({"speaker": speaker, "text": text, "start": index * 5, "end": (index + 1) * 5})
+    return segments
+
+
+def transcript_to_text(transcript: dict) -> str:
+    """Renders the transcript as "speaker: text" lines."""
+    conversation = ""
+    for segment in get_segments(transcript):
+        speaker = segment.get('speaker', 'Unknown')
+        text = segment.get('text', '')
+        conversation += f"{speaker}: {text}\n"
+    return conversation
+
+
+def resolve_speakers(segments: list) -> list:
+    """
+    Returns (speaker, text, start, end) tuples. When every segment carries the
+    same speaker label (the plain-text transcription format stores everything
+    as "Speaker 1") and the texts start with "Name:", the name is used as the
+    speaker instead.
+    """
+    labels = {segment.get('speaker') for segment in segments}
+    use_prefix = len(labels) <= 1 and segments and all(
+        NAME_PREFIX.match(segment.get('text', '')) for segment in segments
+    )
+    resolved = []
+    for segment in segments:
+        speaker = segment.get('speaker', 'Unknown')
+        text = segment.get('text', '')
+        if use_prefix:
+            speaker, text = NAME_PREFIX.match(text).groups()
+        resolved.append((speaker, text, segment.get('start') or 0, segment.get('end') or 0))
+    return resolved
+
+
+def talk_metrics(segments: list, rep_speaker: str = None) -> dict:
+    """
+    Computes talk-ratio metrics from transcript segments. The sales rep is
+    rep_speaker if given, otherwise whoever speaks first (the rep places the
+    call). Ratios are by words, since stored transcripts carry approximate
+    timestamps only.
+    """
+    resolved = resolve_speakers(segments)
+    if not resolved:
+        return {
+            "rep_speaker": None,
+            "rep_talk_ratio": 0.0,
+            "customer_talk_ratio": 0.0,
+            "rep_words": 0,
+            "customer_words": 0,
+            "turn_count": 0,
+            "longest_monologue_seconds": 0.0,
+            "rep_questions": 0,
+        }
+
+    rep_speaker = rep_speaker or resolved[0][0]
+    rep_words = 0
+    customer_words = 0
+    rep_questions = 0
+    turn_count = 0
+    longest_monologue = 0.0
+    previous_speaker = None
+    monologue_start = 0.0
+    for speaker, text, start, end in resolved:
+        words = len(text.split())
+        if speaker == rep_speaker:
+            rep_words += words
+            rep_questions += text.count('?')
+        else:
+            customer_words += words
+        if speaker != previous_speaker:
+            turn_count += 1
+            previous_speaker = speaker
+            monologue_start = start
+        longest_monologue = max(longest_monologue, end - monologue_start)
+
+    total_words = rep_words + customer_words
+    return {
+        "rep_speaker": rep_speaker,
+        "rep_talk_ratio": round(rep_words / total_words, 3) if total_words else 0.0,
+        "customer_talk_ratio": round(customer_words / total_words, 3) if total_words else 0.0,
+        "rep_words": rep_words,
+        "customer_words": customer_words,
+        "turn_count": turn_count,
+        "longest_monologue_seconds": round(longest_monologue, 2),
+        "rep_questions": rep_questions,
+    }